@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+PIN ArcGIS Harvester — concurrent, incremental pulls from ArcGIS REST portals.
+
+State agencies publish assessment units, TMDLs and monitoring sites as
+MapServer / FeatureServer layers. Paging those with resultOffset one page at
+a time (with sleeps in between) is slow and re-downloads every feature on
+every run. This instead:
+
+  portal ?f=json ──► matching services (and folders) ──► layers ?f=json
+        │                                    (fields, objectIdField, editFieldsInfo,
+        │                                     maxRecordCount — fetched concurrently)
+        ▼
+  query returnIdsOnly ──► [ids 1..N] ──► objectIds batches ──► features
+                                          (concurrent, capped per host;
+                                           only the outFields that exist,
+                                           geometry only for point layers)
+
+With a previous harvest (rows carry _layer / _objectid / _edited), a layer
+that has an editDateField is only asked for features edited since its newest
+_edited value; ids that disappeared are dropped, everything else is kept
+from the previous copy. Layers without edit tracking — or whose edit-date
+query is rejected — are pulled in full. A layer that still can't be pulled
+completely keeps its previous rows rather than dropping out of the harvest.
+
+Usage:
+  harvester = ArcGISHarvester("https://mde.geodata.md.gov/arcgis/rest/services/Water_Quality",
+                              keywords=["tmdl", "303d"])
+  result = harvester.harvest(["AU_ID", "AU_NAME"], previous=previous_df, label="MDE")
+  df = pd.concat([result.unchanged, pd.DataFrame(result.features)])
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Iterable, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+import http_client
+from fetch_engine import ordered_map
+
+ID_BATCH = 500               # objectIds per query (capped by the layer's maxRecordCount)
+BATCH_WORKERS = 4            # queries in flight per harvest
+MAX_CONCURRENT_PER_HOST = 4
+REQUEST_TIMEOUT = 60
+MAX_RETRIES = 3
+QUERYABLE_TYPES = ("Feature Layer", "Table")
+
+# Bookkeeping columns on every harvested row
+LAYER_COL = "_layer"         # layer URL
+LAYER_NAME_COL = "_layer_name"
+OBJECTID_COL = "_objectid"
+EDITED_COL = "_edited"       # editDateField value, epoch ms (empty if the layer has none)
+LAT_COL = "_lat"             # point geometry, WGS84
+LON_COL = "_lon"
+
+_slots_lock = threading.Lock()
+_host_slots: dict[str, threading.BoundedSemaphore] = {}
+
+
+class ArcGISError(Exception):
+    """A request failed or the server answered with an error object."""
+
+
+class ArcGISLayer(NamedTuple):
+    url: str
+    name: str
+    object_id_field: str
+    edit_date_field: Optional[str]
+    fields: tuple[str, ...]
+    is_point: bool
+    max_record_count: int
+
+
+class HarvestResult(NamedTuple):
+    features: list[dict]      # fetched this run: requested attributes + bookkeeping columns
+    unchanged: pd.DataFrame   # previous rows still current (empty on a full pull)
+    deleted: int              # previous rows whose ids are gone upstream
+
+
+def _slot(host: str) -> threading.BoundedSemaphore:
+    with _slots_lock:
+        return _host_slots.setdefault(host, threading.BoundedSemaphore(MAX_CONCURRENT_PER_HOST))
+
+
+def _timestamp_literal(epoch_ms: float) -> str:
+    dt = datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc)
+    return f"TIMESTAMP '{dt:%Y-%m-%d %H:%M:%S}'"
+
+
+class ArcGISHarvester:
+    """One ArcGIS REST services root (or folder), filtered by service-name keywords."""
+
+    def __init__(self, root: str, keywords: Iterable[str] = (), workers: int = BATCH_WORKERS,
+                 batch_size: int = ID_BATCH):
+        self.root = root.rstrip("/")
+        self.host = urlsplit(root).netloc
+        self.keywords = [k.lower() for k in keywords]
+        self.workers = workers
+        self.batch_size = batch_size
+
+    def _request(self, url: str, params: dict, post: bool = False) -> dict:
+        """
+        JSON from an ArcGIS REST endpoint. HTTP errors are retried by the
+        client; error objects in a 200 response (ArcGIS wraps its own 5xx that
+        way) are retried here when their code is a retryable status.
+        """
+        params = {**params, "f": "json"}
+        for attempt in range(MAX_RETRIES):
+            try:
+                with _slot(self.host):
+                    if post:
+                        r = http_client.post(url, data=params, timeout=REQUEST_TIMEOUT)
+                    else:
+                        r = http_client.get(url, params=params, timeout=REQUEST_TIMEOUT)
+                    r.raise_for_status()
+                data = r.json()
+            except Exception as e:
+                raise ArcGISError(f"{url}: {str(e)[:100]}") from e
+            if "error" not in data:
+                return data
+            err = data["error"]
+            if err.get("code") not in http_client.RETRY_STATUSES or attempt == MAX_RETRIES - 1:
+                raise ArcGISError(f"{url}: {err.get('code')}: {err.get('message')}")
+            time.sleep(2 * (attempt + 1))
+
+    def _matches(self, name: str) -> bool:
+        return not self.keywords or any(kw in name.lower() for kw in self.keywords)
+
+    # ── Discovery ──
+
+    def services(self) -> list[str]:
+        """URLs of matching MapServer / FeatureServer services (root and matching folders)."""
+        data = self._request(self.root, {})
+        listed = list(data.get("services", []))
+        for folder in data.get("folders", []):
+            if self._matches(folder):
+                try:
+                    # Everything in a matching folder counts, whatever its name
+                    listed += [{**s, "_folder": True}
+                               for s in self._request(f"{self.root}/{folder}", {}).get("services", [])]
+                except ArcGISError:
+                    pass
+        base = self.root.rsplit("/rest/services", 1)[0] + "/rest/services"
+        return [f"{base}/{s['name']}/{s['type']}" for s in listed
+                if s.get("type") in ("MapServer", "FeatureServer")
+                and (s.get("_folder") or self._matches(s.get("name", "")))]
+
+    def layer(self, url: str) -> Optional[ArcGISLayer]:
+        """Layer metadata, or None for group layers / rasters."""
+        meta = self._request(url, {})
+        if meta.get("type") not in QUERYABLE_TYPES:
+            return None
+        fields = tuple(f["name"] for f in meta.get("fields") or [])
+        oid = meta.get("objectIdField") or next(
+            (f["name"] for f in meta.get("fields") or [] if f.get("type") == "esriFieldTypeOID"), "OBJECTID")
+        edit_field = (meta.get("editFieldsInfo") or {}).get("editDateField")
+        return ArcGISLayer(url, meta.get("name") or url.rsplit("/", 1)[-1], oid,
+                           edit_field if edit_field in fields else None, fields,
+                           meta.get("geometryType") == "esriGeometryPoint",
+                           int(meta.get("maxRecordCount") or 1000))
+
+    def layers(self) -> list[ArcGISLayer]:
+        """Queryable layers of every matching service, metadata fetched concurrently."""
+        def service_layers(svc_url):
+            try:
+                meta = self._request(svc_url, {})
+            except ArcGISError as e:
+                print(f"      Error on {svc_url}: {str(e)[:80]}")
+                return []
+            return [f"{svc_url}/{l['id']}" for l in meta.get("layers", []) + meta.get("tables", [])]
+
+        def safe_layer(url):
+            try:
+                return self.layer(url)
+            except ArcGISError as e:
+                print(f"      Error on {url}: {str(e)[:80]}")
+                return None
+
+        urls = [u for urls in ordered_map(service_layers, self.services(), self.workers) for u in urls]
+        return [l for l in ordered_map(safe_layer, urls, self.workers) if l is not None]
+
+    # ── Queries ──
+
+    def count(self, where: str = "1=1") -> int:
+        """Features matching `where` across every matching layer (returnCountOnly, concurrently)."""
+        def layer_count(layer):
+            data = self._request(f"{layer.url}/query", {"where": where, "returnCountOnly": "true"}, post=True)
+            return int(data.get("count") or 0)
+        return sum(ordered_map(layer_count, self.layers(), self.workers))
+
+    def object_ids(self, layer: ArcGISLayer, where: str = "1=1") -> list[int]:
+        data = self._request(f"{layer.url}/query", {"where": where, "returnIdsOnly": "true"}, post=True)
+        return sorted(data.get("objectIds") or [])
+
+    def _features(self, layer: ArcGISLayer, ids: list[int], out_fields: list[str]) -> list[dict]:
+        params = {
+            "objectIds": ",".join(map(str, ids)),
+            "outFields": ",".join(out_fields),
+            "returnGeometry": "true" if layer.is_point else "false",
+        }
+        if layer.is_point:
+            params["outSR"] = 4326
+        data = self._request(f"{layer.url}/query", params, post=True)
+        rows = []
+        for feat in data.get("features", []):
+            row = dict(feat.get("attributes") or {})
+            geom = feat.get("geometry") or {}
+            row[LAT_COL], row[LON_COL] = geom.get("y"), geom.get("x")
+            row[LAYER_COL], row[LAYER_NAME_COL] = layer.url, layer.name
+            row[OBJECTID_COL] = row.get(layer.object_id_field)
+            row[EDITED_COL] = row.get(layer.edit_date_field) if layer.edit_date_field else None
+            rows.append(row)
+        return rows
+
+    # ── Harvest ──
+
+    def _plan(self, layer: ArcGISLayer, previous: Optional[pd.DataFrame]):
+        """(ids to fetch, previous rows to keep, deleted count) for one layer."""
+        ids = self.object_ids(layer)
+        prev = previous[previous[LAYER_COL] == layer.url] if previous is not None else None
+        if prev is None or prev.empty or not layer.edit_date_field:
+            return ids, None, 0
+
+        prev_ids = pd.to_numeric(prev[OBJECTID_COL], errors="coerce")
+        edited = pd.to_numeric(prev[EDITED_COL], errors="coerce")
+        current = set(ids)
+        deleted = int((~prev_ids.isin(current)).sum())
+        if edited.notna().any():
+            since = f"{layer.edit_date_field} >= {_timestamp_literal(edited.max())}"
+            changed = set(self.object_ids(layer, since))
+        else:
+            changed = current
+        changed |= current - set(prev_ids.dropna().astype("int64"))   # new ids missing an edit date
+        keep = prev[prev_ids.isin(current - changed)]
+        return sorted(changed), keep, deleted
+
+    def harvest(self, out_fields: Iterable[str], previous: Optional[pd.DataFrame] = None,
+                label: str = "") -> HarvestResult:
+        """
+        Features of every matching layer with the requested attribute fields
+        (those a layer doesn't have are skipped). `previous` is an earlier
+        harvest's rows; layers with edit tracking are then fetched incrementally.
+        """
+        label = label or self.host
+        wanted = list(dict.fromkeys(out_fields))
+        if previous is not None and not {LAYER_COL, OBJECTID_COL, EDITED_COL} <= set(previous.columns):
+            previous = None
+
+        batches = []
+        plans: dict[str, tuple] = {}   # layer url → (layer, previous rows to keep, deleted count)
+        failed: set[str] = set()       # layers whose previous rows are kept as they are
+        for layer in self.layers():
+            try:
+                ids, keep, gone = self._plan(layer, previous)
+            except ArcGISError as e:
+                print(f"      Error planning {layer.name}: {str(e)[:80]} — full pull")
+                try:
+                    ids, keep, gone = self.object_ids(layer), None, 0
+                except ArcGISError as e:
+                    print(f"      Error on {layer.name}: {str(e)[:80]}")
+                    plans[layer.url] = (layer, None, 0)
+                    failed.add(layer.url)
+                    continue
+            plans[layer.url] = (layer, keep, gone)
+            fields = [f for f in wanted if f in layer.fields]
+            fields += [f for f in (layer.object_id_field, layer.edit_date_field) if f and f not in fields]
+            size = max(1, min(self.batch_size, layer.max_record_count))
+            batches += [(layer, ids[i:i + size], fields) for i in range(0, len(ids), size)]
+            if keep is not None:
+                print(f"      {layer.name}: {len(ids):,} changed, {len(keep):,} unchanged, {gone:,} deleted")
+            elif ids:
+                print(f"      {layer.name}: {len(ids):,} features")
+
+        def fetch_batch(batch):
+            try:
+                return batch[0].url, self._features(*batch)
+            except ArcGISError as e:
+                print(f"      Error on a {batch[0].name} batch: {str(e)[:80]}")
+                return batch[0].url, None
+
+        fetched: dict[str, list[dict]] = {}
+        if batches:
+            print(f"    {label}: {sum(len(b[1]) for b in batches):,} features in {len(batches)} batches")
+        for url, rows in ordered_map(fetch_batch, batches, self.workers):
+            if rows is None:
+                failed.add(url)
+            else:
+                fetched.setdefault(url, []).extend(rows)
+
+        # A layer that couldn't be pulled completely keeps its previous rows, so the
+        # snapshot doesn't lose them (and snapshot_diff doesn't record them as deletes)
+        features, kept, deleted = [], [], 0
+        for url, (layer, keep, gone) in plans.items():
+            if url in failed:
+                if previous is not None and (previous[LAYER_COL] == url).any():
+                    kept.append(previous[previous[LAYER_COL] == url])
+                    print(f"      {layer.name}: keeping {kept[-1].shape[0]:,} previous rows")
+                continue
+            features += fetched.get(url, [])
+            if keep is not None:
+                kept.append(keep)
+                deleted += gone
+        unchanged = pd.concat(kept, ignore_index=True) if kept else pd.DataFrame()
+        return HarvestResult(features, unchanged, deleted)
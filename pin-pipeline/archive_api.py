@@ -23,6 +23,8 @@ import os
 import duckdb
 from flask import Flask, request, jsonify
 
+from exceedance import sql_predicate
+
 app = Flask(__name__)
 
 R2_ACCOUNT_ID = os.environ.get("R2_ACCOUNT_ID", "")
@@ -112,14 +114,7 @@ def exceedances():
     sql = f"""
         SELECT stationId, date, parameter, value, unit
         FROM read_parquet('{path}')
-        WHERE (
-            (parameter = 'Dissolved oxygen (DO)' AND value < 5.0) OR
-            (parameter = 'Phosphorus' AND value > 0.1) OR
-            (parameter IN ('Total Nitrogen, mixed forms', 'Nitrogen')
-                AND value > 3.0) OR
-            (parameter = 'Escherichia coli' AND value > 410.0) OR
-            (parameter = 'Total suspended solids' AND value > 25.0)
-        )
+        WHERE {sql_predicate()}
         ORDER BY date DESC
         LIMIT ?
     """
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+PIN Compressed Stream — decompress HTTP downloads on the fly.
+
+WQP can send a result set zipped (`zip=yes`) and/or gzip-encoded on the wire.
+Either way the payload is CSV/JSON that compresses 5-10x, so asking for it
+compressed cuts transfer time on multi-GB state pulls. This module turns a
+`requests` streaming response into a plain byte/text stream for csv, pandas
+or json, without writing an intermediate file:
+
+  socket ──► Content-Encoding (gzip/deflate) ──► zip container ──► bytes
+             undone here, not by urllib3,         first entry,
+             so wire bytes can be counted         inflated as it arrives
+
+A zip container is recognised by its local-file-header signature, so the
+same call works whether or not the server honoured zip=yes.
+
+Usage:
+  resp = session.get(url, headers=ACCEPT_COMPRESSED, stream=True)
+  stats = TransferStats()
+  reader = csv.DictReader(open_text(resp, stats=stats))
+  ...
+  stats.wire_bytes, stats.decoded_bytes
+"""
+
+import io
+import struct
+import threading
+import zlib
+from typing import Iterable, Iterator, Optional
+
+# Only encodings zlib can undo — requests would otherwise also offer br/zstd
+# when those packages happen to be installed.
+ACCEPT_COMPRESSED = {"Accept-Encoding": "gzip, deflate"}
+
+CHUNK_SIZE = 64 * 1024
+
+_ZIP_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+_ZIP_SIGNATURE = b"PK\x03\x04"
+_ZIP_DATA_DESCRIPTOR_FLAG = 0x08
+_ZIP_STORED, _ZIP_DEFLATED = 0, 8
+
+
+class TransferStats:
+    """Byte counters for one or more downloads. Thread-safe to merge into."""
+
+    def __init__(self):
+        self.wire_bytes = 0       # as received (compressed)
+        self.decoded_bytes = 0    # after all decompression
+        self.container = None     # "zip" when a zip payload was unwrapped
+        self.encoding = None      # Content-Encoding, if any
+        self._lock = threading.Lock()
+
+    @property
+    def ratio(self) -> Optional[float]:
+        return self.decoded_bytes / self.wire_bytes if self.wire_bytes else None
+
+    def add(self, other: "TransferStats"):
+        with self._lock:
+            self.wire_bytes += other.wire_bytes
+            self.decoded_bytes += other.decoded_bytes
+
+    def to_dict(self) -> dict:
+        return {
+            "wireBytes": self.wire_bytes,
+            "decodedBytes": self.decoded_bytes,
+            "compressionRatio": round(self.ratio, 2) if self.ratio else None,
+        }
+
+    def __str__(self):
+        ratio = f", {self.ratio:.1f}x" if self.ratio else ""
+        return f"{self.wire_bytes / 1024:,.0f} KB wire → {self.decoded_bytes / 1024:,.0f} KB{ratio}"
+
+
+class CompressedStreamError(Exception):
+    """The payload could not be decompressed (corrupt or unsupported)."""
+
+
+# =============================================================================
+# Decoding stages (each takes and yields byte chunks)
+# =============================================================================
+
+def _wire_chunks(resp, stats: TransferStats) -> Iterator[bytes]:
+    """Raw bytes off the socket, Content-Encoding left intact."""
+    for chunk in resp.raw.stream(CHUNK_SIZE, decode_content=False):
+        stats.wire_bytes += len(chunk)
+        yield chunk
+
+
+def _content_decoded(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    """Undo gzip/deflate Content-Encoding."""
+    encoding = (encoding or "").strip().lower()
+    if encoding in ("", "identity"):
+        yield from chunks
+        return
+    if encoding in ("gzip", "x-gzip"):
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif encoding == "deflate":
+        d = None  # zlib-wrapped per spec, but some servers send raw deflate
+    else:
+        raise CompressedStreamError(f"Unsupported Content-Encoding: {encoding}")
+
+    for chunk in chunks:
+        if d is None:
+            zlib_wrapped = len(chunk) >= 2 and (chunk[0] & 0x0F) == 8 \
+                and (chunk[0] << 8 | chunk[1]) % 31 == 0
+            d = zlib.decompressobj(zlib.MAX_WBITS if zlib_wrapped else -zlib.MAX_WBITS)
+        yield d.decompress(chunk)
+    if d is not None:
+        yield d.flush()
+
+
+def _unzipped(chunks: Iterable[bytes], stats: TransferStats) -> Iterator[bytes]:
+    """
+    If the stream is a zip archive, yield its first entry's contents as they
+    inflate; otherwise pass the stream through unchanged. WQP zips hold a
+    single CSV/JSON file, so later entries and the central directory are
+    never read.
+    """
+    chunks = iter(chunks)
+    buf = b""
+    for chunk in chunks:
+        buf += chunk
+        if len(buf) >= _ZIP_LOCAL_HEADER.size:
+            break
+    if not buf.startswith(_ZIP_SIGNATURE):
+        if buf:
+            yield buf
+        yield from chunks
+        return
+
+    stats.container = "zip"
+    (_, _, flags, method, _, _, _, csize, _, name_len, extra_len) = \
+        _ZIP_LOCAL_HEADER.unpack_from(buf)
+    skip = _ZIP_LOCAL_HEADER.size + name_len + extra_len
+    while len(buf) < skip:
+        try:
+            buf += next(chunks)
+        except StopIteration:
+            raise CompressedStreamError("Truncated zip local header") from None
+    buf = buf[skip:]
+
+    if method == _ZIP_DEFLATED:
+        d = zlib.decompressobj(-zlib.MAX_WBITS)
+        for chunk in _prepend(buf, chunks):
+            yield d.decompress(chunk)
+            if d.eof:
+                return
+        yield d.flush()
+        if not d.eof:
+            raise CompressedStreamError("Zip entry ended before the deflate stream did")
+    elif method == _ZIP_STORED:
+        if flags & _ZIP_DATA_DESCRIPTOR_FLAG and not csize:
+            raise CompressedStreamError("Stored zip entry of unknown size can't be streamed")
+        remaining = csize
+        for chunk in _prepend(buf, chunks):
+            yield chunk[:remaining]
+            remaining -= len(chunk[:remaining])
+            if not remaining:
+                return
+    else:
+        raise CompressedStreamError(f"Unsupported zip compression method {method}")
+
+
+def _prepend(first: bytes, rest: Iterator[bytes]) -> Iterator[bytes]:
+    if first:
+        yield first
+    yield from rest
+
+
+def _counted(chunks: Iterable[bytes], stats: TransferStats) -> Iterator[bytes]:
+    for chunk in chunks:
+        if chunk:
+            stats.decoded_bytes += len(chunk)
+            yield chunk
+
+
+class _ChunkReader(io.RawIOBase):
+    """File-like view of a byte-chunk iterator."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buf = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf:
+            try:
+                self._buf = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+            except zlib.error as e:
+                raise CompressedStreamError(str(e)) from e
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+
+# =============================================================================
+# Public API
+# =============================================================================
+
+def open_stream(resp, stats: Optional[TransferStats] = None) -> io.BufferedReader:
+    """Decompressed binary stream over a `requests` response opened with stream=True."""
+    stats = stats if stats is not None else TransferStats()
+    stats.encoding = resp.headers.get("Content-Encoding")
+    chunks = _unzipped(_content_decoded(_wire_chunks(resp, stats), stats.encoding), stats)
+    return io.BufferedReader(_ChunkReader(_counted(chunks, stats)), CHUNK_SIZE)
+
+
+def response_encoding(resp) -> str:
+    """Text encoding of the decoded body (a zip's charset says nothing about its contents)."""
+    if resp.headers.get("Content-Type", "").startswith("application/zip"):
+        return "utf-8"
+    return resp.encoding or "utf-8"
+
+
+def open_text(resp, encoding: Optional[str] = None,
+              stats: Optional[TransferStats] = None) -> io.TextIOWrapper:
+    """Decompressed text stream, ready for csv.reader / json.load."""
+    return io.TextIOWrapper(open_stream(resp, stats), encoding=encoding or response_encoding(resp),
+                            newline="")
@@ -3,13 +3,23 @@
 Convert WQP JSON observation files to Parquet for cold storage.
 Run after fetch_wqp.py completes.
 
+Not needed when fetch_wqp.py runs with --format parquet (or both): it writes
+the same archive/wqp/{state}/{year}.parquet files directly. Use this to
+convert JSON chunks left over from earlier runs.
+
+--outputs rewrites fetch.py CSV outputs (output/*.csv) as typed, zstd
+Parquet with the same per-source schemas fetch.py --output-format parquet
+uses, replacing the CSVs.
+
 Usage:
     python convert_to_parquet.py                    # All states
     python convert_to_parquet.py --state MD         # Single state
     python convert_to_parquet.py --source-dir lib/wqp/observations
+    python convert_to_parquet.py --outputs pin-pipeline/output
 """
 
 import json
+import shutil
 import sys
 import argparse
 from pathlib import Path
@@ -20,6 +30,9 @@ except ImportError:
     print("pip install duckdb --break-system-packages")
     sys.exit(1)
 
+from output_files import write_output
+from spooled_csv import SpooledCSV, spool_path
+
 def convert_state(state_dir: Path, output_dir: Path):
     """Convert all year JSON files for one state to Parquet."""
     state = state_dir.name
@@ -52,13 +65,32 @@ def convert_state(state_dir: Path, output_dir: Path):
         ratio = json_size / pq_size if pq_size > 0 else 0
         print(f"    {json_size:.0f} KB -> {pq_size:.0f} KB ({ratio:.1f}x)")
 
+def convert_outputs(output_dir: Path, fmt: str = "parquet"):
+    """Rewrite fetch.py CSV outputs as typed columnar files (the CSVs are removed)."""
+    for csv_path in sorted(output_dir.glob("*.csv")):
+        csv_size = csv_path.stat().st_size / 1024
+        # Work from a spool copy: SpooledCSV deletes its file, and a failed write must keep the CSV
+        spool = spool_path(output_dir)
+        shutil.copyfile(csv_path, spool)
+        path, rows = write_output(SpooledCSV(spool), output_dir, csv_path.stem, fmt)
+
+        out_size = path.stat().st_size / 1024
+        ratio = csv_size / out_size if out_size > 0 else 0
+        print(f"  {csv_path.name} -> {path.name}: {rows:,} rows, "
+              f"{csv_size:.0f} KB -> {out_size:.0f} KB ({ratio:.1f}x)")
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--source-dir", default="lib/wqp/observations")
     parser.add_argument("--output-dir", default="archive/wqp")
     parser.add_argument("--state", default=None)
+    parser.add_argument("--outputs", metavar="DIR", help="Convert fetch.py CSV outputs in DIR instead")
     args = parser.parse_args()
 
+    if args.outputs:
+        convert_outputs(Path(args.outputs))
+        return
+
     source = Path(args.source_dir)
     output = Path(args.output_dir)
 
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+PIN efservice Pager — fetch whole EPA Envirofacts tables by row range.
+
+data.epa.gov/efservice serves at most one row range per request
+(`.../rows/0:9999/JSON`). Asking for a single 0:10000 range silently
+truncates ICIS DMR (100M+ rows nationally) or UCMR (2M+). This plans the
+full table from the COUNT endpoint and pulls it page by page:
+
+  COUNT/JSON ──► [0:9999] [10000:19999] ... [N-10000:N-1]
+                   │ fetched concurrently (bounded pool, shared per-host cap)
+                   └─► appended to a spool CSV in page order as they land
+
+Only a small window of pages is in flight or buffered at a time, so memory
+stays flat however large the table is. If COUNT is unavailable, pages are
+requested one after another until a short page comes back.
+
+Usage:
+  spooled = fetch_table("ICIS_DMR_MEASUREMENTS/STATE_CODE/MD", OUTPUT, label="DMR MD")
+  save_csv(spooled, "icis_dmr-MD")
+"""
+
+import csv
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import http_client
+from fetch_engine import ordered_map
+from spooled_csv import SpooledCSV, spool_path
+
+EFSERVICE_BASE = "https://data.epa.gov/efservice"
+PAGE_ROWS = 10_000        # rows per range request
+PAGE_WORKERS = 4          # pages in flight per table
+MAX_CONCURRENT = 4        # page requests in flight across all tables (one host)
+REQUEST_TIMEOUT = 180
+COUNT_TIMEOUT = 30
+MAX_RETRIES = 3
+
+# Shared by every fetch_table() call so parallel handlers don't multiply load on data.epa.gov
+_host_slots = threading.BoundedSemaphore(MAX_CONCURRENT)
+
+
+class EfserviceError(Exception):
+    """A page could not be fetched; the table would be incomplete."""
+
+
+def count_rows(path: str, timeout: int = COUNT_TIMEOUT) -> Optional[int]:
+    """Row count for an efservice table path, or None if COUNT isn't answering."""
+    try:
+        r = http_client.get(f"{EFSERVICE_BASE}/{path}/COUNT/JSON", timeout=timeout)
+        r.raise_for_status()
+        return int(r.json()[0]["TOTALQUERYRESULTS"])
+    except Exception:
+        return None
+
+
+def plan_pages(total: int, page_rows: int = PAGE_ROWS) -> list[tuple[int, int]]:
+    """Inclusive (first, last) row ranges covering `total` rows."""
+    return [(first, min(first + page_rows, total) - 1) for first in range(0, total, page_rows)]
+
+
+def fetch_page(path: str, first: int, last: int) -> list[dict]:
+    """
+    One row range. Connection errors and 429/5xx are retried by the HTTP
+    client; an unparseable or non-list body (how efservice reports an
+    overloaded query) is retried here with backoff.
+    """
+    url = f"{EFSERVICE_BASE}/{path}/rows/{first}:{last}/JSON"
+    for attempt in range(MAX_RETRIES):
+        try:
+            with _host_slots:
+                r = http_client.get(url, timeout=REQUEST_TIMEOUT)
+                r.raise_for_status()
+            rows = r.json()
+            if not isinstance(rows, list):
+                raise ValueError(f"unexpected response: {str(rows)[:80]}")
+            return rows
+        except ValueError as e:
+            if attempt == MAX_RETRIES - 1:
+                raise EfserviceError(f"rows {first}:{last} of {path}: {str(e)[:100]}") from e
+            time.sleep(5 * (attempt + 1))
+        except Exception as e:
+            raise EfserviceError(f"rows {first}:{last} of {path}: {str(e)[:100]}") from e
+
+
+class _PageWriter:
+    """Appends pages of JSON rows to a CSV; the header comes from the first non-empty page."""
+
+    def __init__(self, path: Path, extra: Optional[dict]):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = None
+        self._extra = extra or {}
+        self.rows = 0
+
+    def write(self, rows: list[dict]):
+        if not rows:
+            return
+        if self._writer is None:
+            fields = list(rows[0]) + [k for k in self._extra if k not in rows[0]]
+            self._writer = csv.DictWriter(self._file, fieldnames=fields, restval="",
+                                          extrasaction="ignore")
+            self._writer.writeheader()
+        for row in rows:
+            self._writer.writerow({**row, **self._extra} if self._extra else row)
+        self.rows += len(rows)
+
+    def close(self):
+        self._file.close()
+
+
+def fetch_table(path: str, directory: Path, label: str = "",
+                extra: Optional[dict] = None, workers: int = PAGE_WORKERS,
+                page_rows: int = PAGE_ROWS) -> Optional[SpooledCSV]:
+    """
+    Fetch every row of an efservice table path (e.g. "WATER_SYSTEM/STATE_CODE/MD")
+    into a spooled CSV. `extra` columns are added to every row. Returns None
+    for an empty table; raises EfserviceError if any page fails.
+    """
+    label = label or path
+    total = count_rows(path)
+    pages = plan_pages(total, page_rows) if total is not None else None
+    if total == 0:
+        return None
+
+    spool = spool_path(directory)
+    out = _PageWriter(spool, extra)
+    started = time.time()
+    try:
+        if pages is None:
+            # No COUNT — walk pages until a short one
+            print(f"    {label}: row count unavailable, paging sequentially")
+            first = 0
+            while True:
+                rows = fetch_page(path, first, first + page_rows - 1)
+                out.write(rows)
+                if len(rows) < page_rows:
+                    break
+                first += page_rows
+        else:
+            print(f"    {label}: {total:,} rows → {len(pages)} pages")
+            step = max(1, len(pages) // 10)
+            # Written in page order; only the window ahead is buffered
+            pages_done = ordered_map(lambda p: fetch_page(path, *p), pages, workers)
+            for done, rows in enumerate(pages_done, 1):
+                out.write(rows)
+                if len(pages) > 10 and done % step == 0:
+                    rate = out.rows / max(time.time() - started, 1e-6)
+                    eta = (total - out.rows) / rate if rate else 0
+                    print(f"    {label}: {done}/{len(pages)} pages, "
+                          f"{out.rows:,} rows, ~{eta:.0f}s left")
+            if out.rows != total:
+                print(f"    ⚠ {label}: COUNT said {total:,}, got {out.rows:,} (table changed mid-fetch?)")
+    except BaseException:
+        out.close()
+        spool.unlink(missing_ok=True)
+        raise
+    out.close()
+
+    if not out.rows:
+        spool.unlink(missing_ok=True)
+        return None
+    spooled = SpooledCSV(spool)
+    spooled.rows = out.rows
+    return spooled
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+PIN Fetch Estimator — expected rows, bytes and run time for a --dry-run plan.
+
+--dry-run used to print each job's URL (only SDWIS asked for a COUNT), so a
+batch's size was known only after running it. Now every handler's dry-run
+branch sends its source's cheapest sizing query and returns a Count, and the
+jobs run through the same engine and per-host gates as a real fetch:
+
+  WQP Result        HEAD → Total-Result-Count (falls back to the
+                    summary/monitoringLocation ResultCount per year and
+                    characteristic when the header is missing)
+  efservice         .../COUNT/JSON for each table
+  Socrata           count(*) since the previous output's :updated_at
+  ArcGIS            returnCountOnly on every matching layer
+  ECHO, catalogs    QueryRows / result count / CMR-Hits from a one-row page
+  NWIS              no count query — the entry's last fetch_rows
+
+The counts then go through the throughput model the scheduler learns:
+
+  rows    probe count, else the entry's fetch_rows (per job)
+  time    rows ÷ the entry's rows per second (fetch_rows / fetch_seconds),
+          else its host's median rate; with no rows or no rate, the
+          scheduler's cost estimate (entry history → host median → default)
+  bytes   rows × bytes per row of the previous output file, else the host's
+          median, else DEFAULT_ROW_BYTES (so: output bytes, not wire bytes)
+  wall    scheduler.estimated_wall over the jobs, per-host slots and --workers
+
+Usage:
+  counts, stats = probe_counts(jobs, workers=8)       # jobs built with dry_run=True
+  estimates = estimate_jobs([PlannedJob(job, entry, 56) ...], counts, OUTPUT, MANIFEST)
+  print_estimates(estimates, workers=8, probe_seconds=stats["seconds"])
+"""
+
+from pathlib import Path
+from statistics import median
+from typing import Iterable, NamedTuple, Optional
+
+from fetch_engine import FetchJob, HOST_LIMITS, run_jobs
+from fingerprint import Manifest
+from output_files import find_output, output_rows
+from scheduler import COST_FIELD, ROWS_FIELD, Candidate, estimated_wall, make_candidates
+
+PROBE_SPACING = 0.25      # seconds between probe starts on one host (fetches use HOST_LIMITS)
+DEFAULT_ROW_BYTES = 300   # no previous output on the job's host
+
+
+class Count(NamedTuple):
+    """What a dry-run probe returns: rows the fetch would pull, and who said so."""
+    rows: int
+    basis: str            # e.g. "efservice COUNT", "WQP summary"
+
+
+class PlannedJob(NamedTuple):
+    job: FetchJob
+    entry: dict           # registry entry whose cost model covers the job
+    share: int = 1        # jobs that entry's fetch_seconds / fetch_rows are summed over
+
+
+class JobEstimate(NamedTuple):
+    key: str
+    host: str
+    rows: Optional[int]   # None: no probe and no history
+    bytes: Optional[float]
+    seconds: float
+    basis: str
+
+
+def probe_host_limits() -> dict:
+    """HOST_LIMITS with start spacing cut to PROBE_SPACING; concurrency stays the same."""
+    return {host: (limit, min(spacing, PROBE_SPACING)) for host, (limit, spacing) in HOST_LIMITS.items()}
+
+
+def probe_counts(jobs: Iterable[FetchJob], workers: int) -> tuple[dict[str, Count], dict]:
+    """Run dry-run jobs concurrently; job key → Count for each probe that answered, plus run stats."""
+    counts = {}
+
+    def on_done(job, result, seconds):
+        if isinstance(result, Count):
+            counts[job.key] = result
+
+    stats = run_jobs(jobs, on_done, workers=workers, host_limits=probe_host_limits())
+    return counts, stats
+
+
+def entry_rate(entry: dict) -> Optional[float]:
+    """Rows per second of the entry's recorded fetches, or None without history."""
+    seconds, rows = entry.get(COST_FIELD), entry.get(ROWS_FIELD)
+    if not seconds or not rows:
+        return None
+    return float(rows) / float(seconds)
+
+
+def row_bytes(name: str, directory: Path, manifest: Manifest) -> Optional[float]:
+    """Bytes per row of the previous output file for `name`, or None."""
+    path = find_output(directory, name)
+    if path is None:
+        return None
+    rows = manifest.entries.get(name, {}).get("rows")
+    if rows is None or manifest.entries[name].get("file") != path.name:
+        rows = output_rows(path)
+    return path.stat().st_size / rows if rows else None
+
+
+def _host_medians(values: Iterable[tuple[str, Optional[float]]]) -> dict[str, float]:
+    by_host: dict[str, list[float]] = {}
+    for host, value in values:
+        if value:
+            by_host.setdefault(host, []).append(value)
+    return {host: median(v) for host, v in by_host.items()}
+
+
+def estimate_jobs(planned: list[PlannedJob], counts: dict[str, Count],
+                  directory: Path, manifest: Manifest) -> list[JobEstimate]:
+    """Rows, output bytes and busy seconds per planned job, in plan order."""
+    entries = {id(p.entry): p for p in planned}
+    history = {id(c.entry): c for c in make_candidates(
+        ("plan", p.job.key, p.entry, p.job.host, p.share) for p in entries.values())}
+    rates = {key: entry_rate(p.entry) for key, p in entries.items()}
+    host_rates = _host_medians((p.job.host, rates[id(p.entry)]) for p in planned)
+    sizes = {p.job.key: row_bytes(p.job.key, directory, manifest) for p in planned}
+    host_sizes = _host_medians((p.job.host, sizes[p.job.key]) for p in planned)
+
+    out = []
+    for p in planned:
+        count = counts.get(p.job.key)
+        if count is not None:
+            rows, basis = count.rows, count.basis
+        elif p.entry.get(ROWS_FIELD) is not None:
+            rows, basis = round(p.entry[ROWS_FIELD] / max(1, p.share)), "last fetch"
+        else:
+            rows, basis = None, "no count"
+
+        rate, rate_basis = rates[id(p.entry)], "own rate"
+        if rate is None:
+            rate, rate_basis = host_rates.get(p.job.host), "host rate"
+        if rows is not None and rate:
+            seconds = rows / rate
+        else:
+            cand = history[id(p.entry)]
+            seconds, rate_basis = cand.longest_job, "cost model" if p.entry.get(COST_FIELD) else "host default"
+
+        per_row = sizes[p.job.key] or host_sizes.get(p.job.host) or DEFAULT_ROW_BYTES
+        size = rows * per_row if rows is not None else None
+        out.append(JobEstimate(p.job.key, p.job.host, rows, size, seconds, f"{basis} · {rate_basis}"))
+    return out
+
+
+def _bytes(n: Optional[float]) -> str:
+    if n is None:
+        return "?"
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def _duration(seconds: float) -> str:
+    return f"{seconds:.0f}s" if seconds < 90 else f"{seconds / 60:.1f} min"
+
+
+def print_estimates(estimates: list[JobEstimate], workers: int, probe_seconds: Optional[float] = None):
+    if not estimates:
+        return
+    print(f"\n  ── Dry-Run Estimate ({len(estimates)} jobs, {workers} workers) ──\n")
+    print(f"  {'job':24s} {'rows':>13s} {'size':>10s} {'time':>9s}  basis")
+    for e in estimates:
+        rows = f"{e.rows:,}" if e.rows is not None else "?"
+        print(f"  {e.key:24s} {rows:>13s} {_bytes(e.bytes):>10s} {_duration(e.seconds):>9s}  {e.basis}")
+
+    known = [e for e in estimates if e.rows is not None]
+    busy = sum(e.seconds for e in estimates)
+    wall = estimated_wall([Candidate("plan", e.key, {}, e.host, 1, e.seconds, 0.0) for e in estimates], workers)
+    print(f"\n  Expected: {sum(e.rows for e in known):,} rows, {_bytes(sum(e.bytes for e in known))}"
+          f", {busy / 60:.1f} min busy → ~{wall / 60:.1f} min wall at {workers} workers")
+    if len(known) < len(estimates):
+        print(f"  ⚠ {len(estimates) - len(known)} jobs without a count or history — rows/bytes not included")
+    if probe_seconds is not None:
+        print(f"  Count probes took {probe_seconds:.1f}s")
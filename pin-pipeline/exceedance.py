@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+PIN Exceedance Engine — one set of screening rules for every consumer.
+
+  fetch_wqp.py        screens observation batches as they stream in
+  output.py           counts exceedances in fetched WQP CSVs
+  query_archive.py    \\ render the same rules as DuckDB SQL
+  archive_api.py      / for the Parquet archive
+
+Rules are evaluated column-wise: parameter names are factorized once, each
+distinct parameter gets a [low, high] bound, and the bounds are broadcast
+back to rows with a single take. No per-row Python, so a few million
+observations screen in milliseconds.
+
+Usage:
+  from exceedance import screen
+  hits = screen(parameters, values)       # any array-likes
+  hits.mask, hits.threshold, hits.percent_over
+"""
+
+from typing import NamedTuple, Sequence
+
+import numpy as np
+
+# Thresholds for exceedance detection (parameter → max acceptable value)
+# These are general screening levels — state-specific criteria vary
+EXCEEDANCE_THRESHOLDS = {
+    "Dissolved oxygen (DO)": {"threshold": 5.0, "direction": "below", "unit": "mg/l"},
+    "pH": {"threshold_low": 6.5, "threshold_high": 8.5, "direction": "range", "unit": "std units"},
+    "Total Nitrogen, mixed forms": {"threshold": 3.0, "direction": "above", "unit": "mg/l"},
+    "Nitrogen": {"threshold": 3.0, "direction": "above", "unit": "mg/l"},
+    "Phosphorus": {"threshold": 0.1, "direction": "above", "unit": "mg/l"},
+    "Total suspended solids": {"threshold": 25.0, "direction": "above", "unit": "mg/l"},
+    "Escherichia coli": {"threshold": 410.0, "direction": "above", "unit": "MPN/100ml"},
+    "Enterococcus": {"threshold": 130.0, "direction": "above", "unit": "MPN/100ml"},
+    "Fecal Coliform": {"threshold": 400.0, "direction": "above", "unit": "CFU/100ml"},
+    "Turbidity": {"threshold": 50.0, "direction": "above", "unit": "NTU"},
+}
+
+
+class Exceedances(NamedTuple):
+    """Row-aligned screening result. threshold/percent_over are NaN where mask is False."""
+    mask: np.ndarray          # bool
+    threshold: np.ndarray     # float64 — the bound that was crossed
+    percent_over: np.ndarray  # float64 — |value - threshold| / threshold
+
+
+def rule_bounds(names: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Per-name [low, high] acceptable bounds. Parameters without a rule get
+    (-inf, inf) so they can never exceed.
+    """
+    low = np.full(len(names), -np.inf)
+    high = np.full(len(names), np.inf)
+    for i, name in enumerate(names):
+        config = EXCEEDANCE_THRESHOLDS.get(name)
+        if not config:
+            continue
+        if config["direction"] == "above":
+            high[i] = config["threshold"]
+        elif config["direction"] == "below":
+            low[i] = config["threshold"]
+        elif config["direction"] == "range":
+            low[i] = config["threshold_low"]
+            high[i] = config["threshold_high"]
+    return low, high
+
+
+def screen_coded(codes, names: Sequence[str], values) -> Exceedances:
+    """
+    Screen dictionary-encoded observations.
+    `codes` index into `names` (negative = missing); `values` are floats (NaN = missing).
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+
+    low, high = rule_bounds(names)
+    # Slot len(names) is a sentinel for missing codes
+    low = np.append(low, -np.inf)
+    high = np.append(high, np.inf)
+    codes = np.where(codes < 0, len(names), codes)
+
+    row_low = low[codes]
+    row_high = high[codes]
+    below = values < row_low   # NaN compares False
+    above = values > row_high
+    mask = below | above
+
+    threshold = np.where(below, row_low, np.where(above, row_high, np.nan))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent_over = np.abs(values - threshold) / threshold
+    # Matches the legacy rule: a zero threshold never flags
+    mask &= threshold != 0
+    return Exceedances(mask, threshold, percent_over)
+
+
+def screen(parameters, values) -> Exceedances:
+    """Screen plain parameter-name / value arrays (lists, ndarrays, pandas Series)."""
+    # Hash-based factorize: one dict lookup per row, no sort
+    index: dict[str, int] = {}
+    codes = np.fromiter((index.setdefault(p, len(index)) for p in parameters),
+                        dtype=np.int64, count=len(parameters))
+    return screen_coded(codes, list(index), values)
+
+
+def screen_frame(df, parameter_col: str = "parameter", value_col: str = "value"):
+    """
+    Return the exceeding rows of a DataFrame with `threshold` and
+    `percentOver` columns added.
+    """
+    import pandas as pd
+
+    values = pd.to_numeric(df[value_col], errors="coerce").to_numpy(dtype=np.float64)
+    codes, names = pd.factorize(df[parameter_col])
+    hits = screen_coded(codes, list(names), values)
+    out = df.loc[hits.mask].copy()
+    out["threshold"] = hits.threshold[hits.mask]
+    out["percentOver"] = np.round(hits.percent_over[hits.mask], 4)
+    return out
+
+
+def screen_arrow(table, parameter_col: str = "parameter", value_col: str = "value"):
+    """Same as screen_frame() for a pyarrow Table or RecordBatch."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    params = table.column(parameter_col)
+    if isinstance(params, pa.ChunkedArray):
+        params = params.combine_chunks()
+    if not pa.types.is_dictionary(params.type):
+        params = pc.dictionary_encode(params)
+    codes = params.indices.to_numpy(zero_copy_only=False)
+    if params.indices.null_count:
+        codes = np.where(params.indices.is_null().to_numpy(zero_copy_only=False), -1, codes)
+    values = pc.cast(table.column(value_col), pa.float64()).to_numpy(zero_copy_only=False)
+
+    hits = screen_coded(codes, params.dictionary.to_pylist(), values)
+    mask = pa.array(hits.mask)
+    return (table.filter(mask)
+            .append_column("threshold", pa.array(hits.threshold[hits.mask]))
+            .append_column("percentOver", pa.array(np.round(hits.percent_over[hits.mask], 4))))
+
+
+# =============================================================================
+# SQL rendering (DuckDB)
+# =============================================================================
+
+def _sql_str(s: str) -> str:
+    return "'" + s.replace("'", "''") + "'"
+
+
+def _sql_rules(parameter_col: str, value_col: str):
+    """Yield (condition, threshold) pairs, one per crossed bound."""
+    for name, config in EXCEEDANCE_THRESHOLDS.items():
+        p = f"{parameter_col} = {_sql_str(name)}"
+        if config["direction"] == "above":
+            t = config["threshold"]
+            yield f"{p} AND {value_col} > {t}", t
+        elif config["direction"] == "below":
+            t = config["threshold"]
+            yield f"{p} AND {value_col} < {t}", t
+        elif config["direction"] == "range":
+            lo, hi = config["threshold_low"], config["threshold_high"]
+            yield f"{p} AND {value_col} < {lo}", lo
+            yield f"{p} AND {value_col} > {hi}", hi
+
+
+def sql_predicate(parameter_col: str = "parameter", value_col: str = "value") -> str:
+    """WHERE-clause fragment that is true for exceeding rows."""
+    return "(" + " OR ".join(f"({cond})" for cond, _ in _sql_rules(parameter_col, value_col)) + ")"
+
+
+def sql_threshold(parameter_col: str = "parameter", value_col: str = "value") -> str:
+    """CASE expression giving the crossed threshold (NULL when not exceeding)."""
+    whens = "\n".join(f"    WHEN {cond} THEN {t}" for cond, t in _sql_rules(parameter_col, value_col))
+    return f"CASE\n{whens}\n    ELSE NULL\nEND"
+
+
+def sql_percent_over(parameter_col: str = "parameter", value_col: str = "value") -> str:
+    """Fractional distance past the threshold (NULL when not exceeding)."""
+    t = sql_threshold(parameter_col, value_col)
+    return f"(ABS({value_col} - ({t})) / ({t}))"
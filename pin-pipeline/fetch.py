@@ -4,26 +4,52 @@ PIN Fetcher — priority-sorted data fetcher. Reads registry, pulls live sources
 
 Usage:
   python fetch.py --segment federal --from 2024-01-01 --dry-run
+  python fetch.py --next-batch 4 --dry-run            # Count probes → expected rows, size, run time
   python fetch.py --all-states --from 2024-01-01
   python fetch.py --states MD,FL,CA --from 2024-01-01
   python fetch.py --source usgs-nwis --from 2024-01-01
   python fetch.py --next-batch 4 --from 2024-01-01   # Scheduler mode
+  python fetch.py --segment federal --workers 1      # One source at a time
+  python fetch.py --next-batch 4 --output-format parquet   # Typed zstd Parquet in output/
+
+Independent sources and states are fetched concurrently (fetch_engine.py),
+capped per API host so no single provider sees more than a few requests.
+--dry-run sends each job's count query instead of its fetch, concurrently,
+and prints the expected rows, bytes and run time (estimate.py).
 """
 
 import argparse
-import io
+import csv
 import json
 import os
 import sys
-import time
 import requests
 import pandas as pd
 from datetime import datetime
+from functools import partial
 from pathlib import Path
+from urllib.parse import urlsplit
+
+from arcgis import (EDITED_COL, LAT_COL, LAYER_COL, LAYER_NAME_COL, LON_COL, OBJECTID_COL,
+                    ArcGISHarvester)
+from compressed_stream import TransferStats, open_stream, open_text
+from estimate import Count, PlannedJob, estimate_jobs, print_estimates, probe_counts
+from fetch_engine import DEFAULT_WORKERS, FetchJob, run_jobs
+from efservice import count_rows, fetch_table
+from fingerprint import MANIFEST_FILE, Manifest, fingerprint
+import http_client
+from nwis_iv import parse_iv
+from output_files import DEFAULT_FORMAT, FORMATS, as_csv, find_output, read_output, write_output
+from registry_store import RegistryStore
+from scheduler import CostRecorder, estimated_wall, make_candidates, plan_budget
+from snapshot_diff import DELTA_KEEP_DAYS, ChangeStore, prune_deltas
+from socrata import SocrataDataset, max_updated_at, updated_since
+from spooled_csv import SpooledCSV, concat_spools, spool_stream
 
 DIR = Path(__file__).parent
-REGISTRY = DIR / "registry.json"
 OUTPUT = DIR / "output"
+MANIFEST = Manifest(OUTPUT / MANIFEST_FILE)   # last payload fingerprint per output name
+_changes = None                               # ChangeStore, opened on first save
 
 # WQP characteristic names → our param keys
 WQP_PARAMS = {
@@ -45,6 +71,10 @@ WQP_PARAMS = {
     "Secchi depth":                 "secchi",
 }
 
+# WQP CSV columns are all read as strings (values mix numbers with text like
+# "ND", IDs keep leading zeros); list overrides here if a typed column is needed.
+WQP_CSV_DTYPES = {}
+
 # USGS parameter codes → our param keys
 USGS_CODES = {
     "00300": "DO",
@@ -57,47 +87,87 @@ USGS_CODES = {
     "00480": "salinity",
 }
 
-DELAY_BETWEEN_PULLS = 2  # seconds
+WQP_HOST = "www.waterqualitydata.us"
+WQP_COUNT_HEADER = "Total-Result-Count"   # sent on HEAD (and GET) Result queries
+ECHO_RESPONSESET = 10000                  # facilities per ECHO call; the handlers make one
 
 
-def load_registry():
-    with open(REGISTRY) as f:
-        return json.load(f)
+def save_registry(store, reg):
+    """Write what this run changed to the registry store and refresh registry.json."""
+    store.save(reg)
+    store.export_json()
 
 
-def save_registry(reg):
-    reg["meta"]["updated"] = datetime.utcnow().isoformat() + "Z"
-    with open(REGISTRY, "w") as f:
-        json.dump(reg, f, indent=2)
+def wqp_count(url):
+    """Result count for a WQP query from its count header (HEAD — no rows are built), or None."""
+    r = http_client.head(url, timeout=120)
+    r.raise_for_status()
+    total = r.headers.get(WQP_COUNT_HEADER)
+    return int(total) if total is not None else None
 
 
-def fetch_wqp_state(abbr, fips, start_date, dry_run=False):
-    """Fetch WQP discrete samples for a single state. Returns DataFrame or None."""
-    params_str = ";".join(WQP_PARAMS.keys())
+def wqp_summary_count(fips, start_date):
+    """Results for our characteristics in a state from WQP's per-site period-of-record
+    summary. The summary is by year, so the whole of start_date's year counts."""
+    years = "5" if start_date.year > datetime.utcnow().year - 5 else "all"
     url = (
+        f"https://www.waterqualitydata.us/data/summary/monitoringLocation/search"
+        f"?statecode=US:{fips}&dataProfile=periodOfRecord&summaryYears={years}"
+        f"&mimeType=csv&zip=yes"
+    )
+    total = 0
+    with http_client.get(url, timeout=300, stream=True) as r:
+        r.raise_for_status()
+        for row in csv.DictReader(open_text(r)):
+            if (row.get("CharacteristicName") in WQP_PARAMS
+                    and int(row.get("YearSummarized") or 0) >= start_date.year):
+                total += int(float(row.get("ResultCount") or 0))
+    return total
+
+
+def wqp_state_url(fips, start_date):
+    params_str = ";".join(WQP_PARAMS.keys())
+    return (
         f"https://www.waterqualitydata.us/data/Result/search"
         f"?statecode=US:{fips}"
         f"&characteristicName={requests.utils.quote(params_str)}"
         f"&startDateLo={start_date.strftime('%m-%d-%Y')}"
-        f"&mimeType=csv&sorted=no&zip=no"
+        f"&mimeType=csv&sorted=no&zip=yes"
     )
 
+
+def fetch_wqp_state(abbr, fips, start_date, dry_run=False):
+    """Fetch WQP discrete samples for a single state. Returns DataFrame or None
+    (a Count with dry_run)."""
+    url = wqp_state_url(fips, start_date)
+
     if dry_run:
-        print(f"  [DRY RUN] wqp-{abbr}: would fetch")
-        print(f"            {url[:120]}...")
-        return None
+        try:
+            total = wqp_count(url)
+            if total is not None:
+                return Count(total, "WQP count")
+        except Exception as e:
+            print(f"    ⚠ wqp-{abbr}: count header unavailable ({str(e)[:60]}) — trying summary")
+        try:
+            return Count(wqp_summary_count(fips, start_date), "WQP summary")
+        except Exception as e:
+            print(f"    ❌ wqp-{abbr}: no count ({str(e)[:80]})")
+            return None
 
     print(f"  Fetching wqp-{abbr} from {start_date.strftime('%Y-%m-%d')}...")
     try:
-        r = requests.get(url, timeout=300, stream=True)
+        r = http_client.get(url, timeout=300, stream=True)
         r.raise_for_status()
-        content = r.text
-        if not content.strip():
+        # Zipped on the wire, inflated straight to a spool file; save_csv parses it in chunks
+        stats = TransferStats()
+        with r:
+            spooled = spool_stream(open_stream(r, stats), OUTPUT, WQP_CSV_DTYPES)
+        if spooled.empty:
+            spooled.close()
             print(f"    ⚠ wqp-{abbr}: empty response")
             return None
-        df = pd.read_csv(io.StringIO(content), low_memory=False)
-        print(f"    ✅ wqp-{abbr}: {len(df):,} results")
-        return df
+        print(f"    ✅ wqp-{abbr}: spooled {spooled.size / (1024 * 1024):.1f} MB ({stats})")
+        return spooled
     except requests.exceptions.Timeout:
         print(f"    ⚠ wqp-{abbr}: timeout (5 min)")
         return None
@@ -121,140 +191,106 @@ def fetch_usgs_nwis(state_cd, start_date, dry_run=False):
     )
 
     if dry_run:
-        print(f"  [DRY RUN] usgs-nwis ({state_cd}): would fetch")
-        print(f"            {url[:120]}...")
-        return None
+        return None   # IV has no count query; the estimate uses the last fetch's rows
 
     print(f"  Fetching USGS NWIS {state_cd}...")
     try:
-        r = requests.get(url, timeout=120)
-        r.raise_for_status()
-        data = r.json()
-        ts_list = data.get("value", {}).get("timeSeries", [])
-        if not ts_list:
+        with http_client.get(url, timeout=120, stream=True) as r:
+            r.raise_for_status()
+            table = parse_iv(open_stream(r), USGS_CODES)
+        if not len(table):
             print(f"    ⚠ NWIS {state_cd}: no time series")
             return None
 
-        rows = []
-        for ts in ts_list:
-            site = ts.get("sourceInfo", {})
-            variable = ts.get("variable", {})
-            param_cd = variable.get("variableCode", [{}])[0].get("value", "")
-            param_key = USGS_CODES.get(param_cd, param_cd)
-            site_name = site.get("siteName", "")
-            site_code = site.get("siteCode", [{}])[0].get("value", "")
-            lat = site.get("geoLocation", {}).get("geogLocation", {}).get("latitude")
-            lon = site.get("geoLocation", {}).get("geogLocation", {}).get("longitude")
-
-            for val_entry in ts.get("values", [{}])[0].get("value", []):
-                rows.append({
-                    "source": "USGS",
-                    "site_id": site_code,
-                    "site_name": site_name,
-                    "lat": lat,
-                    "lon": lon,
-                    "param": param_key,
-                    "value": val_entry.get("value"),
-                    "unit": variable.get("unit", {}).get("unitCode", ""),
-                    "datetime": val_entry.get("dateTime"),
-                    "qualifier": val_entry.get("qualifiers", [None])[0],
-                })
-
-        df = pd.DataFrame(rows)
-        print(f"    ✅ NWIS {state_cd}: {len(df):,} readings across {len(ts_list)} series")
+        df = table.to_frame()
+        print(f"    ✅ NWIS {state_cd}: {len(df):,} readings across {table.series_count} series")
         return df
     except Exception as e:
         print(f"    ❌ NWIS {state_cd}: {str(e)[:100]}")
         return None
 
 
-def fetch_sdwis(state_cd, dry_run=False):
-    """Fetch EPA SDWIS drinking water systems for a state."""
-    url = f"https://data.epa.gov/efservice/WATER_SYSTEM/STATE_CODE/{state_cd}/JSON"
-
+def fetch_efservice(path, label, noun, dry_run=False, extra=None):
+    """Fetch a whole EPA efservice table in concurrent row-range pages. Returns SpooledCSV or None
+    (a Count with dry_run)."""
     if dry_run:
-        count_url = f"https://data.epa.gov/efservice/WATER_SYSTEM/STATE_CODE/{state_cd}/COUNT/JSON"
-        try:
-            r = requests.get(count_url, timeout=15)
-            count = r.json()[0].get("TOTALQUERYRESULTS", "?") if r.ok else "?"
-        except Exception:
-            count = "?"
-        print(f"  [DRY RUN] sdwis ({state_cd}): {count} systems")
-        return None
+        total = count_rows(path, timeout=15)
+        if total is None:
+            print(f"    ⚠ {label}: COUNT not answering")
+            return None
+        return Count(total, "efservice COUNT")
 
-    print(f"  Fetching SDWIS {state_cd}...")
+    print(f"  Fetching {label}...")
     try:
-        r = requests.get(url, timeout=120)
-        r.raise_for_status()
-        data = r.json()
-        df = pd.DataFrame(data)
-        print(f"    ✅ SDWIS {state_cd}: {len(df):,} water systems")
-        return df
+        spooled = fetch_table(path, OUTPUT, label=label, extra=extra)
+        if spooled is None:
+            print(f"    ⚠ {label}: no rows")
+            return None
+        print(f"    ✅ {label}: {spooled.rows:,} {noun}")
+        return spooled
     except Exception as e:
-        print(f"    ❌ SDWIS {state_cd}: {str(e)[:100]}")
+        print(f"    ❌ {label}: {str(e)[:100]}")
         return None
 
 
+def fetch_sdwis(state_cd, dry_run=False):
+    """Fetch EPA SDWIS drinking water systems for a state."""
+    return fetch_efservice(f"WATER_SYSTEM/STATE_CODE/{state_cd}", f"SDWIS {state_cd}",
+                           "water systems", dry_run=dry_run)
+
+
 def fetch_icis_npdes(state_cd, dry_run=False):
     """Fetch EPA ICIS-NPDES permits for a state."""
     tables = ["ICIS_PERMITS", "ICIS_VIOLATIONS", "ICIS_INSPECTIONS", "ICIS_ENFORCEMENT_ACTIONS"]
-    all_rows = []
+    spools = []
     for table in tables:
-        url = f"https://data.epa.gov/efservice/{table}/STATE_CODE/{state_cd}/rows/0:10000/JSON"
-        if dry_run:
-            print(f"  [DRY RUN] icis_npdes ({state_cd}/{table}): would fetch")
-            print(f"            {url[:120]}...")
-            continue
-        print(f"  Fetching ICIS {table} for {state_cd}...")
-        try:
-            r = requests.get(url, timeout=120)
-            r.raise_for_status()
-            data = r.json()
-            for row in data:
-                row["_table"] = table
-            all_rows.extend(data)
-            print(f"    ✅ {table} {state_cd}: {len(data):,} records")
-        except Exception as e:
-            print(f"    ❌ {table} {state_cd}: {str(e)[:100]}")
-        time.sleep(1)  # 1s between EPA requests
+        spooled = fetch_efservice(f"{table}/STATE_CODE/{state_cd}", f"{table} {state_cd}",
+                                  "records", dry_run=dry_run, extra={"_table": table})
+        if spooled is not None:
+            spools.append(spooled)
 
-    if dry_run:
+    if not spools:
         return None
-    if not all_rows:
-        return None
-    return pd.DataFrame(all_rows)
+    if dry_run:
+        basis = "efservice COUNT" + (f" ({len(spools)}/{len(tables)} tables)" if len(spools) < len(tables) else "")
+        return Count(sum(c.rows for c in spools), basis)
+    # One CSV across all four tables, columns unioned
+    return concat_spools(spools, OUTPUT)
 
 
 def fetch_icis_dmr(state_cd, dry_run=False):
-    """Fetch EPA ICIS DMR measurements for a state. VERY large — filtered by state."""
-    url = f"https://data.epa.gov/efservice/ICIS_DMR_MEASUREMENTS/STATE_CODE/{state_cd}/rows/0:10000/JSON"
-    if dry_run:
-        print(f"  [DRY RUN] icis_dmr ({state_cd}): would fetch")
-        print(f"            {url[:120]}...")
-        return None
-    print(f"  Fetching ICIS DMR {state_cd}...")
+    """Fetch EPA ICIS DMR measurements for a state. VERY large — filtered by state, paged."""
+    return fetch_efservice(f"ICIS_DMR_MEASUREMENTS/STATE_CODE/{state_cd}", f"DMR {state_cd}",
+                           "measurements", dry_run=dry_run)
+
+
+def echo_url(state_cd, violations=False, responseset=ECHO_RESPONSESET):
+    return (f"https://echodata.epa.gov/echo/cwa_rest_services.get_facilities?output=JSON&p_st={state_cd}"
+            f"{'&p_qiv=Y' if violations else ''}&responseset={responseset}")
+
+
+def echo_count(state_cd, violations=False):
+    """Facilities an ECHO handler would get: QueryRows from a one-facility page, capped at
+    the one page of ECHO_RESPONSESET the handler asks for."""
+    label = f"ECHO {'violations' if violations else 'facilities'} {state_cd}"
     try:
-        r = requests.get(url, timeout=180)
+        r = http_client.get(echo_url(state_cd, violations, responseset=1), timeout=60)
         r.raise_for_status()
-        data = r.json()
-        df = pd.DataFrame(data)
-        print(f"    ✅ DMR {state_cd}: {len(df):,} measurements")
-        return df
+        rows = int(r.json()["Results"]["QueryRows"])
+        return Count(min(rows, ECHO_RESPONSESET), "ECHO QueryRows")
     except Exception as e:
-        print(f"    ❌ DMR {state_cd}: {str(e)[:100]}")
+        print(f"    ❌ {label}: no count ({str(e)[:80]})")
         return None
 
 
 def fetch_echo_facilities(state_cd, dry_run=False):
     """Fetch EPA ECHO CWA facility compliance data for a state."""
-    url = f"https://echodata.epa.gov/echo/cwa_rest_services.get_facilities?output=JSON&p_st={state_cd}&responseset=10000"
+    url = echo_url(state_cd)
     if dry_run:
-        print(f"  [DRY RUN] echo_facilities ({state_cd}): would fetch")
-        print(f"            {url[:120]}...")
-        return None
+        return echo_count(state_cd)
     print(f"  Fetching ECHO facilities {state_cd}...")
     try:
-        r = requests.get(url, timeout=120)
+        r = http_client.get(url, timeout=120)
         r.raise_for_status()
         data = r.json()
         facilities = data.get("Results", {}).get("Facilities", [])
@@ -271,14 +307,12 @@ def fetch_echo_facilities(state_cd, dry_run=False):
 
 def fetch_echo_violations(state_cd, dry_run=False):
     """Fetch EPA ECHO CWA facilities in violation for a state."""
-    url = f"https://echodata.epa.gov/echo/cwa_rest_services.get_facilities?output=JSON&p_st={state_cd}&p_qiv=Y&responseset=10000"
+    url = echo_url(state_cd, violations=True)
     if dry_run:
-        print(f"  [DRY RUN] echo_violations ({state_cd}): would fetch")
-        print(f"            {url[:120]}...")
-        return None
+        return echo_count(state_cd, violations=True)
     print(f"  Fetching ECHO violations {state_cd}...")
     try:
-        r = requests.get(url, timeout=120)
+        r = http_client.get(url, timeout=120)
         r.raise_for_status()
         data = r.json()
         facilities = data.get("Results", {}).get("Facilities", [])
@@ -295,78 +329,40 @@ def fetch_echo_violations(state_cd, dry_run=False):
 
 def fetch_frs_wwtps(dry_run=False):
     """Fetch EPA FRS WWTP locations (nationwide — no state filter)."""
-    url = "https://data.epa.gov/efservice/FRS_PROGRAM_FACILITY/PGM_SYS_ACRNM/NPDES/rows/0:10000/JSON"
-    if dry_run:
-        print(f"  [DRY RUN] frs_wwtps: would fetch")
-        print(f"            {url[:120]}...")
-        return None
-    print(f"  Fetching FRS WWTPs...")
-    try:
-        r = requests.get(url, timeout=120)
-        r.raise_for_status()
-        data = r.json()
-        df = pd.DataFrame(data)
-        print(f"    ✅ FRS WWTPs: {len(df):,} facilities")
-        return df
-    except Exception as e:
-        print(f"    ❌ FRS WWTPs: {str(e)[:100]}")
-        return None
+    return fetch_efservice("FRS_PROGRAM_FACILITY/PGM_SYS_ACRNM/NPDES", "FRS WWTPs", "facilities",
+                           dry_run=dry_run)
 
 
 def fetch_pfas_ucmr(dry_run=False):
     """Fetch EPA UCMR PFAS screening data (nationwide)."""
-    url = "https://data.epa.gov/efservice/UCMR4_ALL/rows/0:10000/JSON"
-    if dry_run:
-        print(f"  [DRY RUN] pfas_ucmr: would fetch")
-        print(f"            {url[:120]}...")
-        return None
-    print(f"  Fetching UCMR PFAS data...")
-    try:
-        r = requests.get(url, timeout=120)
-        r.raise_for_status()
-        data = r.json()
-        df = pd.DataFrame(data)
-        print(f"    ✅ UCMR PFAS: {len(df):,} results")
-        return df
-    except Exception as e:
-        print(f"    ❌ UCMR PFAS: {str(e)[:100]}")
-        return None
+    return fetch_efservice("UCMR4_ALL", "UCMR PFAS", "results", dry_run=dry_run)
 
 
 def fetch_cdc_nwss(dry_run=False):
     """Fetch CDC NWSS wastewater surveillance data."""
-    url = "https://data.cdc.gov/resource/2ew6-ywp6.json?$limit=50000&$order=date_end%20DESC"
-    if dry_run:
-        print(f"  [DRY RUN] cdc_nwss: would fetch")
-        print(f"            {url[:120]}...")
-        return None
-    print(f"  Fetching CDC NWSS wastewater surveillance...")
-    try:
-        r = requests.get(url, timeout=120)
-        r.raise_for_status()
-        data = r.json()
-        df = pd.DataFrame(data)
-        print(f"    ✅ CDC NWSS: {len(df):,} records")
-        return df
-    except Exception as e:
-        print(f"    ❌ CDC NWSS: {str(e)[:100]}")
-        return None
+    return fetch_socrata("cdc_nwss", "https://data.cdc.gov/resource/2ew6-ywp6.json", "CDC NWSS",
+                         dry_run=dry_run)
 
 
 def fetch_nps_wq(dry_run=False):
     """Fetch National Park Service water quality data via WQP."""
-    url = "https://www.waterqualitydata.us/data/Result/search?organization=NPSTORET&mimeType=json&zip=no&sorted=no"
+    url = "https://www.waterqualitydata.us/data/Result/search?organization=NPSTORET&mimeType=json&zip=yes&sorted=no"
     if dry_run:
-        print(f"  [DRY RUN] nps_wq: would fetch")
-        print(f"            {url[:120]}...")
-        return None
+        try:
+            total = wqp_count(url)
+            return Count(total, "WQP count") if total is not None else None
+        except Exception as e:
+            print(f"    ❌ NPS WQ: no count ({str(e)[:80]})")
+            return None
     print(f"  Fetching NPS water quality via WQP...")
     try:
-        r = requests.get(url, timeout=300, stream=True)
+        r = http_client.get(url, timeout=300, stream=True)
         r.raise_for_status()
-        data = r.json()
+        stats = TransferStats()
+        with r:
+            data = json.load(open_text(r, stats=stats))
         df = pd.DataFrame(data)
-        print(f"    ✅ NPS WQ: {len(df):,} results")
+        print(f"    ✅ NPS WQ: {len(df):,} results ({stats})")
         return df
     except Exception as e:
         print(f"    ❌ NPS WQ: {str(e)[:100]}")
@@ -377,12 +373,16 @@ def fetch_datagov_wq(dry_run=False):
     """Fetch Data.gov water quality catalog metadata."""
     url = "https://catalog.data.gov/api/3/action/package_search?fq=tags:water-quality&rows=200"
     if dry_run:
-        print(f"  [DRY RUN] datagov_wq: would fetch catalog metadata")
-        print(f"            {url[:120]}...")
-        return None
+        try:
+            r = http_client.get(url.replace("rows=200", "rows=0"), timeout=60)
+            r.raise_for_status()
+            return Count(min(int(r.json()["result"]["count"]), 200), "CKAN count")
+        except Exception as e:
+            print(f"    ❌ Data.gov catalog: no count ({str(e)[:80]})")
+            return None
     print(f"  Fetching Data.gov WQ catalog...")
     try:
-        r = requests.get(url, timeout=60)
+        r = http_client.get(url, timeout=60)
         r.raise_for_status()
         data = r.json()
         results = data.get("result", {}).get("results", [])
@@ -401,12 +401,16 @@ def fetch_nasa_cmr(dry_run=False):
     """Fetch NASA CMR satellite dataset catalog metadata."""
     url = "https://cmr.earthdata.nasa.gov/search/collections.json?keyword=water+quality&page_size=50"
     if dry_run:
-        print(f"  [DRY RUN] nasa_cmr: would fetch catalog metadata")
-        print(f"            {url[:120]}...")
-        return None
+        try:
+            r = http_client.get(url.replace("page_size=50", "page_size=0"), timeout=60)
+            r.raise_for_status()
+            return Count(min(int(r.headers["CMR-Hits"]), 50), "CMR-Hits")
+        except Exception as e:
+            print(f"    ❌ NASA CMR: no count ({str(e)[:80]})")
+            return None
     print(f"  Fetching NASA CMR catalog...")
     try:
-        r = requests.get(url, timeout=60)
+        r = http_client.get(url, timeout=60)
         r.raise_for_status()
         data = r.json()
         entries = data.get("feed", {}).get("entry", [])
@@ -421,154 +425,119 @@ def fetch_nasa_cmr(dry_run=False):
         return None
 
 
-def fetch_mde_arcgis(dry_run=False):
-    """Fetch MDE ArcGIS water quality assessment data for Maryland.
-    Tries three endpoints in order until one works."""
-    endpoints = [
-        ("MDE GeoData", "https://mde.geodata.md.gov/arcgis/rest/services/Water_Quality"),
-        ("MDE Win64", "https://mdewin64.mde.state.md.us/arcgis/rest/services"),
-        ("ArcGIS Online", "https://services.arcgis.com/njFNhDsUCentVYJW/ArcGIS/rest/services"),
-    ]
-    service_keywords = ["water", "quality", "tmdl", "303d", "ir", "assessment", "impair"]
-
+def fetch_arcgis_portal(name, endpoints, keywords, out_fields, map_row=None, dry_run=False):
+    """Harvest matching layers from the first ArcGIS REST root in `endpoints` that has any.
+    Incremental against output/{name}.* (layers with editFieldsInfo). Returns DataFrame or None
+    (with dry_run, a Count of every matching layer's features — an upper bound for a delta pull)."""
     if dry_run:
         for label, url in endpoints:
-            print(f"  [DRY RUN] md-mde-arcgis ({label}): would probe {url}?f=json")
             try:
-                r = requests.get(f"{url}?f=json", timeout=15)
-                if r.ok:
-                    data = r.json()
-                    services = data.get("services", [])
-                    matched = [s for s in services if any(kw in s.get("name", "").lower() for kw in service_keywords)]
-                    print(f"    Found {len(services)} services, {len(matched)} matching WQ keywords")
-                    return None
-                else:
-                    print(f"    HTTP {r.status_code}")
+                total = ArcGISHarvester(url, keywords).count()
             except Exception as e:
-                print(f"    Unreachable: {str(e)[:80]}")
+                print(f"    {name} ({label}) unreachable: {str(e)[:80]}")
+                continue
+            if total:
+                return Count(total, f"ArcGIS count, {label}")
         return None
 
-    all_rows = []
+    previous_path = find_output(OUTPUT, name)
+    previous = read_output(previous_path) if previous_path else None
     for label, base_url in endpoints:
         print(f"  Trying {label}: {base_url}")
         try:
-            r = requests.get(f"{base_url}?f=json", timeout=30)
-            if not r.ok:
-                print(f"    HTTP {r.status_code} — skipping")
-                continue
-            data = r.json()
-            services = data.get("services", [])
-            matched = [s for s in services
-                       if s.get("type") in ("MapServer", "FeatureServer")
-                       and any(kw in s.get("name", "").lower() for kw in service_keywords)]
-
-            # Also check folders
-            for folder in data.get("folders", []):
-                if any(kw in folder.lower() for kw in service_keywords):
-                    try:
-                        fr = requests.get(f"{base_url}/{folder}?f=json", timeout=15)
-                        if fr.ok:
-                            for s in fr.json().get("services", []):
-                                if s.get("type") in ("MapServer", "FeatureServer"):
-                                    matched.append(s)
-                    except Exception:
-                        pass
-
-            if not matched:
-                print(f"    No matching WQ services — skipping")
-                continue
-
-            print(f"    Found {len(matched)} WQ services")
-
-            for svc in matched:
-                svc_url = f"{base_url}/{svc['name']}/{svc['type']}"
-                try:
-                    lr = requests.get(f"{svc_url}?f=json", timeout=15)
-                    if not lr.ok:
-                        continue
-                    layers = lr.json().get("layers", [])
-                    for layer in layers:
-                        lid = layer["id"]
-                        lname = layer.get("name", f"Layer {lid}")
-                        offset = 0
-                        page_count = 0
-                        while True:
-                            qurl = (f"{svc_url}/{lid}/query?where=1%3D1&outFields=*"
-                                    f"&returnGeometry=true&resultOffset={offset}"
-                                    f"&resultRecordCount=2000&f=json")
-                            qr = requests.get(qurl, timeout=60)
-                            if not qr.ok:
-                                break
-                            qdata = qr.json()
-                            features = qdata.get("features", [])
-                            if not features:
-                                break
-                            for feat in features:
-                                attrs = feat.get("attributes", {})
-                                geom = feat.get("geometry", {})
-                                lat = geom.get("y") or attrs.get("LATITUDE") or attrs.get("LAT")
-                                lon = geom.get("x") or attrs.get("LONGITUDE") or attrs.get("LON")
-                                row = {
-                                    "au_id": (attrs.get("AU_ID") or attrs.get("ASSESSMENT_UNIT_ID")
-                                              or attrs.get("AUID") or str(attrs.get("OBJECTID", ""))),
-                                    "au_name": (attrs.get("AU_NAME") or attrs.get("WATER_NAME")
-                                                or attrs.get("NAME") or ""),
-                                    "water_type": attrs.get("WATER_TYPE", attrs.get("AU_TYPE", "unknown")),
-                                    "category": (attrs.get("IR_CATEGORY") or attrs.get("CATEGORY") or ""),
-                                    "cause": (attrs.get("CAUSE") or attrs.get("CAUSES")
-                                              or attrs.get("POLLUTANT") or ""),
-                                    "tmdl_status": attrs.get("TMDL_STATUS", "na"),
-                                    "tmdl_date": attrs.get("TMDL_DATE") or attrs.get("TMDL_APPROVAL_DATE"),
-                                    "lat": lat,
-                                    "lon": lon,
-                                    "source_layer": lname,
-                                }
-                                all_rows.append(row)
-                            offset += len(features)
-                            page_count += 1
-                            if qdata.get("exceededTransferLimit") is False or len(features) < 2000:
-                                break
-                            time.sleep(2)
-                        if page_count > 0:
-                            print(f"      {lname}: {offset} features ({page_count} pages)")
-                except Exception as e:
-                    print(f"      Error on {svc['name']}: {str(e)[:80]}")
-                time.sleep(5)
-
-            if all_rows:
-                break  # Success — stop trying other endpoints
+            result = ArcGISHarvester(base_url, keywords).harvest(out_fields, previous, label=label)
         except Exception as e:
             print(f"    {label} failed: {str(e)[:80]}")
+            continue
+        if not result.features and result.unchanged.empty:
+            print(f"    No matching WQ features — skipping")
+            continue
+        fetched = pd.DataFrame([map_row(r) for r in result.features] if map_row else result.features)
+        df = pd.concat([result.unchanged, fetched], ignore_index=True)
+        print(f"    ✅ {name}: {len(df):,} total features ({len(fetched):,} fetched, "
+              f"{len(result.unchanged):,} unchanged, {result.deleted:,} deleted)")
+        return df
 
-    if not all_rows:
-        print(f"    ⚠ md-mde-arcgis: no features from any endpoint")
-        return None
+    print(f"    ⚠ {name}: no features from any endpoint")
+    return None
+
+
+MDE_ARCGIS_ENDPOINTS = [
+    ("MDE GeoData", "https://mde.geodata.md.gov/arcgis/rest/services/Water_Quality"),
+    ("MDE Win64", "https://mdewin64.mde.state.md.us/arcgis/rest/services"),
+    ("ArcGIS Online", "https://services.arcgis.com/njFNhDsUCentVYJW/ArcGIS/rest/services"),
+]
+ARCGIS_WQ_KEYWORDS = ["water", "quality", "tmdl", "303d", "ir", "assessment", "impair"]
+ASSESSMENT_FIELDS = ["AU_ID", "ASSESSMENT_UNIT_ID", "AUID", "OBJECTID", "AU_NAME", "WATER_NAME", "NAME",
+                     "WATER_TYPE", "AU_TYPE", "IR_CATEGORY", "CATEGORY", "CAUSE", "CAUSES", "POLLUTANT",
+                     "TMDL_STATUS", "TMDL_DATE", "TMDL_APPROVAL_DATE", "LATITUDE", "LAT", "LONGITUDE", "LON"]
+
+
+def assessment_row(attrs):
+    """Integrated Report assessment-unit row from harvested ArcGIS attributes."""
+    return {
+        "au_id": (attrs.get("AU_ID") or attrs.get("ASSESSMENT_UNIT_ID")
+                  or attrs.get("AUID") or str(attrs.get("OBJECTID", ""))),
+        "au_name": (attrs.get("AU_NAME") or attrs.get("WATER_NAME")
+                    or attrs.get("NAME") or ""),
+        "water_type": attrs.get("WATER_TYPE", attrs.get("AU_TYPE", "unknown")),
+        "category": (attrs.get("IR_CATEGORY") or attrs.get("CATEGORY") or ""),
+        "cause": (attrs.get("CAUSE") or attrs.get("CAUSES")
+                  or attrs.get("POLLUTANT") or ""),
+        "tmdl_status": attrs.get("TMDL_STATUS", "na"),
+        "tmdl_date": attrs.get("TMDL_DATE") or attrs.get("TMDL_APPROVAL_DATE"),
+        "lat": attrs[LAT_COL] or attrs.get("LATITUDE") or attrs.get("LAT"),
+        "lon": attrs[LON_COL] or attrs.get("LONGITUDE") or attrs.get("LON"),
+        "source_layer": attrs[LAYER_NAME_COL],
+        LAYER_COL: attrs[LAYER_COL],
+        OBJECTID_COL: attrs[OBJECTID_COL],
+        EDITED_COL: attrs[EDITED_COL],
+    }
 
-    df = pd.DataFrame(all_rows)
-    print(f"    ✅ md-mde-arcgis: {len(df):,} total features")
-    return df
 
+def fetch_mde_arcgis(dry_run=False):
+    """Fetch MDE ArcGIS water quality assessment data for Maryland.
+    Tries three endpoints in order until one works."""
+    return fetch_arcgis_portal("md-mde-arcgis", MDE_ARCGIS_ENDPOINTS, ARCGIS_WQ_KEYWORDS,
+                               ASSESSMENT_FIELDS, assessment_row, dry_run=dry_run)
 
-def fetch_socrata_state(source_id, base_url, dry_run=False):
-    """Fetch Socrata-based state open data. Generic handler for NY, NJ, PA, VA."""
-    url = f"{base_url}?$limit=10000&$order=:id"
+
+def fetch_socrata(name, url, label, dry_run=False):
+    """Complete Socrata dataset, incremental against the previous output/{name}.*. Returns SpooledCSV or None."""
+    dataset = SocrataDataset(url)
+    previous = find_output(OUTPUT, name)
     if dry_run:
-        print(f"  [DRY RUN] {source_id}: would fetch")
-        print(f"            {url[:120]}...")
-        return None
-    print(f"  Fetching {source_id}...")
+        mark = None
+        if previous:
+            with as_csv(previous, OUTPUT) as previous_csv:
+                mark = max_updated_at(previous_csv)
+        total = dataset.count(updated_since(mark) if mark else None)
+        if total is None:
+            print(f"    ❌ {label}: count(*) not answering")
+            return None
+        return Count(total, "Socrata count, delta" if mark else "Socrata count")
+    print(f"  Fetching {label}...")
     try:
-        r = requests.get(url, timeout=120)
-        r.raise_for_status()
-        data = r.json()
-        df = pd.DataFrame(data)
-        print(f"    ✅ {source_id}: {len(df):,} records")
-        return df
+        if previous:
+            with as_csv(previous, OUTPUT) as previous_csv:
+                spooled = dataset.fetch(OUTPUT, previous=previous_csv, label=label)
+        else:
+            spooled = dataset.fetch(OUTPUT, label=label)
+        if spooled is None:
+            print(f"    ⚠ {label}: no records")
+            return None
+        print(f"    ✅ {label}: {spooled.rows:,} records")
+        return spooled
     except Exception as e:
-        print(f"    ❌ {source_id}: {str(e)[:100]}")
+        print(f"    ❌ {label}: {str(e)[:100]}")
         return None
 
 
+def fetch_socrata_state(source_id, base_url, dry_run=False):
+    """Fetch Socrata-based state open data. Generic handler for NY, NJ, PA, VA."""
+    return fetch_socrata(source_id, base_url, source_id, dry_run=dry_run)
+
+
 # Socrata base URLs for state open data portals
 STATE_SOCRATA_URLS = {
     "state_ny": "https://data.ny.gov/resource/4k4g-s9hz.json",
@@ -603,8 +572,46 @@ FETCHER_MAP = {
 }
 
 
+# API host per source — fetch_engine caps concurrency per host
+FETCHER_HOSTS = {
+    "usgs-nwis":        "waterservices.usgs.gov",
+    "epa-sdwis":        "data.epa.gov",
+    "icis_npdes":       "data.epa.gov",
+    "icis_dmr":         "data.epa.gov",
+    "echo_facilities":  "echodata.epa.gov",
+    "echo_violations":  "echodata.epa.gov",
+    "frs_wwtps":        "data.epa.gov",
+    "pfas_ucmr":        "data.epa.gov",
+    "cdc_nwss":         "data.cdc.gov",
+    "nps_wq":           WQP_HOST,
+    "datagov_wq":       "catalog.data.gov",
+    "nasa_cmr":         "cmr.earthdata.nasa.gov",
+    "md-mde-arcgis":    "mde-arcgis",  # probes several hosts in turn
+}
+
+
+def fetch_host(sid):
+    """Concurrency bucket for a source ID."""
+    if sid in STATE_SOCRATA_URLS:
+        return urlsplit(STATE_SOCRATA_URLS[sid]).netloc
+    return FETCHER_HOSTS.get(sid, sid)
+
+
+def source_job(sid, state_cd=None, start_date=None, dry_run=False):
+    """FetchJob for a FETCHER_MAP / Socrata source, named like its output CSV."""
+    per_state = FETCHER_MAP.get(sid, (None, False, False))[1]
+    key = f"{sid}-{state_cd or 'MD'}" if per_state else sid
+    return FetchJob(key, fetch_host(sid),
+                    partial(dispatch_fetch, sid, state_cd=state_cd, start_date=start_date, dry_run=dry_run))
+
+
+def wqp_job(abbr, fips, start_date, dry_run=False):
+    return FetchJob(f"wqp-{abbr}", WQP_HOST, partial(fetch_wqp_state, abbr, fips, start_date, dry_run=dry_run))
+
+
 def dispatch_fetch(sid, state_cd=None, start_date=None, dry_run=False):
-    """Dispatch a fetch call by source ID using FETCHER_MAP. Returns DataFrame or None."""
+    """Dispatch a fetch call by source ID using FETCHER_MAP. Returns DataFrame or None
+    (with dry_run, the handler's estimate.Count probe or None)."""
     # Handle state Socrata sources via generic handler
     if sid in STATE_SOCRATA_URLS:
         return fetch_socrata_state(sid, STATE_SOCRATA_URLS[sid], dry_run=dry_run)
@@ -623,64 +630,96 @@ def dispatch_fetch(sid, state_cd=None, start_date=None, dry_run=False):
     return fn(*args, dry_run=dry_run)
 
 
-def save_csv(df, name):
-    """Save DataFrame to output/ directory."""
-    if df is None or df.empty:
+def changes():
+    """The snapshot-diff state store for output/."""
+    global _changes
+    if _changes is None:
+        _changes = ChangeStore(OUTPUT)
+    return _changes
+
+
+def save_csv(df, name, fmt=DEFAULT_FORMAT):
+    """Save DataFrame (or a SpooledCSV, chunk by chunk) to output/ as CSV, Parquet or Feather.
+    A payload whose fingerprint matches the manifest is not rewritten; otherwise the
+    insert/update/delete delta against the previous snapshot goes to output/deltas/."""
+    if df is None:
+        return
+    if not isinstance(df, SpooledCSV) and df.empty:
         return
     OUTPUT.mkdir(exist_ok=True)
-    path = OUTPUT / f"{name}.csv"
-    df.to_csv(path, index=False)
+    fp = fingerprint(df)
+    path = OUTPUT / f"{name}{FORMATS[fmt]}"
+    if MANIFEST.unchanged(name, fp, path):
+        if isinstance(df, SpooledCSV):
+            df.close()
+        print(f"    = {path.name} unchanged ({fp.rows:,} rows) — not rewritten")
+        return fp.rows
+    delta = changes().diff(name, df, fp, previous=find_output(OUTPUT, name),
+                           previous_digest=MANIFEST.digest(name), fmt=fmt)
+    print(f"    Δ {name}: {delta}{f' → {delta.path.relative_to(OUTPUT)}' if delta.path else ''}")
+    path, rows = write_output(df, OUTPUT, name, fmt)
+    MANIFEST.record(name, fp, path)
     size_mb = path.stat().st_size / (1024 * 1024)
-    print(f"    💾 Saved {path.name} ({size_mb:.1f} MB, {len(df):,} rows)")
+    print(f"    💾 Saved {path.name} ({size_mb:.1f} MB, {rows:,} rows)")
+    return rows
 
 
-def pick_next_batch(reg, batch_size):
+def pick_next_batch(store, reg, batch_size):
     """Pick the next batch of states to fetch, sorted by:
     1. Never-fetched first
     2. Oldest last_fetch
     3. Higher priority (lower number) breaks ties
     Also includes federal sources that haven't been fetched this cycle.
+    The ordering comes from the registry store's indexes; the entries are
+    the dicts in `reg`, so bookkeeping on them is saved with the registry.
     Returns list of (type, key, info) tuples."""
 
     batch = []
 
     # Federal sources that haven't been fetched
-    for src in reg["sources"]:
-        if src["status"] == "dead" or src["status"] == "gated":
-            continue
-        if src["id"] in ("wqp-portal", "epa-attains"):
+    sources = {src["id"]: src for src in reg["sources"]}
+    for sid in store.never_fetched("sources", skip_status=("dead", "gated")):
+        if sid in ("wqp-portal", "epa-attains"):
             continue  # WQP handled per-state, ATTAINS already cached
-        if not src.get("last_fetch"):
-            batch.append(("federal", src["id"], src))
+        batch.append(("federal", sid, sources[sid]))
         if len(batch) >= batch_size:
             return batch
 
     # WQP states: never-fetched first, then oldest, priority breaks ties
     wqp = reg.get("wqp_states", {})
-    state_queue = []
-    for abbr, st in wqp.items():
-        if st.get("status") == "dead":
-            continue
-        last = st.get("last_fetch")
-        # Sort key: (has_been_fetched, last_fetch_timestamp, priority)
-        # Never-fetched sorts first (False < True), then oldest date, then priority
-        sort_key = (
-            last is not None,           # False (never fetched) sorts before True
-            last or "0000-00-00",        # oldest timestamp sorts first
-            st.get("priority", 3),       # lower priority number = more important
-        )
-        state_queue.append((sort_key, abbr, st))
-
-    state_queue.sort(key=lambda x: x[0])
-
-    for _, abbr, st in state_queue:
+    for abbr in store.fetch_order("wqp_states", skip_status=("dead",)):
         if len(batch) >= batch_size:
             break
-        batch.append(("wqp", abbr, st))
+        batch.append(("wqp", abbr, wqp[abbr]))
 
     return batch
 
 
+def budget_batch(store, reg, budget_minutes, workers, limit=None):
+    """
+    pick_next_batch's candidates, narrowed to what fits `budget_minutes` of
+    wall clock by the scheduler's cost model (value = staleness × priority).
+    """
+    everything = pick_next_batch(store, reg, len(reg["sources"]) + len(reg.get("wqp_states", {})))
+    items = []
+    for src_type, key, info in everything:
+        if src_type == "wqp":
+            items.append((src_type, key, info, WQP_HOST, 1))
+            continue
+        if key not in FETCHER_MAP and key not in STATE_SOCRATA_URLS:
+            continue   # no fetcher — nothing would run
+        jobs = len(reg["wqp_states"]) if FETCHER_MAP.get(key, (None, False))[1] else 1
+        items.append((src_type, key, info, fetch_host(key), jobs))
+
+    picked = plan_budget(make_candidates(items), budget_minutes * 60, workers, limit)
+    for c in picked:
+        print(f"  {c.key:22s} ~{c.seconds / 60:5.1f} min busy  value {c.value:5.1f}  ({c.host})")
+    left = len(everything) - len(picked)
+    print(f"\n  Estimated {estimated_wall(picked, workers) / 60:.1f} of {budget_minutes} min"
+          f" — {left} more waiting\n")
+    return [(c.kind, c.key, c.entry) for c in picked]
+
+
 def main():
     parser = argparse.ArgumentParser(description="PIN Data Fetcher")
     parser.add_argument("--segment", choices=["federal", "state", "noaa", "supplemental"], help="Fetch only this segment")
@@ -689,12 +728,19 @@ def main():
     parser.add_argument("--state", help="Single state abbreviation for --source (e.g., MD)")
     parser.add_argument("--source", help="Fetch a single source by ID")
     parser.add_argument("--next-batch", type=int, metavar="N", help="Scheduler mode: fetch next N unfetched/oldest sources")
+    parser.add_argument("--budget-minutes", type=float, metavar="M",
+                        help="Scheduler mode: fill M minutes of wall clock by past cost, staleness and priority (N caps the count)")
     parser.add_argument("--from", dest="start_date", default="2024-01-01", help="Start date YYYY-MM-DD (default: 2024-01-01)")
-    parser.add_argument("--dry-run", action="store_true", help="Show what would be fetched without pulling data")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Count what would be fetched (rows, size, run time) without pulling data")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"Fetches in flight at once (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--output-format", choices=list(FORMATS), default=DEFAULT_FORMAT,
+                        help=f"File format for output/ (default: {DEFAULT_FORMAT}, or $PIN_OUTPUT_FORMAT)")
     args = parser.parse_args()
 
     start_date = datetime.strptime(args.start_date, "%Y-%m-%d")
-    reg = load_registry()
+    store = RegistryStore()
+    reg = store.load()
     fetched = 0
     skipped = 0
 
@@ -704,14 +750,73 @@ def main():
     else:
         print()
 
-    # ── Scheduler mode: --next-batch N ──
-    if args.next_batch:
-        batch = pick_next_batch(reg, args.next_batch)
+    def mark_source(src, df):
+        """Registry bookkeeping for a finished source fetch; returns 1 if it saved data."""
+        if df is not None:
+            src["last_fetch"] = datetime.utcnow().isoformat() + "Z"
+            src["last_success"] = src["last_fetch"]
+            src["error_count"] = 0
+            return 1
+        if not args.dry_run:
+            src["error_count"] = src.get("error_count", 0) + 1
+        return 0
+
+    # Callbacks run on the engine's writer thread one at a time — no locking needed
+    handlers = {}
+    entries = {}            # job key → registry entry whose cost model it feeds
+    costs = CostRecorder()
+    planned = []            # PlannedJob per job, for the --dry-run estimate
+
+    def track(job, entry, share=1, cost=True):
+        """Plan `job` under `entry`, whose cost model spans `share` jobs; cost=False: don't learn from it."""
+        planned.append(PlannedJob(job, entry, share))
+        if cost and not args.dry_run:
+            entries[job.key] = entry
+            costs.expect(entry)
+
+    def on_done(job, df, seconds):
+        nonlocal fetched
+        rows = save_csv(df, job.key, args.output_format) if df is not None else None
+        fetched += handlers[job.key](df) or 0
+        if job.key in entries:
+            costs.add(entries[job.key], seconds if df is not None else None, rows)
+        store.save(reg)   # row-level, so a crash later in the run keeps this result
+
+    http_stats = http_client.HostStats()
+    http_client.default_client().add_hook(http_stats.add)
+
+    def report(stats):
+        if stats["jobs"]:
+            hosts = ", ".join(f"{h} {v['jobs']}" for h, v in sorted(stats["byHost"].items()))
+            print(f"\n  {stats['jobs']} fetches in {stats['seconds']:.1f}s across {len(stats['byHost'])} hosts ({hosts})")
+        for host, h in http_stats.summary().items():
+            print(f"    {host:32s} {h['requests']:5,} requests  {h['retries']:3} retried  "
+                  f"{h['errors']:3} failed  {h['seconds']:8.1f}s to headers")
+
+    def run(jobs):
+        if args.dry_run:
+            counts, stats = probe_counts(jobs, args.workers)
+            print_estimates(estimate_jobs(planned, counts, OUTPUT, MANIFEST), args.workers, stats.get("seconds"))
+        else:
+            report(run_jobs(jobs, on_done, workers=args.workers))
+            removed = prune_deltas(directory=OUTPUT)
+            if removed:
+                print(f"  🧹 Pruned {removed} deltas older than {DELTA_KEEP_DAYS} days")
+
+    # ── Scheduler mode: --next-batch N and/or --budget-minutes M ──
+    if args.next_batch or args.budget_minutes:
+        if args.budget_minutes:
+            print(f"  ── Budget Plan ({args.budget_minutes:g} min, {args.workers} workers) ──\n")
+            batch = budget_batch(store, reg, args.budget_minutes, args.workers, args.next_batch)
+        else:
+            batch = pick_next_batch(store, reg, args.next_batch)
         if not batch:
             print("  ✅ All sources are up to date — nothing to fetch")
             return
 
         print(f"  ── Next Batch ({len(batch)} sources) ──\n")
+        jobs = []
+        per_state_sources = []
         for src_type, key, info in batch:
             if src_type == "federal":
                 src = info
@@ -720,41 +825,32 @@ def main():
 
                 entry = FETCHER_MAP.get(sid)
                 if entry and entry[1]:
-                    # State-level source: iterate all states
+                    # State-level source: one job per state
                     for st_abbr in sorted(reg["wqp_states"].keys()):
-                        df = dispatch_fetch(sid, state_cd=st_abbr, start_date=start_date, dry_run=args.dry_run)
-                        if df is not None:
-                            save_csv(df, f"{sid}-{st_abbr}")
-                            fetched += 1
-                        time.sleep(DELAY_BETWEEN_PULLS)
-                    src["last_fetch"] = datetime.utcnow().isoformat() + "Z"
-                    src["last_success"] = src["last_fetch"]
+                        jobs.append(source_job(sid, state_cd=st_abbr, start_date=start_date, dry_run=args.dry_run))
+                        handlers[jobs[-1].key] = lambda df: df is not None
+                        track(jobs[-1], src, share=len(reg["wqp_states"]))
+                    per_state_sources.append(src)
                 elif sid in FETCHER_MAP or sid in STATE_SOCRATA_URLS:
                     # Non-state source (nationwide or catalog)
-                    df = dispatch_fetch(sid, start_date=start_date, dry_run=args.dry_run)
-                    if df is not None:
-                        save_csv(df, sid)
-                        fetched += 1
-                    src["last_fetch"] = datetime.utcnow().isoformat() + "Z"
-                    src["last_success"] = src["last_fetch"]
+                    jobs.append(source_job(sid, start_date=start_date, dry_run=args.dry_run))
+                    handlers[jobs[-1].key] = lambda df: df is not None
+                    track(jobs[-1], src)
+                    per_state_sources.append(src)
 
             elif src_type == "wqp":
-                abbr = key
                 st = info
-                df = fetch_wqp_state(abbr, st["fips"], start_date, dry_run=args.dry_run)
-                if df is not None:
-                    save_csv(df, f"wqp-{abbr}")
-                    now = datetime.utcnow().isoformat() + "Z"
-                    st["last_fetch"] = now
-                    st["last_success"] = now
-                    st["error_count"] = 0
-                    fetched += 1
-                elif not args.dry_run:
-                    st["error_count"] = st.get("error_count", 0) + 1
-
-            time.sleep(DELAY_BETWEEN_PULLS)
-
-        save_registry(reg)
+                jobs.append(wqp_job(key, st["fips"], start_date, dry_run=args.dry_run))
+                handlers[jobs[-1].key] = partial(mark_source, st)
+                track(jobs[-1], st)
+
+        run(jobs)
+        if not args.dry_run:
+            for src in per_state_sources:
+                src["last_fetch"] = datetime.utcnow().isoformat() + "Z"
+                src["last_success"] = src["last_fetch"]
+
+        save_registry(store, reg)
         print(f"\n  {'='*50}")
         print(f"  Batch complete: {fetched} fetched")
         print()
@@ -766,7 +862,7 @@ def main():
         if not src_list:
             print(f"  ❌ Unknown source: {args.source}")
             print(f"     Available: {', '.join(s['id'] for s in reg['sources'])}")
-            save_registry(reg)
+            save_registry(store, reg)
             return
         src = src_list[0]
         sid = src["id"]
@@ -780,25 +876,26 @@ def main():
         elif sid == "epa-attains":
             print(f"  ⏭  epa-attains: already cached (51/51 states in lib/attainsCache.ts)")
             skipped += 1
+        elif (sid in FETCHER_MAP or sid in STATE_SOCRATA_URLS) and args.dry_run:
+            per_state = FETCHER_MAP.get(sid, (None, False))[1]
+            job = source_job(sid, state_cd=state_cd, start_date=start_date, dry_run=True)
+            track(job, src, share=len(reg["wqp_states"]) if per_state else 1, cost=False)
+            run([job])
         elif sid in FETCHER_MAP or sid in STATE_SOCRATA_URLS:
-            df = dispatch_fetch(sid, state_cd=state_cd, start_date=start_date, dry_run=args.dry_run)
+            df = dispatch_fetch(sid, state_cd=state_cd, start_date=start_date)
             if df is not None:
-                csv_name = f"{sid}-{state_cd}" if FETCHER_MAP.get(sid, (None, False, False))[1] else sid
-                save_csv(df, csv_name)
-                src["last_fetch"] = datetime.utcnow().isoformat() + "Z"
-                src["last_success"] = src["last_fetch"]
-                src["error_count"] = 0
-                fetched += 1
-            elif not args.dry_run:
-                src["error_count"] = src.get("error_count", 0) + 1
+                save_csv(df, source_job(sid, state_cd=state_cd).key, args.output_format)
+            fetched += mark_source(src, df)
         else:
             print(f"  ⚠ No fetcher implemented for {sid}")
 
-        save_registry(reg)
+        save_registry(store, reg)
         print(f"\n  {'='*50}")
         print(f"  Fetched: {fetched}  |  Skipped: {skipped}  |  Output dir: {OUTPUT}\n")
         return
 
+    jobs = []
+
     # ── Segment mode: federal, state, noaa, supplemental ──
     if args.segment:
         segment_sources = [s for s in reg["sources"] if s["type"] == args.segment]
@@ -819,22 +916,15 @@ def main():
                 continue
 
             if sid in FETCHER_MAP or sid in STATE_SOCRATA_URLS:
-                df = dispatch_fetch(sid, state_cd=state_cd, start_date=start_date, dry_run=args.dry_run)
-                if df is not None:
-                    csv_name = f"{sid}-{state_cd}" if FETCHER_MAP.get(sid, (None, False, False))[1] else sid
-                    save_csv(df, csv_name)
-                    src["last_fetch"] = datetime.utcnow().isoformat() + "Z"
-                    src["last_success"] = src["last_fetch"]
-                    src["error_count"] = 0
-                    fetched += 1
-                elif not args.dry_run:
-                    src["error_count"] = src.get("error_count", 0) + 1
+                jobs.append(source_job(sid, state_cd=state_cd, start_date=start_date, dry_run=args.dry_run))
+                handlers[jobs[-1].key] = partial(mark_source, src)
+                # One state here; the cost model holds all-state totals, so it doesn't learn from this
+                per_state = FETCHER_MAP.get(sid, (None, False))[1]
+                track(jobs[-1], src, share=len(reg["wqp_states"]) if per_state else 1, cost=not per_state)
             else:
                 print(f"  ⚠ No fetcher for {sid} — skipping")
                 skipped += 1
 
-            time.sleep(DELAY_BETWEEN_PULLS)
-
     # ── WQP state-by-state ──
     if args.all_states or args.states:
         wqp = reg.get("wqp_states", {})
@@ -855,20 +945,14 @@ def main():
                 skipped += 1
                 continue
 
-            df = fetch_wqp_state(abbr, st["fips"], start_date, dry_run=args.dry_run)
-            if df is not None:
-                save_csv(df, f"wqp-{abbr}")
-                now = datetime.utcnow().isoformat() + "Z"
-                st["last_fetch"] = now
-                st["last_success"] = now
-                st["error_count"] = 0
-                fetched += 1
-            elif not args.dry_run:
-                st["error_count"] = st.get("error_count", 0) + 1
-
-            time.sleep(DELAY_BETWEEN_PULLS)
-
-    save_registry(reg)
+            jobs.append(wqp_job(abbr, st["fips"], start_date, dry_run=args.dry_run))
+            handlers[jobs[-1].key] = partial(mark_source, st)
+            track(jobs[-1], st)
+
+    # Segment sources and WQP states run together — they mostly hit different hosts
+    run(jobs)
+
+    save_registry(store, reg)
 
     print(f"\n  {'='*50}")
     print(f"  Fetched: {fetched}  |  Skipped: {skipped}  |  Output dir: {OUTPUT}")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+PIN Fetch Engine — run independent fetch handlers concurrently.
+
+The FETCHER_MAP handlers are plain blocking functions (requests + pandas)
+that return a DataFrame or None. This runs many of them at once on an
+asyncio loop, each in a worker thread, while keeping every host polite:
+
+  per-host semaphore   at most N handlers talking to one host at a time
+  per-host spacing     handler starts on one host are at least S seconds apart
+  global worker cap    total threads in flight (--workers)
+
+Different hosts (EPA efservice, ECHO, WQP, Socrata, NWIS, ...) don't wait
+on each other, so a segment or a 56-state batch finishes in roughly the time
+of its slowest host instead of the sum of every call plus fixed sleeps.
+
+Completion callbacks run one at a time on a single writer thread, so they
+can update the registry and write output without locking, while other jobs
+keep passing their gates. A callback that raises is reported and counts its
+job as failed; the rest of the run goes on. Callbacks get the job's busy
+seconds too (the scheduler's cost model learns from them).
+
+ordered_map() is the thread-pool counterpart used inside a handler to pull
+the pages of one large download concurrently while writing them in order.
+
+Usage:
+  jobs = [FetchJob("usgs-nwis-MD", "waterservices.usgs.gov", partial(fetch_usgs_nwis, "MD", start))]
+  stats = run_jobs(jobs, on_done=lambda job, df, seconds: save_csv(df, job.key), workers=8)
+"""
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+# host → (max concurrent handlers, min seconds between handler starts)
+HOST_LIMITS = {
+    "data.epa.gov":             (2, 1.0),
+    "echodata.epa.gov":         (2, 1.0),
+    "www.waterqualitydata.us":  (3, 2.0),
+    "waterservices.usgs.gov":   (4, 0.5),
+}
+DEFAULT_HOST_LIMIT = (2, 2.0)
+DEFAULT_WORKERS = 8
+
+
+class FetchJob(NamedTuple):
+    key: str                  # output name, e.g. "usgs-nwis-MD" or "wqp-MD"
+    host: str                 # concurrency bucket (usually the API hostname)
+    fn: Callable[[], object]  # blocking handler, returns DataFrame or None
+
+
+class _HostGate:
+    """Semaphore plus minimum start spacing for one host."""
+
+    def __init__(self, limit: int, spacing: float):
+        self.sem = asyncio.Semaphore(max(1, limit))
+        self.spacing = spacing
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        await self.sem.acquire()
+        async with self._lock:
+            wait = self._next_start - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_start = time.monotonic() + self.spacing
+
+    async def __aexit__(self, *exc):
+        self.sem.release()
+
+
+async def _run(jobs: list[FetchJob], on_done: Optional[Callable], workers: int,
+               host_limits: dict) -> dict:
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max(1, workers), thread_name_prefix="fetch"))
+    # One writer thread: callbacks stay serialized but never block the loop
+    done_executor = ThreadPoolExecutor(1, thread_name_prefix="fetch-done")
+    gates: dict[str, _HostGate] = {}
+    worker_slots = asyncio.Semaphore(max(1, workers))
+    stats = {"jobs": len(jobs), "ok": 0, "empty": 0, "failed": 0, "byHost": {}}
+
+    async def run_one(job: FetchJob):
+        gate = gates.get(job.host)
+        if gate is None:
+            gate = gates[job.host] = _HostGate(*host_limits.get(job.host, DEFAULT_HOST_LIMIT))
+        async with gate, worker_slots:
+            started = time.monotonic()
+            try:
+                result = await asyncio.to_thread(job.fn)
+            except Exception as e:
+                # Handlers report their own errors; this only catches bugs
+                print(f"    ❌ {job.key}: {str(e)[:100]}")
+                result, outcome = None, "failed"
+            else:
+                outcome = "empty" if result is None else "ok"
+            elapsed = time.monotonic() - started
+        if on_done:
+            try:
+                await loop.run_in_executor(done_executor, on_done, job, result, elapsed)
+            except Exception as e:
+                # A failed save must not take the jobs still in flight down with it
+                print(f"    ❌ {job.key}: completion failed: {str(e)[:100]}")
+                outcome = "failed"
+        stats[outcome] += 1
+        host = stats["byHost"].setdefault(job.host, {"jobs": 0, "seconds": 0.0})
+        host["jobs"] += 1
+        host["seconds"] = round(host["seconds"] + elapsed, 1)
+
+    try:
+        await asyncio.gather(*(run_one(job) for job in jobs))
+    finally:
+        done_executor.shutdown(wait=True)
+    return stats
+
+
+def run_jobs(jobs: Iterable[FetchJob], on_done: Optional[Callable] = None,
+             workers: int = DEFAULT_WORKERS, host_limits: Optional[dict] = None) -> dict:
+    """
+    Run `jobs` concurrently and call on_done(job, result, seconds) as each
+    finishes (seconds: time the handler ran, not counting gate waits).
+    Callbacks run serially on one writer thread, off the event loop.
+    Returns counts of ok / empty (handler returned None) / failed jobs and
+    busy seconds per host.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return {"jobs": 0, "ok": 0, "empty": 0, "failed": 0, "byHost": {}}
+    started = time.monotonic()
+    stats = asyncio.run(_run(jobs, on_done, workers, host_limits or HOST_LIMITS))
+    stats["seconds"] = round(time.monotonic() - started, 1)
+    return stats
+
+
+def ordered_map(fn: Callable, items: Iterable, workers: int) -> Iterator:
+    """
+    Like ThreadPoolExecutor.map, but only `2 * workers` calls are in flight
+    or buffered at once, so pages can be written in order as they complete
+    without holding the whole result. Pending calls are cancelled if the
+    consumer stops or a call raises.
+    """
+    workers = max(1, workers)
+    items = iter(items)
+    with ThreadPoolExecutor(workers, thread_name_prefix="pages") as pool:
+        pending = deque(pool.submit(fn, item) for _, item in zip(range(workers * 2), items))
+        try:
+            while pending:
+                result = pending.popleft().result()
+                nxt = next(items, None)
+                if nxt is not None:
+                    pending.append(pool.submit(fn, nxt))
+                yield result
+        finally:
+            for f in pending:
+                f.cancel()
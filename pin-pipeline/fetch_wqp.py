@@ -10,9 +10,15 @@ Region 3 states (DE, DC, MD, PA, VA, WV) — core parameters only.
 Outputs:
   - lib/wqp/stations/{state}.json     Station inventories per state
   - lib/wqp/summaries/{state}.json    State-level summary stats
-  - lib/wqp/observations/{state}/     Observation files chunked by year
+  - lib/wqp/observations/{state}/     Observation files chunked by year (JSON)
+  - archive/wqp/{state}/{year}.parquet  Same chunks as zstd Parquet (--format parquet|both)
   - lib/wqp/exceedances/{state}.json  Threshold exceedance records
-  - lib/wqp/fetch_log.json            Pipeline health / fetch history
+  - lib/wqp/fetch_log.json            Pipeline health / fetch history, request telemetry
+  - lib/wqp/watermarks.json           Per state/year high-water marks (incremental runs)
+  - lib/wqp/checkpoints.jsonl         Completed-unit journal for --resume
+  - lib/wqp/split_plans.json          Per-state query split that WQP can serve
+  - lib/wqp/http_cache/               Cached station/summary responses (--no-cache to bypass)
+  - lib/wqp/wqp_fetch.prom            Per-request metrics for node_exporter (--metrics-file)
 
 Usage:
   python fetch_wqp.py                       # Full Region 3 fetch
@@ -20,13 +26,19 @@ Usage:
   python fetch_wqp.py --state MD --year 2024  # Single state + year
   python fetch_wqp.py --summary-only        # Station counts only (fast)
   python fetch_wqp.py --dry-run             # Show what would be fetched
+  python fetch_wqp.py --workers 6           # Parallel state/year fetches
+  python fetch_wqp.py --full-refresh        # Ignore watermarks, refetch every year
+  python fetch_wqp.py --format parquet      # Write Parquet chunks only, no JSON
+  python fetch_wqp.py --resume              # Continue an interrupted run
 
 Estimated volumes (Region 3, core params, last 5 years):
   MD: ~2.5M    VA: ~3.0M    PA: ~4.5M
   WV: ~0.8M    DE: ~0.5M    DC: ~0.2M
   Total: ~11.5M observations
 
-Runtime: 2-6 hours for full backfill (WQP is slow). Incremental after that.
+Runtime: 2-6 hours for full backfill (WQP is slow); --workers overlaps the slow
+responses while the shared rate limiter keeps total request rate unchanged.
+Incremental after that.
 
 ==============================================================================
 """
@@ -39,10 +51,13 @@ import io
 import time
 import logging
 import argparse
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from urllib.parse import urlencode
-from typing import Optional
+from urllib.parse import urlencode, urlsplit
+from typing import Iterable, Iterator, NamedTuple, Optional
 
 try:
     import requests
@@ -50,6 +65,20 @@ except ImportError:
     print("pip install requests --break-system-packages")
     sys.exit(1)
 
+import numpy as np
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None  # only needed for --format parquet|both
+
+from compressed_stream import TransferStats, open_stream, response_encoding
+from http_cache import ResponseCache
+from http_client import HTTPClient
+from telemetry import RequestRecord, Telemetry
+from exceedance import EXCEEDANCE_THRESHOLDS, screen_coded
+from observation_store import ObservationStore
+
 # =============================================================================
 # Configuration
 # =============================================================================
@@ -89,33 +118,67 @@ CORE_PARAMETERS = [
     "Conductivity",
 ]
 
-# Thresholds for exceedance detection (parameter → max acceptable value)
-# These are general screening levels — state-specific criteria vary
-EXCEEDANCE_THRESHOLDS = {
-    "Dissolved oxygen (DO)": {"threshold": 5.0, "direction": "below", "unit": "mg/l"},
-    "pH": {"threshold_low": 6.5, "threshold_high": 8.5, "direction": "range", "unit": "std units"},
-    "Total Nitrogen, mixed forms": {"threshold": 3.0, "direction": "above", "unit": "mg/l"},
-    "Nitrogen": {"threshold": 3.0, "direction": "above", "unit": "mg/l"},
-    "Phosphorus": {"threshold": 0.1, "direction": "above", "unit": "mg/l"},
-    "Total suspended solids": {"threshold": 25.0, "direction": "above", "unit": "mg/l"},
-    "Escherichia coli": {"threshold": 410.0, "direction": "above", "unit": "MPN/100ml"},
-    "Enterococcus": {"threshold": 130.0, "direction": "above", "unit": "MPN/100ml"},
-    "Fecal Coliform": {"threshold": 400.0, "direction": "above", "unit": "CFU/100ml"},
-    "Turbidity": {"threshold": 50.0, "direction": "above", "unit": "NTU"},
-}
+# Exceedance thresholds (EXCEEDANCE_THRESHOLDS) live in exceedance.py so the
+# fetcher, output.py and the Parquet archive queries all screen the same way.
 
 # How far back to pull observations (full backfill)
 DEFAULT_YEARS_BACK = 5
 
+# A year is "closed" (skipped on incremental runs) once it has been fetched in
+# full this many days after Dec 31 — providers keep uploading late results for a while.
+CLOSED_YEAR_GRACE_DAYS = 90
+
+# Incremental runs re-request this many days before the watermark's latest
+# activity date. The watermark is an activity date, not an upload time, so
+# results uploaded late for earlier activity only show up inside this window
+# (or in the full refetch that closes the year).
+INCREMENTAL_LOOKBACK_DAYS = 90
+
 # WQP request settings
 REQUEST_TIMEOUT = 120  # seconds — WQP can be very slow
 REQUEST_DELAY = 2.0    # seconds between requests — be a good citizen
+REQUEST_BURST = 1      # token-bucket burst; 1 = strict REQUEST_DELAY spacing
 MAX_RETRIES = 3
-USER_AGENT = "PIN-Water-Intelligence/1.0 (pinwater.org; doug@pinwater.org)"
+
+# Adaptive query splitting. A Result query that can still be split gets only
+# SPLIT_AFTER_ATTEMPTS tries before it is replaced by two smaller queries —
+# date halves first, then county/HUC groups, then characteristic groups.
+SPLIT_AFTER_ATTEMPTS = 1
+MIN_SPLIT_DAYS = 30    # don't halve date windows shorter than 2x this
+SPLIT_AXES = ("date", "area", "param")
+
+# Checkpoint unit for a year's observation query. All CORE_PARAMETERS are
+# requested together, so there is one parameter group per state-year.
+CORE_GROUP = "core"
+
+# Concurrency (--workers). Total request *rate* is still capped by the shared
+# token bucket above; this only controls how many slow responses overlap.
+DEFAULT_WORKERS = 1
+MAX_CONCURRENT_PER_HOST = 4
+
+# On-disk response cache for slow-changing inventories (under --output-dir).
+# Within the TTL a cached response is reused without a request; after it,
+# the request is revalidated with ETag / Last-Modified where WQP sends them.
+HTTP_CACHE_TTLS = {
+    "data/Station/search": 3 * 86400,
+    "data/summary/monitoringLocation/search": 86400,
+}
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Per-request telemetry in Prometheus textfile-collector format (under
+# --output-dir unless --metrics-file points at the node_exporter directory)
+METRICS_FILE = "wqp_fetch.prom"
 
 # Output directory (relative to project root)
 OUTPUT_DIR = Path("lib/wqp")
 
+# Observation chunk formats. Parquet chunks land where convert_to_parquet.py
+# and query_archive.py expect them, so the conversion pass becomes optional.
+OUTPUT_FORMATS = {"json": ("json",), "parquet": ("parquet",), "both": ("json", "parquet")}
+DEFAULT_FORMAT = "json"
+PARQUET_DIR = Path("archive/wqp")
+PARQUET_COMPRESSION = "zstd"
+
 # Logging
 logging.basicConfig(
     level=logging.INFO,
@@ -129,62 +192,213 @@ log = logging.getLogger("wqp")
 # WQP API Client
 # =============================================================================
 
-class WQPClient:
-    """Low-level WQP API client with retry + rate limiting."""
+class WQPStreamError(Exception):
+    """A WQP response failed after rows had already been streamed."""
 
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": USER_AGENT,
-            "Accept": "text/csv",
-        })
-        self._last_request_time = 0.0
+
+class WQPQueryFailed(Exception):
+    """A WQP request exhausted its retries before returning a single row."""
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket plus a per-host concurrency cap.
+
+    One instance is shared by every worker so the pipeline as a whole never
+    starts more than `rate` requests/sec against WQP, however many state/year
+    tasks are in flight.
+    """
+
+    def __init__(self, rate: float = 1.0 / REQUEST_DELAY, burst: int = REQUEST_BURST,
+                 max_per_host: int = MAX_CONCURRENT_PER_HOST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_per_host = max(1, max_per_host)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self._host_slots: dict[str, threading.BoundedSemaphore] = {}
+
+    def acquire(self):
+        """Block until a request token is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    @contextmanager
+    def host_slot(self, host: str):
+        """Hold one of the `max_per_host` connection slots for `host`."""
+        with self._lock:
+            slot = self._host_slots.setdefault(
+                host, threading.BoundedSemaphore(self.max_per_host))
+        with slot:
+            yield
+
+
+def _counted_rows(rows: Iterable[dict], rec: RequestRecord) -> Iterator[dict]:
+    for row in rows:
+        rec.rows += 1
+        yield row
+
+
+def _stream_failure(e: Exception) -> str:
+    """Telemetry reason for a mid-stream failure (read timeouts surface as ConnectionError)."""
+    text = str(e)
+    if isinstance(e, requests.exceptions.Timeout) or "timed out" in text.lower():
+        return "timeout_read"
+    return f"stream_{type(e).__name__}"
+
+
+class WQPClient:
+    """Low-level WQP API client with retry + rate limiting. Safe to share across threads."""
+
+    def __init__(self, limiter: Optional[RateLimiter] = None,
+                 cache: Optional[ResponseCache] = None,
+                 telemetry: Optional[Telemetry] = None):
+        self.limiter = limiter or RateLimiter()
+        self.cache = cache
+        # Pooled keep-alive connections; retries stay in _iter_csv (telemetry, splitting)
+        self.http = HTTPClient(retries=0, headers={"Accept": "text/csv, application/zip"})
+        self.transfer = TransferStats()  # running totals across all requests
+        self.telemetry = telemetry or Telemetry()
+
+    @property
+    def session(self) -> requests.Session:
+        """This thread's session on the shared WQP connection pool."""
+        return self.http.session
 
     def _rate_limit(self):
-        """Ensure minimum delay between requests."""
-        elapsed = time.time() - self._last_request_time
-        if elapsed < REQUEST_DELAY:
-            time.sleep(REQUEST_DELAY - elapsed)
-        self._last_request_time = time.time()
+        """Wait for a token from the shared limiter."""
+        self.limiter.acquire()
 
     def fetch_csv(self, endpoint: str, params: dict) -> list[dict]:
         """
         Fetch CSV data from WQP and parse into list of dicts.
         Returns empty list on failure after retries.
+        Use iter_csv() for large result sets.
+        """
+        try:
+            return list(self.iter_csv(endpoint, params))
+        except (WQPStreamError, WQPQueryFailed) as e:
+            log.error(f"  {e}")
+            return []
+
+    def iter_csv(self, endpoint: str, params: dict,
+                 attempts: int = MAX_RETRIES) -> Iterator[dict]:
+        """
+        Stream CSV rows from WQP as they come off the socket.
+
+        Results are requested zipped (and gzip-encoded if the server obliges)
+        and inflated on the fly, so nothing is buffered beyond the current
+        row and memory stays flat no matter how large the response is.
+        Retries only happen before the first row is yielded; running out of
+        them raises WQPQueryFailed. A failure mid-stream raises
+        WQPStreamError so the caller can throw away the partial chunk.
+
+        Endpoints with an HTTP_CACHE_TTLS policy go through the response
+        cache: fresh entries skip the request, stale ones are revalidated.
         """
         params["mimeType"] = "csv"
-        params["zip"] = "no"
+        params["zip"] = "yes"
         url = f"{WQP_BASE}/{endpoint}?{urlencode(params, doseq=True)}"
 
-        for attempt in range(MAX_RETRIES):
-            self._rate_limit()
-            try:
-                log.debug(f"  GET {endpoint} (attempt {attempt + 1})")
-                resp = self.session.get(url, timeout=REQUEST_TIMEOUT)
-                resp.raise_for_status()
-
-                # Parse CSV
-                reader = csv.DictReader(io.StringIO(resp.text))
-                rows = list(reader)
-                return rows
-
-            except requests.exceptions.Timeout:
-                log.warning(f"  Timeout on {endpoint} (attempt {attempt + 1}/{MAX_RETRIES})")
-                if attempt < MAX_RETRIES - 1:
-                    time.sleep(5 * (attempt + 1))
-            except requests.exceptions.HTTPError as e:
-                log.error(f"  HTTP {e.response.status_code} on {endpoint}: {e}")
-                if e.response.status_code == 400:
-                    return []  # Bad request — don't retry
-                if attempt < MAX_RETRIES - 1:
-                    time.sleep(5 * (attempt + 1))
-            except Exception as e:
-                log.error(f"  Error on {endpoint}: {e}")
-                if attempt < MAX_RETRIES - 1:
-                    time.sleep(5 * (attempt + 1))
-
-        log.error(f"  Failed after {MAX_RETRIES} attempts: {endpoint}")
-        return []
+        host = urlsplit(WQP_BASE).netloc
+        rec = self.telemetry.start(endpoint)
+        try:
+            yield from self._iter_csv(endpoint, url, host, attempts, rec)
+        finally:
+            self.telemetry.finish(rec)
+
+    def _iter_csv(self, endpoint: str, url: str, host: str, attempts: int,
+                  rec: RequestRecord) -> Iterator[dict]:
+        cache = self.cache if self.cache and self.cache.ttl_for(url) is not None else None
+        cached = cache.lookup(url) if cache else None
+        if cached and cache.is_fresh(cached):
+            log.debug(f"  {endpoint}: cached")
+            with cache.open_text(cached) as text:
+                yield from _counted_rows(csv.DictReader(text), rec)
+            rec.outcome = "cached"
+            return
+        headers = ResponseCache.conditional_headers(cached)
+
+        for attempt in range(attempts):
+            backoff = 5 * (attempt + 1) if attempt < attempts - 1 else 0
+            with self.limiter.host_slot(host):
+                self._rate_limit()
+                rec.attempt()
+                try:
+                    log.debug(f"  GET {endpoint} (attempt {attempt + 1})")
+                    resp = self.session.get(url, timeout=REQUEST_TIMEOUT, stream=True,
+                                            headers=headers)
+                    resp.raise_for_status()
+                except requests.exceptions.Timeout as e:
+                    kind = "connect" if isinstance(e, requests.exceptions.ConnectTimeout) else "read"
+                    log.warning(f"  Timeout ({kind}) on {endpoint} (attempt {attempt + 1}/{attempts})")
+                    rec.failed(f"timeout_{kind}")
+                    resp = None
+                except requests.exceptions.HTTPError as e:
+                    log.error(f"  HTTP {e.response.status_code} on {endpoint}: {e}")
+                    e.response.close()
+                    rec.failed(f"http_{e.response.status_code}")
+                    if e.response.status_code == 400:
+                        rec.outcome = "bad_request"
+                        return  # Bad request — don't retry
+                    resp = None
+                except Exception as e:
+                    log.error(f"  Error on {endpoint}: {e}")
+                    rec.failed(type(e).__name__)
+                    resp = None
+
+                if resp is not None:
+                    rec.ttfb = resp.elapsed.total_seconds()
+
+                if resp is not None and resp.status_code == 304 and cached:
+                    resp.close()
+                    log.debug(f"  {endpoint}: not modified")
+                    cached = cache.revalidated(cached, resp.headers)
+                    with cache.open_text(cached) as text:
+                        yield from _counted_rows(csv.DictReader(text), rec)
+                    rec.latency = time.perf_counter() - rec.attempt_started
+                    rec.outcome = "not_modified"
+                    return
+
+                if resp is not None:
+                    # Decompress and parse CSV straight off the wire
+                    stats = TransferStats()
+                    with resp:
+                        encoding = response_encoding(resp)
+                        body = open_stream(resp, stats)
+                        if cache:
+                            body = cache.tee(url, resp.headers, body, encoding)
+                        try:
+                            yield from _counted_rows(
+                                csv.DictReader(io.TextIOWrapper(body, encoding=encoding, newline="")),
+                                rec)
+                        except Exception as e:
+                            rec.outcome = "stream_error"
+                            rec.failed(_stream_failure(e))
+                            raise WQPStreamError(f"Stream interrupted on {endpoint}: {e}") from e
+                        finally:
+                            self.transfer.add(stats)
+                            rec.wire_bytes += stats.wire_bytes
+                            rec.decoded_bytes += stats.decoded_bytes
+                            rec.latency = time.perf_counter() - rec.attempt_started
+                    log.debug(f"  {endpoint}: {stats}")
+                    rec.outcome = "ok"
+                    return
+
+            # Back off outside the host slot so other workers can use it
+            time.sleep(backoff)
+
+        rec.outcome = "failed"
+        raise WQPQueryFailed(f"Failed after {attempts} attempts: {endpoint}")
 
     def fetch_stations(self, statecode: str) -> list[dict]:
         """Fetch all monitoring stations in a state."""
@@ -199,18 +413,46 @@ class WQPClient:
         Fetch observation results for a state + year + core parameters.
         Chunked by year to avoid WQP timeouts on large queries.
         """
+        try:
+            return list(self.iter_results(statecode, year, parameters))
+        except (WQPStreamError, WQPQueryFailed) as e:
+            log.error(f"  {e}")
+            return []
+
+    def iter_results(self, statecode: str, year: int,
+                     parameters: list[str] = None,
+                     since: Optional[str] = None) -> Iterator[dict]:
+        """
+        Streaming variant of fetch_results() — yields raw rows one at a time.
+        `since` (YYYY-MM-DD) narrows the window to activity on/after that date.
+        """
+        start = date.fromisoformat(since) if since else date(year, 1, 1)
+        return self.iter_results_window(statecode, start, date(year, 12, 31), parameters)
+
+    def iter_results_window(self, statecode: str, start: date, end: date,
+                            parameters: Iterable[str] = None,
+                            area_param: Optional[str] = None,
+                            areas: Iterable[str] = None,
+                            attempts: int = MAX_RETRIES) -> Iterator[dict]:
+        """
+        Stream results for an arbitrary activity-date window, optionally
+        narrowed to a subset of counties/HUCs (`area_param` = "countycode"
+        or "huc") and characteristics.
+        """
         params = {
             "statecode": statecode,
-            "startDateLo": f"01-01-{year}",
-            "startDateHi": f"12-31-{year}",
+            "startDateLo": start.strftime("%m-%d-%Y"),
+            "startDateHi": end.strftime("%m-%d-%Y"),
             "sampleMedia": "Water",
             "dataProfile": "narrowResult",
             "sorted": "no",
         }
         if parameters:
-            params["characteristicName"] = parameters
+            params["characteristicName"] = list(parameters)
+        if area_param and areas:
+            params[area_param] = list(areas)
 
-        return self.fetch_csv("data/Result/search", params)
+        return self.iter_csv("data/Result/search", params, attempts=attempts)
 
     def fetch_summary(self, statecode: str) -> list[dict]:
         """
@@ -223,6 +465,174 @@ class WQPClient:
         })
 
 
+# =============================================================================
+# Adaptive Query Planning
+# =============================================================================
+
+class QuerySlice(NamedTuple):
+    """One Result query: a date window plus optional area/characteristic subsets."""
+    start: date
+    end: date
+    areas: Optional[tuple[str, ...]]    # None = whole state
+    params: Optional[tuple[str, ...]]   # None = every characteristic
+    depth: tuple[int, int, int] = (0, 0, 0)  # halvings along SPLIT_AXES
+
+    def describe(self) -> str:
+        parts = [f"{self.start}..{self.end}"]
+        if self.areas is not None:
+            parts.append(f"{len(self.areas)} areas")
+        if self.params is not None:
+            parts.append(f"{len(self.params)} params")
+        return ", ".join(parts)
+
+
+class QueryPlanner:
+    """
+    Fetches a state-year as a sequence of Result queries.
+
+    Starts from the split depth that last worked for the state (see
+    SplitPlanStore). Any query that fails before its first row — timeouts,
+    5xx — is replaced by its two halves along the first axis that can still
+    be split: date window, then county/HUC list, then characteristic list.
+    Halves never overlap, so rows are never duplicated. Failures after the
+    first row are not retried here (WQPStreamError propagates).
+    """
+
+    def __init__(self, client: "WQPClient", statecode: str,
+                 area_param: Optional[str] = None, areas: Iterable[str] = (),
+                 plan: Optional[tuple[int, int, int]] = None, label: str = ""):
+        self.client = client
+        self.statecode = statecode
+        self.label = label or statecode
+        self.area_param = area_param
+        self.areas = tuple(areas)
+        self.plan = tuple(plan or (0, 0, 0))
+        self.used = (0, 0, 0)   # deepest split that succeeded
+        self.splits = 0
+
+    def split(self, s: QuerySlice, axis: str) -> Optional[list[QuerySlice]]:
+        """Halve `s` along `axis`, or None if it can't be split that way."""
+        i = SPLIT_AXES.index(axis)
+        depth = s.depth[:i] + (s.depth[i] + 1,) + s.depth[i + 1:]
+        if axis == "date":
+            days = (s.end - s.start).days + 1
+            if days < 2 * MIN_SPLIT_DAYS:
+                return None
+            mid = s.start + timedelta(days=days // 2)
+            return [s._replace(end=mid - timedelta(days=1), depth=depth),
+                    s._replace(start=mid, depth=depth)]
+        if axis == "area":
+            areas = self.areas if s.areas is None else s.areas
+            if not self.area_param or len(areas) < 2:
+                return None
+            half = len(areas) // 2
+            return [s._replace(areas=areas[:half], depth=depth),
+                    s._replace(areas=areas[half:], depth=depth)]
+        params = s.params or ()
+        if len(params) < 2:
+            return None
+        half = len(params) // 2
+        return [s._replace(params=params[:half], depth=depth),
+                s._replace(params=params[half:], depth=depth)]
+
+    def split_further(self, s: QuerySlice) -> tuple[Optional[str], Optional[list[QuerySlice]]]:
+        for axis in SPLIT_AXES:
+            parts = self.split(s, axis)
+            if parts:
+                return axis, parts
+        return None, None
+
+    def initial_slices(self, start: date, end: date,
+                       parameters: Optional[Iterable[str]]) -> list[QuerySlice]:
+        """The whole window, pre-split to the remembered plan."""
+        slices = [QuerySlice(start, end, None, tuple(parameters) if parameters else None)]
+        for axis, times in zip(SPLIT_AXES, self.plan):
+            for _ in range(times):
+                slices = [part for s in slices for part in (self.split(s, axis) or [s])]
+        return slices
+
+    def iter_results(self, year: int, parameters: Iterable[str] = None,
+                     since: Optional[str] = None) -> Iterator[dict]:
+        """Same rows as WQPClient.iter_results(), fetched in as many pieces as needed."""
+        start = date.fromisoformat(since) if since else date(year, 1, 1)
+        pending = self.initial_slices(start, date(year, 12, 31), parameters)
+        if len(pending) > 1:
+            log.info(f"  [{self.label}] {year}: {len(pending)} queries "
+                     f"(split plan {dict(zip(SPLIT_AXES, self.plan))})")
+
+        while pending:
+            s = pending.pop(0)
+            axis, parts = self.split_further(s)
+            try:
+                yield from self.client.iter_results_window(
+                    self.statecode, s.start, s.end, s.params,
+                    self.area_param, s.areas,
+                    attempts=SPLIT_AFTER_ATTEMPTS if parts else MAX_RETRIES,
+                )
+            except WQPQueryFailed as e:
+                if not parts:
+                    raise
+                log.warning(f"  [{self.label}] {s.describe()}: {e} — splitting by {axis}")
+                pending[0:0] = parts
+                self.splits += 1
+                continue
+            self.used = tuple(max(a, b) for a, b in zip(self.used, s.depth))
+
+
+def station_areas(raw_stations: list[dict]) -> tuple[Optional[str], list[str]]:
+    """
+    Area codes that partition a state's stations, for splitting queries:
+    ("countycode", ["US:24:003", ...]) or ("huc", ["02060003", ...]).
+    Only returned when every station has one, so no rows fall between areas.
+    """
+    counties = {(r.get("StateCode"), r.get("CountyCode")) for r in raw_stations}
+    if raw_stations and all(st and co for st, co in counties):
+        return "countycode", sorted(f"US:{st}:{co}" for st, co in counties)
+    hucs = {r.get("HUCEightDigitCode") for r in raw_stations}
+    if raw_stations and all(hucs):
+        return "huc", sorted(hucs)
+    return None, []
+
+
+class SplitPlanStore:
+    """
+    Remembers, per state, the deepest query split WQP needed:
+
+      {"MD": {"date": 2, "area": 0, "param": 0, "updatedAt": "..."}}
+
+    (halvings along each axis). Plans only ever get deeper; delete the file
+    to start from whole state-year queries again.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: dict[str, dict] = {}
+        if path.exists():
+            with open(path) as f:
+                self._data = json.load(f)
+
+    def get(self, state_code: str) -> tuple[int, int, int]:
+        with self._lock:
+            plan = self._data.get(state_code, {})
+        return tuple(plan.get(axis, 0) for axis in SPLIT_AXES)
+
+    def record(self, state_code: str, used: tuple[int, int, int]):
+        with self._lock:
+            current = self._data.get(state_code, {})
+            merged = {axis: max(current.get(axis, 0), n) for axis, n in zip(SPLIT_AXES, used)}
+            if any(merged[axis] != current.get(axis, 0) for axis in SPLIT_AXES):
+                merged["updatedAt"] = datetime.now(tz=__import__("datetime").timezone.utc).isoformat() + "Z"
+                self._data[state_code] = merged
+
+    def save(self):
+        with self._lock:
+            tmp = self.path.with_suffix(".json.tmp")
+            with open(tmp, "w") as f:
+                json.dump(self._data, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
 # =============================================================================
 # Data Processors
 # =============================================================================
@@ -251,15 +661,19 @@ def process_stations(raw_stations: list[dict], state_code: str) -> list[dict]:
     return stations
 
 
-def process_observations(raw_results: list[dict]) -> list[dict]:
+def process_observations(raw_results: Iterable[dict]) -> list[dict]:
     """Normalize raw WQP result records to PIN observation format."""
-    observations = []
+    return list(iter_observations(raw_results))
+
+
+def iter_observations(raw_results: Iterable[dict]) -> Iterator[dict]:
+    """Streaming variant of process_observations() — one row in, one row out."""
     for r in raw_results:
         value = safe_float(r.get("ResultMeasureValue"))
         if value is None:
             continue  # Skip non-detects and blanks for now
 
-        observations.append({
+        yield {
             "stationId": r.get("MonitoringLocationIdentifier", ""),
             "date": r.get("ActivityStartDate", ""),
             "parameter": r.get("CharacteristicName", ""),
@@ -270,79 +684,99 @@ def process_observations(raw_results: list[dict]) -> list[dict]:
             "detectionLimit": safe_float(
                 r.get("DetectionQuantitationLimitMeasure/MeasureValue")
             ),
-        })
-    return observations
+        }
 
 
-def detect_exceedances(observations: list[dict]) -> list[dict]:
-    """Flag observations that exceed screening thresholds."""
+def detect_exceedances(observations) -> list[dict]:
+    """
+    Flag observations that exceed screening thresholds.
+    Takes an ObservationStore (screened column-wise) or a list of dicts.
+    """
+    if not isinstance(observations, ObservationStore):
+        observations = ObservationStore.from_observations(observations)
+    if not len(observations):
+        return []
+
+    cols = observations.columns()
+    hits = screen_coded(cols["parameter"], observations.pools["parameter"].values, cols["value"])
     exceedances = []
-    for obs in observations:
-        param = obs["parameter"]
-        value = obs["value"]
-        if value is None or param not in EXCEEDANCE_THRESHOLDS:
-            continue
+    for i in np.flatnonzero(hits.mask):
+        obs = observations.row(i)
+        exceedances.append({
+            "stationId": obs["stationId"],
+            "date": obs["date"],
+            "parameter": obs["parameter"],
+            "value": obs["value"],
+            "unit": obs["unit"] or EXCEEDANCE_THRESHOLDS[obs["parameter"]].get("unit", ""),
+            "threshold": float(hits.threshold[i]),
+            "percentOver": round(float(hits.percent_over[i]), 4),
+        })
+    return exceedances
 
-        config = EXCEEDANCE_THRESHOLDS[param]
-        exceeded = False
-        threshold = None
-
-        if config["direction"] == "above":
-            threshold = config["threshold"]
-            exceeded = value > threshold
-        elif config["direction"] == "below":
-            threshold = config["threshold"]
-            exceeded = value < threshold
-        elif config["direction"] == "range":
-            if value < config["threshold_low"]:
-                threshold = config["threshold_low"]
-                exceeded = True
-            elif value > config["threshold_high"]:
-                threshold = config["threshold_high"]
-                exceeded = True
-
-        if exceeded and threshold:
-            pct = abs(value - threshold) / threshold if threshold != 0 else 0
-            exceedances.append({
-                "stationId": obs["stationId"],
-                "date": obs["date"],
-                "parameter": param,
-                "value": value,
-                "unit": obs["unit"] or config.get("unit", ""),
-                "threshold": threshold,
-                "percentOver": round(pct, 4),
-            })
 
-    return exceedances
+class StateAggregator:
+    """
+    Running, mergeable state summary.
+
+    Each year chunk is folded in with update() as soon as it is processed (one
+    vectorized pass over its columns), so earlier years never need to stay in
+    memory. Partial aggregates from worker threads combine with merge();
+    merging in year order gives the same tie-breaking as a single pass over
+    all observations.
+    """
+
+    def __init__(self):
+        self.observation_count = 0
+        self.param_counts: dict[str, int] = {}
+        self.station_counts: dict[str, int] = {}
+        self.station_latest: dict[str, str] = {}
+        self.earliest: Optional[str] = None
+        self.latest: Optional[str] = None
+
+    def update(self, observations: ObservationStore):
+        """Fold in one chunk of observations."""
+        part = StateAggregator()
+        part.observation_count = len(observations)
+        part.param_counts = observations.value_counts("parameter")
+        part.station_counts = observations.value_counts("stationId")
+        part.station_latest = observations.latest_dates("stationId")
+        part.earliest, part.latest = observations.date_range()
+        self.merge(part)
+
+    def merge(self, other: "StateAggregator"):
+        """Combine another aggregate into this one."""
+        self.observation_count += other.observation_count
+        for p, n in other.param_counts.items():
+            self.param_counts[p] = self.param_counts.get(p, 0) + n
+        for sid, n in other.station_counts.items():
+            self.station_counts[sid] = self.station_counts.get(sid, 0) + n
+        for sid, d in other.station_latest.items():
+            if sid not in self.station_latest or d > self.station_latest[sid]:
+                self.station_latest[sid] = d
+        if other.earliest and (not self.earliest or other.earliest < self.earliest):
+            self.earliest = other.earliest
+        if other.latest and (not self.latest or other.latest > self.latest):
+            self.latest = other.latest
+
+    def enrich_stations(self, stations: list[dict]):
+        """Fill in resultCount / lastSampleDate on station records in place."""
+        for s in stations:
+            s["resultCount"] = self.station_counts.get(s["id"], 0)
+            s["lastSampleDate"] = self.station_latest.get(s["id"])
 
 
 def build_state_summary(state_code: str, state_name: str,
                         stations: list[dict],
-                        all_observations: list[dict],
+                        aggregate: StateAggregator,
                         exceedances: list[dict]) -> dict:
     """Build state-level summary for state cards."""
     orgs = set()
-    param_counts: dict[str, int] = {}
-    dates = []
-
-    for obs in all_observations:
-        p = obs["parameter"]
-        param_counts[p] = param_counts.get(p, 0) + 1
-        if obs.get("date"):
-            dates.append(obs["date"])
-
     for s in stations:
         if s.get("orgId"):
             orgs.add(s["orgId"])
 
-    dates_sorted = sorted(dates) if dates else []
-
     # Top 10 stations by observation count
-    station_obs_count: dict[str, int] = {}
-    for obs in all_observations:
-        sid = obs["stationId"]
-        station_obs_count[sid] = station_obs_count.get(sid, 0) + 1
-
+    station_obs_count = aggregate.station_counts
     station_map = {s["id"]: s for s in stations}
     top_station_ids = sorted(station_obs_count, key=station_obs_count.get, reverse=True)[:10]
     top_stations = []
@@ -356,13 +790,13 @@ def build_state_summary(state_code: str, state_name: str,
         "stateCode": state_code,
         "stateName": state_name,
         "stationCount": len(stations),
-        "observationCount": len(all_observations),
+        "observationCount": aggregate.observation_count,
         "exceedanceCount": len(exceedances),
         "organizations": sorted(orgs),
-        "parameterCoverage": dict(sorted(param_counts.items(), key=lambda x: -x[1])),
+        "parameterCoverage": dict(sorted(aggregate.param_counts.items(), key=lambda x: -x[1])),
         "dateRange": {
-            "earliest": dates_sorted[0] if dates_sorted else None,
-            "latest": dates_sorted[-1] if dates_sorted else None,
+            "earliest": aggregate.earliest,
+            "latest": aggregate.latest,
         },
         "topStations": top_stations,
         "generatedAt": datetime.now(tz=__import__("datetime").timezone.utc).isoformat() + "Z",
@@ -385,27 +819,408 @@ def write_json(path: Path, data, indent=2):
     log.info(f"  Wrote {path} ({size_kb:.0f} KB)")
 
 
+class ObservationChunkWriter:
+    """
+    Streams observations into a JSON array file one record at a time.
+
+    Rows go to a .tmp sibling that only replaces the target once the writer
+    closes cleanly with at least one row, so an interrupted or empty fetch
+    never clobbers an existing chunk.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.tmp_path = path.with_suffix(path.suffix + ".tmp")
+        self.count = 0
+        self._f = None
+
+    def __enter__(self):
+        ensure_dir(self.path.parent)
+        self._f = open(self.tmp_path, "w")
+        self._f.write("[")
+        return self
+
+    def write(self, obs: dict):
+        if self.count:
+            self._f.write(", ")
+        self._f.write(json.dumps(obs, default=str))
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        self._f.write("]")
+        self._f.close()
+        if exc_type is None and self.count:
+            os.replace(self.tmp_path, self.path)
+            size_kb = self.path.stat().st_size / 1024
+            log.info(f"  Wrote {self.path} ({size_kb:.0f} KB)")
+        else:
+            self.tmp_path.unlink(missing_ok=True)
+        return False
+
+
+def observations_chunk_path(state_code: str, year: int, base_dir: Path) -> Path:
+    return base_dir / "observations" / state_code.lower() / f"{year}.json"
+
+
 def write_observations_chunked(state_code: str, year: int,
-                                observations: list[dict], base_dir: Path):
-    """Write observations to year-chunked files."""
-    obs_dir = base_dir / "observations" / state_code.lower()
-    ensure_dir(obs_dir)
-    path = obs_dir / f"{year}.json"
-    write_json(path, observations, indent=None)  # No indent for data files — smaller
+                                observations: Iterable[dict], base_dir: Path) -> int:
+    """Write observations to year-chunked files. Returns rows written."""
+    path = observations_chunk_path(state_code, year, base_dir)
+    with ObservationChunkWriter(path) as writer:
+        for obs in observations:
+            writer.write(obs)
+    return writer.count
+
+
+def read_observations_chunk(path: Path) -> ObservationStore:
+    """Load a previously written year chunk, JSON or Parquet (empty store if missing)."""
+    if not path.exists():
+        return ObservationStore()
+    if path.suffix == ".parquet":
+        return ObservationStore.from_arrow(pq.read_table(path))
+    with open(path) as f:
+        return ObservationStore.from_observations(json.load(f))
+
+
+def write_parquet_chunk(path: Path, observations: ObservationStore):
+    """
+    Write a year chunk as zstd Parquet, sorted by station then date so
+    station/date-range reads can prune row groups. Atomic, like the JSON writer.
+    """
+    ensure_dir(path.parent)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    table = observations.to_arrow(observations.sort_order("stationId", "date"))
+    try:
+        pq.write_table(table, tmp_path, compression=PARQUET_COMPRESSION)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    size_kb = path.stat().st_size / 1024
+    log.info(f"  Wrote {path} ({size_kb:.0f} KB)")
+
+
+class _NullChunkWriter:
+    """Stands in for ObservationChunkWriter when JSON output is off."""
+
+    count = 0
+
+    def __enter__(self):
+        return self
+
+    def write(self, obs: dict):
+        pass
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class ObservationChunks:
+    """
+    Where a state-year chunk lives in each enabled output format.
+
+    JSON is streamed row by row as results arrive; Parquet is written once
+    per chunk from the columnar store, so neither format is ever re-read to
+    produce the other.
+    """
+
+    def __init__(self, base_dir: Path, formats: Iterable[str] = OUTPUT_FORMATS[DEFAULT_FORMAT],
+                 parquet_dir: Path = PARQUET_DIR):
+        self.base_dir = base_dir
+        self.formats = tuple(formats)
+        self.parquet_dir = parquet_dir
+
+    def path(self, state_code: str, year: int, fmt: str) -> Path:
+        if fmt == "parquet":
+            return self.parquet_dir / state_code.lower() / f"{year}.parquet"
+        return observations_chunk_path(state_code, year, self.base_dir)
+
+    def existing(self, state_code: str, year: int) -> Optional[Path]:
+        """
+        Best chunk on disk. Enabled formats come first (a disabled one may be
+        stale), Parquet before JSON since it is cheaper to load.
+        """
+        order = sorted(("parquet", "json"), key=lambda f: (f not in self.formats, f != "parquet"))
+        for fmt in order:
+            path = self.path(state_code, year, fmt)
+            if path.exists() and (fmt != "parquet" or pq is not None):
+                return path
+        return None
+
+    def missing(self, state_code: str, year: int) -> list[str]:
+        return [fmt for fmt in self.formats if not self.path(state_code, year, fmt).exists()]
+
+    def read(self, state_code: str, year: int) -> ObservationStore:
+        path = self.existing(state_code, year)
+        return read_observations_chunk(path) if path else ObservationStore()
+
+    def json_writer(self, state_code: str, year: int):
+        if "json" not in self.formats:
+            return _NullChunkWriter()
+        return ObservationChunkWriter(self.path(state_code, year, "json"))
+
+    def finish(self, state_code: str, year: int, observations: ObservationStore,
+               formats: Optional[Iterable[str]] = None):
+        """Write the non-streamed formats for a complete chunk."""
+        formats = self.formats if formats is None else formats
+        if not len(observations):
+            return
+        if "parquet" in formats:
+            write_parquet_chunk(self.path(state_code, year, "parquet"), observations)
+        if "json" in formats and not self.path(state_code, year, "json").exists():
+            # Backfilling JSON for a chunk that only exists as Parquet
+            write_observations_chunked(state_code, year, observations, self.base_dir)
+
+
+class WatermarkStore:
+    """
+    Per state/year high-water marks, persisted next to fetch_log.json.
+
+      {"MD": {"2024": {"latestDate": "2024-12-30", "rowCount": 512340,
+                       "fetchedAt": "...", "closed": false}}}
+
+    Updated from worker threads, so access is locked and saves are atomic.
+    """
+
+    def __init__(self, path: Path, load: bool = True):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: dict[str, dict[str, dict]] = {}
+        if load and path.exists():
+            with open(path) as f:
+                self._data = json.load(f)
+
+    def get(self, state_code: str, year: int) -> Optional[dict]:
+        with self._lock:
+            return self._data.get(state_code, {}).get(str(year))
+
+    def update(self, state_code: str, year: int, mark: dict):
+        with self._lock:
+            self._data.setdefault(state_code, {})[str(year)] = mark
+
+    def save(self):
+        with self._lock:
+            tmp = self.path.with_suffix(".json.tmp")
+            with open(tmp, "w") as f:
+                json.dump(self._data, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
+class CheckpointJournal:
+    """
+    Append-only journal of completed fetch units, one JSON line each:
+
+      {"state": "MD", "year": 2024, "group": "core", "rows": 512340,
+       "watermark": {...}, "completedAt": "..."}
+      {"state": "MD", "year": null, "group": "state", "rows": 2210, ...}
+
+    A unit is logged only after its output is in place, and each line is
+    fsync'd before the next unit starts, so a killed run loses at most the
+    units in flight. A fresh run truncates the journal; --resume reads it
+    back and keeps appending. A torn final line is ignored.
+    """
+
+    def __init__(self, path: Path, resume: bool = False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._done: dict[tuple, dict] = {}
+        tail = ""
+        if resume and path.exists():
+            with open(path) as f:
+                for line in f:
+                    tail = line
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._done[(entry["state"], entry["year"], entry["group"])] = entry
+        ensure_dir(path.parent)
+        self._f = open(path, "a" if resume else "w")
+        if tail and not tail.endswith("\n"):
+            self._f.write("\n")   # don't glue the next entry onto a torn line
+
+    @property
+    def completed(self) -> int:
+        """Units recorded so far (including those loaded for --resume)."""
+        return len(self._done)
+
+    def done(self, state_code: str, year: Optional[int], group: str) -> Optional[dict]:
+        with self._lock:
+            return self._done.get((state_code, year, group))
+
+    def record(self, state_code: str, year: Optional[int], group: str, **fields):
+        entry = {
+            "state": state_code, "year": year, "group": group, **fields,
+            "completedAt": datetime.now(tz=__import__("datetime").timezone.utc).isoformat() + "Z",
+        }
+        with self._lock:
+            self._f.write(json.dumps(entry) + "\n")
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._done[(state_code, year, group)] = entry
+
+    def close(self):
+        with self._lock:
+            self._f.close()
+
+
+def year_closes_on(year: int) -> date:
+    """Last day of a year's grace period for late uploads."""
+    return date(year + 1, 1, 1) + timedelta(days=CLOSED_YEAR_GRACE_DAYS)
+
+
+def make_watermark(year: int, observations: ObservationStore, full: bool) -> dict:
+    """Build the watermark for a freshly written year chunk. Only a full fetch
+    made after the grace period closes the year."""
+    now = datetime.now(tz=__import__("datetime").timezone.utc)
+    return {
+        "latestDate": observations.date_range()[1],
+        "rowCount": len(observations),
+        "fetchedAt": now.isoformat() + "Z",
+        "closed": full and now.date() > year_closes_on(year),
+    }
 
 
 # =============================================================================
 # Main Fetch Pipeline
 # =============================================================================
 
+def fetch_state_year(client: WQPClient, state_code: str, fips: str,
+                     year: int, chunks: ObservationChunks,
+                     watermark: Optional[dict] = None,
+                     journal: Optional[CheckpointJournal] = None,
+                     planner: Optional[QueryPlanner] = None) -> dict:
+    """
+    Fetch, write and screen one state-year chunk. Safe to run on a worker thread.
+
+    With a watermark from a previous run:
+      - closed years are not requested at all; the chunk on disk is reused
+        (and written out in any newly enabled format)
+      - open years request activity from INCREMENTAL_LOOKBACK_DAYS before the
+        watermark date on, and replace the existing chunk's rows from that
+        date on with it (late uploads for earlier activity are picked up)
+      - open years past their grace period are refetched in full once, and
+        only that fetch closes them
+
+    Results are requested through `planner`, which splits queries WQP
+    can't answer in one piece.
+
+    Units already in the checkpoint `journal` are rebuilt from the chunk on
+    disk without a request; newly finished units are added to it.
+
+    The year's observations are folded into a StateAggregator before
+    returning, so only the aggregate — not the rows — outlives the task.
+
+    Returns {"year", "mode", "aggregate", "exceedances", "watermark", "error",
+    "plan", "splits"}.
+    """
+    chunk_path = chunks.existing(state_code, year)
+    yr = {"year": year, "mode": "full", "aggregate": StateAggregator(), "exceedances": [],
+          "watermark": None, "error": None, "plan": None, "splits": 0}
+
+    checkpoint = journal.done(state_code, year, CORE_GROUP) if journal else None
+    if checkpoint and (chunk_path or not checkpoint["rows"]):
+        log.info(f"  [{state_code}] {year} already checkpointed — rebuilding from disk")
+        yr["mode"] = "resumed"
+        yr["watermark"] = checkpoint.get("watermark")
+        if not checkpoint["rows"]:
+            yr["error"] = f"No results for {year}"
+            return yr
+        observations = read_observations_chunk(chunk_path)
+        yr["aggregate"].update(observations)
+        yr["exceedances"] = detect_exceedances(observations)
+        return yr
+
+    since = None
+    kept = ObservationStore()
+    if watermark and chunk_path:
+        if watermark.get("closed"):
+            log.info(f"  [{state_code}] {year} closed — reusing {chunk_path}")
+            yr["mode"] = "skipped"
+            observations = read_observations_chunk(chunk_path)
+            chunks.finish(state_code, year, observations, chunks.missing(state_code, year))
+            yr["aggregate"].update(observations)
+            yr["exceedances"] = detect_exceedances(observations)
+            return yr
+        since = watermark.get("latestDate")
+        if since and datetime.now(tz=__import__("datetime").timezone.utc).date() > year_closes_on(year):
+            log.info(f"  [{state_code}] {year} past its grace period — full refetch before closing")
+            since = None
+        elif since:
+            lookback = date.fromisoformat(since) - timedelta(days=INCREMENTAL_LOOKBACK_DAYS)
+            since = max(lookback, date(year, 1, 1)).isoformat()
+            yr["mode"] = "incremental"
+            existing = read_observations_chunk(chunk_path)
+            kept = existing.select(existing.columns()["date"] < existing.date_code(since))
+
+    log.info(f"  [{state_code}] Fetching {year} observations"
+             f"{f' since {since}' if since else ''}...")
+
+    # Stream rows → normalize → write + columnar store, without holding the raw response
+    planner = planner or QueryPlanner(client, fips, label=state_code)
+    observations = kept
+    new_count = 0
+    try:
+        with chunks.json_writer(state_code, year) as writer, \
+                client.telemetry.context(state=state_code, year=year):
+            for obs in kept:
+                writer.write(obs)
+            rows = planner.iter_results(year, CORE_PARAMETERS, since=since)
+            for obs in iter_observations(rows):
+                writer.write(obs)
+                observations.append(obs)
+                new_count += 1
+    except (WQPStreamError, WQPQueryFailed) as e:
+        log.error(f"  [{state_code}] {year}: {e}")
+        kind = "Stream" if isinstance(e, WQPStreamError) else "Query"
+        yr["error"] = f"{kind} failed for {year}: {e}"
+        yr["splits"] = planner.splits
+        # The old chunk is untouched; keep it in the summary
+        observations = chunks.read(state_code, year)
+        yr["aggregate"].update(observations)
+        yr["exceedances"] = detect_exceedances(observations)
+        return yr
+
+    yr["plan"], yr["splits"] = planner.used, planner.splits
+    if not len(observations):
+        log.warning(f"  [{state_code}] No results for {year}")
+        yr["error"] = f"No results for {year}"
+        if journal:
+            journal.record(state_code, year, CORE_GROUP, rows=0)
+        return yr
+
+    chunks.finish(state_code, year, observations, [f for f in chunks.formats if f != "json"])
+    yr["aggregate"].update(observations)
+    yr["exceedances"] = detect_exceedances(observations)
+    yr["watermark"] = make_watermark(year, observations, full=since is None)
+    if journal:
+        journal.record(state_code, year, CORE_GROUP, rows=len(observations),
+                       watermark=yr["watermark"])
+    log.info(
+        f"  [{state_code}] {year}: {len(observations)} observations "
+        f"({new_count} fetched), {len(yr['exceedances'])} exceedances"
+    )
+    return yr
+
+
 def fetch_state(client: WQPClient, state_code: str, state_info: dict,
                 years_back: int = DEFAULT_YEARS_BACK,
                 target_year: Optional[int] = None,
                 summary_only: bool = False,
                 dry_run: bool = False,
-                base_dir: Path = OUTPUT_DIR) -> dict:
+                base_dir: Path = OUTPUT_DIR,
+                executor: Optional[ThreadPoolExecutor] = None,
+                watermarks: Optional[WatermarkStore] = None,
+                chunks: Optional[ObservationChunks] = None,
+                journal: Optional[CheckpointJournal] = None,
+                plans: Optional[SplitPlanStore] = None) -> dict:
     """
     Fetch all WQP data for a single state.
+    Year chunks are fetched on `executor` if given, otherwise one at a time.
+    With `watermarks`, closed years are reused from disk and open years are
+    fetched incrementally. `chunks` picks the observation output formats
+    (JSON under base_dir by default). With a checkpoint `journal`, finished
+    year units and state station lists are reused from disk. `plans` holds
+    the query split each state needed last time and is updated from this run.
     Returns fetch result dict for the health log.
     """
     fips = state_info["fips"]
@@ -423,6 +1238,9 @@ def fetch_state(client: WQPClient, state_code: str, state_info: dict,
         "exceedancesFound": 0,
         "errors": [],
         "yearsFetched": [],
+        "yearsSkipped": [],
+        "yearsResumed": [],
+        "querySplits": 0,
     }
 
     # ── Step 1: Stations ──
@@ -431,19 +1249,37 @@ def fetch_state(client: WQPClient, state_code: str, state_info: dict,
         log.info(f"  [{state_code}] Would fetch stations from {fips}")
         return result
 
-    raw_stations = client.fetch_stations(fips)
-    stations = process_stations(raw_stations, state_code)
-    result["stationsFound"] = len(stations)
-    log.info(f"  [{state_code}] Found {len(stations)} stations")
-
-    # Write stations
     stations_dir = base_dir / "stations"
     ensure_dir(stations_dir)
-    write_json(stations_dir / f"{state_code.lower()}.json", stations)
+    stations_path = stations_dir / f"{state_code.lower()}.json"
+
+    checkpoint = journal.done(state_code, None, "state") if journal else None
+    if checkpoint and stations_path.exists():
+        with open(stations_path) as f:
+            stations = json.load(f)
+        for s in stations:
+            # Back to process_stations() shape; re-enriched from the chunks below
+            s["resultCount"], s["lastSampleDate"] = 0, None
+        if "areaParam" in checkpoint:
+            # The partition the checkpointed run planned with (county before HUC)
+            area_param, areas = checkpoint["areaParam"], checkpoint["areas"]
+        else:
+            # Journal from before areas were recorded: HUCs are all the stations file keeps
+            hucs = {s["huc8"] for s in stations}
+            area_param, areas = ("huc", sorted(hucs)) if stations and all(hucs) else (None, [])
+        log.info(f"  [{state_code}] Stations checkpointed — reusing {stations_path}")
+    else:
+        with client.telemetry.context(state=state_code):
+            raw_stations = client.fetch_stations(fips)
+        stations = process_stations(raw_stations, state_code)
+        area_param, areas = station_areas(raw_stations)
+    result["stationsFound"] = len(stations)
+    log.info(f"  [{state_code}] Found {len(stations)} stations")
 
     if summary_only:
         # Build minimal summary without fetching observations
-        summary = build_state_summary(state_code, name, stations, [], [])
+        write_json(stations_path, stations)
+        summary = build_state_summary(state_code, name, stations, StateAggregator(), [])
         summaries_dir = base_dir / "summaries"
         ensure_dir(summaries_dir)
         write_json(summaries_dir / f"{state_code.lower()}.json", summary)
@@ -457,34 +1293,48 @@ def fetch_state(client: WQPClient, state_code: str, state_info: dict,
     else:
         years = list(range(current_year - years_back + 1, current_year + 1))
 
-    all_observations = []
+    aggregate = StateAggregator()
     all_exceedances = []
-
-    for year in years:
-        log.info(f"  [{state_code}] Fetching {year} observations...")
-        raw_results = client.fetch_results(fips, year, CORE_PARAMETERS)
-
-        if not raw_results:
-            log.warning(f"  [{state_code}] No results for {year}")
-            result["errors"].append(f"No results for {year}")
+    chunks = chunks or ObservationChunks(base_dir)
+
+    def year_args(year):
+        mark = watermarks.get(state_code, year) if watermarks else None
+        planner = QueryPlanner(client, fips, area_param, areas,
+                               plans.get(state_code) if plans else None, label=state_code)
+        return (client, state_code, fips, year, chunks, mark, journal, planner)
+
+    # Year tasks run on the shared worker pool when one is given
+    if executor:
+        futures = [executor.submit(fetch_state_year, *year_args(year)) for year in years]
+        year_results = (f.result() for f in futures)
+    else:
+        year_results = (fetch_state_year(*year_args(year)) for year in years)
+
+    for yr in year_results:
+        aggregate.merge(yr["aggregate"])
+        all_exceedances.extend(yr["exceedances"])
+        result["querySplits"] += yr["splits"]
+        if plans and yr["plan"]:
+            plans.record(state_code, yr["plan"])
+        if yr["error"]:
+            result["errors"].append(yr["error"])
             continue
 
-        observations = process_observations(raw_results)
-        exceedances = detect_exceedances(observations)
-
-        log.info(
-            f"  [{state_code}] {year}: {len(observations)} observations, "
-            f"{len(exceedances)} exceedances"
-        )
-
-        # Write year chunk
-        write_observations_chunked(state_code, year, observations, base_dir)
-
-        all_observations.extend(observations)
-        all_exceedances.extend(exceedances)
-        result["yearsFetched"].append(year)
-
-    result["observationsFetched"] = len(all_observations)
+        if yr["mode"] == "skipped":
+            result["yearsSkipped"].append(yr["year"])
+        elif yr["mode"] == "resumed":
+            result["yearsResumed"].append(yr["year"])
+        else:
+            result["yearsFetched"].append(yr["year"])
+        if watermarks and yr["watermark"]:
+            watermarks.update(state_code, yr["year"], yr["watermark"])
+
+    if watermarks:
+        watermarks.save()
+    if plans:
+        plans.save()
+
+    result["observationsFetched"] = aggregate.observation_count
     result["exceedancesFound"] = len(all_exceedances)
 
     # ── Step 3: Exceedances ──
@@ -495,28 +1345,18 @@ def fetch_state(client: WQPClient, state_code: str, state_info: dict,
 
     # ── Step 4: State summary ──
     summary = build_state_summary(
-        state_code, name, stations, all_observations, all_exceedances
+        state_code, name, stations, aggregate, all_exceedances
     )
     summaries_dir = base_dir / "summaries"
     ensure_dir(summaries_dir)
     write_json(summaries_dir / f"{state_code.lower()}.json", summary)
 
-    # ── Step 5: Enrich station result counts ──
-    station_obs = {}
-    station_dates = {}
-    for obs in all_observations:
-        sid = obs["stationId"]
-        station_obs[sid] = station_obs.get(sid, 0) + 1
-        d = obs.get("date", "")
-        if d and (sid not in station_dates or d > station_dates[sid]):
-            station_dates[sid] = d
-
-    for s in stations:
-        s["resultCount"] = station_obs.get(s["id"], 0)
-        s["lastSampleDate"] = station_dates.get(s["id"])
-
-    # Re-write stations with enriched counts
-    write_json(stations_dir / f"{state_code.lower()}.json", stations)
+    # ── Step 5: Stations, enriched with result counts ──
+    aggregate.enrich_stations(stations)
+    write_json(stations_path, stations)
+    if journal and not result["errors"] and not checkpoint:
+        journal.record(state_code, None, "state", rows=len(stations),
+                       areaParam=area_param, areas=areas)
 
     duration = time.time() - start_time
     result["durationMs"] = int(duration * 1000)
@@ -524,7 +1364,7 @@ def fetch_state(client: WQPClient, state_code: str, state_info: dict,
 
     log.info(
         f"  [{state_code}] Done: {len(stations)} stations, "
-        f"{len(all_observations)} observations, "
+        f"{aggregate.observation_count} observations, "
         f"{len(all_exceedances)} exceedances in {duration:.1f}s"
     )
 
@@ -534,10 +1374,45 @@ def fetch_state(client: WQPClient, state_code: str, state_info: dict,
 def run_pipeline(states: dict[str, dict], years_back: int,
                  target_year: Optional[int], target_state: Optional[str],
                  summary_only: bool, dry_run: bool,
-                 base_dir: Path):
-    """Run the full fetch pipeline."""
-    client = WQPClient()
+                 base_dir: Path,
+                 workers: int = DEFAULT_WORKERS,
+                 max_per_host: int = MAX_CONCURRENT_PER_HOST,
+                 full_refresh: bool = False,
+                 output_format: str = DEFAULT_FORMAT,
+                 parquet_dir: Path = PARQUET_DIR,
+                 resume: bool = False,
+                 cache_dir: Optional[Path] = None,
+                 use_cache: bool = True,
+                 metrics_file: Optional[Path] = None):
+    """
+    Run the full fetch pipeline.
+    With workers > 1, up to `workers` state/year tasks are in flight at once,
+    all drawing from one shared rate limiter. Unless `full_refresh`, years are
+    fetched incrementally against watermarks.json. `output_format` is one of
+    OUTPUT_FORMATS; Parquet chunks go under `parquet_dir`. Completed units
+    are journaled to checkpoints.jsonl; `resume` skips the ones already there.
+    Station/summary responses are cached under `cache_dir` (default
+    base_dir/http_cache) unless `use_cache` is off. Per-request telemetry is
+    rolled up into fetch_log.json and written to `metrics_file` (default
+    base_dir/METRICS_FILE) for the Prometheus textfile collector.
+    """
+    chunks = ObservationChunks(base_dir, OUTPUT_FORMATS[output_format], parquet_dir)
+    if "parquet" in chunks.formats and pq is None:
+        log.error("Parquet output needs pyarrow: pip install pyarrow --break-system-packages")
+        sys.exit(1)
+
+    cache = None
+    if use_cache:
+        cache = ResponseCache(cache_dir or base_dir / "http_cache", HTTP_CACHE_TTLS,
+                              max_bytes=HTTP_CACHE_MAX_BYTES)
+    telemetry = Telemetry()
+    client = WQPClient(RateLimiter(max_per_host=max_per_host), cache=cache, telemetry=telemetry)
     ensure_dir(base_dir)
+    watermarks = WatermarkStore(base_dir / "watermarks.json", load=not full_refresh)
+    journal = None
+    if not dry_run and not summary_only:
+        journal = CheckpointJournal(base_dir / "checkpoints.jsonl", resume=resume)
+    plans = SplitPlanStore(base_dir / "split_plans.json")
 
     # Filter states if --state was specified
     if target_state:
@@ -554,30 +1429,54 @@ def run_pipeline(states: dict[str, dict], years_back: int,
     log.info(f"Parameters: {len(CORE_PARAMETERS)} core")
     if summary_only:
         log.info("Mode: SUMMARY ONLY (no observations)")
+    if full_refresh:
+        log.info("Mode: FULL REFRESH (ignoring watermarks)")
+    if not summary_only:
+        log.info(f"Observation format: {output_format}"
+                 f"{f' (Parquet → {parquet_dir})' if 'parquet' in chunks.formats else ''}")
     if dry_run:
         log.info("Mode: DRY RUN")
+    if resume and journal is not None:
+        log.info(f"Mode: RESUME ({journal.completed} units already checkpointed)")
+    if workers > 1:
+        log.info(f"Workers: {workers} ({max_per_host} max per host)")
     log.info("=" * 60)
 
-    results = []
     total_start = time.time()
 
-    for state_code, state_info in states.items():
+    def run_state(state_code: str, state_info: dict,
+                  executor: Optional[ThreadPoolExecutor] = None) -> dict:
         try:
-            result = fetch_state(
+            return fetch_state(
                 client, state_code, state_info,
                 years_back=years_back,
                 target_year=target_year,
                 summary_only=summary_only,
                 dry_run=dry_run,
                 base_dir=base_dir,
+                executor=executor,
+                watermarks=watermarks,
+                chunks=chunks,
+                journal=journal,
+                plans=plans,
             )
-            results.append(result)
         except Exception as e:
             log.error(f"FAILED on {state_code}: {e}")
-            results.append({
+            return {
                 "stateCode": state_code,
                 "error": str(e),
-            })
+            }
+
+    if workers > 1:
+        # State threads only coordinate; the year pool bounds real work in flight
+        with ThreadPoolExecutor(workers, thread_name_prefix="wqp-year") as year_pool, \
+                ThreadPoolExecutor(min(workers, len(states)), thread_name_prefix="wqp-state") as state_pool:
+            results = list(state_pool.map(
+                lambda item: run_state(*item, executor=year_pool), states.items()))
+    else:
+        results = [run_state(code, info) for code, info in states.items()]
+    if journal:
+        journal.close()
 
     # Write fetch log
     total_duration = time.time() - total_start
@@ -586,6 +1485,9 @@ def run_pipeline(states: dict[str, dict], years_back: int,
         "runAt": datetime.now(tz=__import__("datetime").timezone.utc).isoformat() + "Z",
         "durationSeconds": round(total_duration, 1),
         "stateResults": results,
+        "transfer": client.transfer.to_dict(),
+        "httpCache": cache.stats() if cache else None,
+        "telemetry": telemetry.summary(),
         "totals": {
             "stations": sum(r.get("stationsFound", 0) for r in results),
             "observations": sum(r.get("observationsFetched", 0) for r in results),
@@ -596,6 +1498,7 @@ def run_pipeline(states: dict[str, dict], years_back: int,
 
     if not dry_run:
         write_json(base_dir / "fetch_log.json", fetch_log)
+        telemetry.write_prometheus(metrics_file or base_dir / METRICS_FILE)
 
     log.info("=" * 60)
     log.info(f"COMPLETE in {total_duration:.1f}s")
@@ -603,6 +1506,11 @@ def run_pipeline(states: dict[str, dict], years_back: int,
     log.info(f"  Observations: {fetch_log['totals']['observations']:,}")
     log.info(f"  Exceedances:  {fetch_log['totals']['exceedances']:,}")
     log.info(f"  Errors:       {fetch_log['totals']['errors']}")
+    log.info(f"  Transfer:     {client.transfer}")
+    slowest = sorted(fetch_log["telemetry"]["byYear"].items(),
+                     key=lambda kv: kv[1]["wallSeconds"], reverse=True)[:3]
+    if slowest:
+        log.info("  Slowest:      " + ", ".join(f"{k} {v['wallSeconds']:.0f}s" for k, v in slowest))
     log.info("=" * 60)
 
 
@@ -652,6 +1560,42 @@ def main():
         "--output-dir", type=str, default=str(OUTPUT_DIR),
         help=f"Output directory. Default: {OUTPUT_DIR}"
     )
+    parser.add_argument(
+        "--format", dest="output_format", choices=sorted(OUTPUT_FORMATS), default=DEFAULT_FORMAT,
+        help=f"Observation chunk format(s). Default: {DEFAULT_FORMAT}."
+    )
+    parser.add_argument(
+        "--parquet-dir", type=str, default=str(PARQUET_DIR),
+        help=f"Parquet chunk directory. Default: {PARQUET_DIR}"
+    )
+    parser.add_argument(
+        "--full-refresh", action="store_true",
+        help="Ignore watermarks and refetch every year in range."
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Skip units finished by an interrupted run (checkpoints.jsonl)."
+    )
+    parser.add_argument(
+        "--cache-dir", type=str, default=None,
+        help="Response cache for station/summary requests. Default: <output-dir>/http_cache"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Always re-download station/summary inventories."
+    )
+    parser.add_argument(
+        "--metrics-file", type=str, default=None,
+        help=f"Prometheus textfile for request metrics. Default: <output-dir>/{METRICS_FILE}"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_WORKERS,
+        help=f"State/year fetches in flight at once. Default: {DEFAULT_WORKERS}."
+    )
+    parser.add_argument(
+        "--max-per-host", type=int, default=MAX_CONCURRENT_PER_HOST,
+        help=f"Concurrent connections to WQP. Default: {MAX_CONCURRENT_PER_HOST}."
+    )
     parser.add_argument(
         "--verbose", action="store_true",
         help="Enable debug logging."
@@ -669,6 +1613,15 @@ def main():
         summary_only=args.summary_only,
         dry_run=args.dry_run,
         base_dir=Path(args.output_dir),
+        workers=args.workers,
+        max_per_host=args.max_per_host,
+        full_refresh=args.full_refresh,
+        output_format=args.output_format,
+        parquet_dir=Path(args.parquet_dir),
+        resume=args.resume,
+        cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+        use_cache=not args.no_cache,
+        metrics_file=Path(args.metrics_file) if args.metrics_file else None,
     )
 
 
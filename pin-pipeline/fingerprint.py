@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+PIN Fingerprints — content hashes that let unchanged data skip the pipeline.
+
+Every fetch rewrote output/{name}.* and every output.py run rewrote the .ts
+files with a fresh `generated` stamp, so the workflow always found a diff
+and opened a PR even when no source had new data. Each fetched payload now
+gets a fingerprint of its normalized content:
+
+  columns   sorted by name
+  values    compared as strings (NaN/None → ""), so dtype drift between
+            runs doesn't count as a change
+  rows      hashed one by one and summed mod 2^64 under two keys — the
+            result is independent of row order (WQP's sorted=no, concurrent
+            pages) but still counts duplicates
+
+and a manifest keeps the last fingerprint per name:
+
+  output/manifest.json        fetch.py: payload unchanged → file not rewritten
+  <target>/.fingerprints.json output.py: .ts built from this fingerprint →
+                              not re-aggregated or rewritten
+
+Usage:
+  fp = fingerprint(df_or_spooled)
+  manifest = Manifest(OUTPUT / MANIFEST_FILE)
+  if not manifest.unchanged(name, fp, path): write ...; manifest.record(name, fp, path)
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from spooled_csv import SpooledCSV
+
+MANIFEST_FILE = "manifest.json"          # under output/
+TS_MANIFEST_FILE = ".fingerprints.json"  # under the .ts target directory
+_ROW_KEYS = ("0123456789123456", "pin-fingerprint1")   # hash_pandas_object keys (16 bytes)
+
+
+class Fingerprint(NamedTuple):
+    digest: str
+    rows: int
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Columns sorted by name, every value a string (missing → "")."""
+    cols = sorted(map(str, df.columns))
+    df = df.set_axis(list(map(str, df.columns)), axis=1)[cols]
+    return df.astype("string").fillna("")
+
+
+def fingerprint_frames(frames: Iterable[pd.DataFrame]) -> Fingerprint:
+    """Order-independent fingerprint over DataFrame chunks that share one set of columns."""
+    sums = [np.uint64(0)] * len(_ROW_KEYS)
+    rows = 0
+    columns: Optional[list[str]] = None
+    with np.errstate(over="ignore"):
+        for chunk in frames:
+            chunk = normalize_frame(chunk)
+            columns = columns or list(chunk.columns)
+            for i, key in enumerate(_ROW_KEYS):
+                row_hashes = pd.util.hash_pandas_object(chunk, index=False, hash_key=key).to_numpy()
+                sums[i] = sums[i] + row_hashes.sum(dtype=np.uint64)
+            rows += len(chunk)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps(columns or []).encode())
+    h.update(f"{rows}:{':'.join(str(int(s)) for s in sums)}".encode())
+    return Fingerprint(h.hexdigest(), rows)
+
+
+def fingerprint(data: Union[pd.DataFrame, SpooledCSV]) -> Fingerprint:
+    """Fingerprint of a fetched DataFrame or SpooledCSV (the spool is read, not consumed)."""
+    if isinstance(data, SpooledCSV):
+        return fingerprint_frames(data.frames())
+    return fingerprint_frames([data])
+
+
+class Manifest:
+    """name → {fingerprint, rows, file, updated}, saved atomically on every change."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        try:
+            self.entries: dict[str, dict] = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def digest(self, name: str) -> Optional[str]:
+        return self.entries.get(name, {}).get("fingerprint")
+
+    def unchanged(self, name: str, fp: Fingerprint, path: Optional[Path] = None) -> bool:
+        """True if `name` was last recorded with this fingerprint (and `path` still exists)."""
+        entry = self.entries.get(name)
+        if not entry or entry.get("fingerprint") != fp.digest:
+            return False
+        return path is None or (entry.get("file") == path.name and path.exists())
+
+    def record(self, name: str, fp: Fingerprint, path: Optional[Path] = None):
+        self.entries[name] = {
+            "fingerprint": fp.digest,
+            "rows": fp.rows,
+            **({"file": path.name} if path is not None else {}),
+            "updated": datetime.utcnow().isoformat() + "Z",
+        }
+        self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(dict(sorted(self.entries.items())), indent=2) + "\n", encoding="utf-8")
+        os.replace(tmp, self.path)
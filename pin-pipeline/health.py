@@ -19,7 +19,6 @@ Usage:
 """
 
 import argparse
-import json
 import os
 import sys
 import time
@@ -27,6 +26,9 @@ import requests
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from http_client import HTTPClient
+from registry_store import RegistryStore
+
 # Fix Windows console encoding for unicode output
 if sys.platform == "win32":
     os.environ.setdefault("PYTHONIOENCODING", "utf-8")
@@ -36,7 +38,6 @@ if sys.platform == "win32":
         pass
 
 DIR = Path(__file__).parent
-REGISTRY = DIR / "registry.json"
 
 # ── Backoff schedule ─────────────────────────────────────────────────────────
 
@@ -47,6 +48,10 @@ DEAD_24H_INTERVAL_MIN = 360  # dead for 24+ hours
 DEAD_7D_INTERVAL_MIN = 1440  # dead for 7+ days
 MAX_BACKOFF_MIN = 1440       # cap at 24 hours
 
+# Keep-alive pool for probes (56 WQP probes share a handful of connections).
+# No retries: a probe reports what the endpoint does on the first try.
+PROBE_CLIENT = HTTPClient(retries=0)
+
 
 def compute_backoff(src):
     """Compute the next check interval in minutes based on error history."""
@@ -117,16 +122,11 @@ def update_backoff_fields(src, status):
     src["last_checked"] = now
 
 
-def load_registry():
-    with open(REGISTRY) as f:
-        return json.load(f)
-
-
-def save_registry(reg):
-    reg["meta"]["updated"] = datetime.utcnow().isoformat() + "Z"
-    with open(REGISTRY, "w") as f:
-        json.dump(reg, f, indent=2)
-    print(f"\n  Registry saved → {REGISTRY.name}")
+def save_registry(store, reg):
+    """Write the remaining changes and refresh registry.json (probes are saved as they finish)."""
+    store.save(reg)
+    path = store.export_json()
+    print(f"\n  Registry saved → {path.name}")
 
 
 def probe(url, fast=False):
@@ -134,9 +134,9 @@ def probe(url, fast=False):
     timeout = 5 if fast else 15
     try:
         if fast:
-            r = requests.head(url, timeout=timeout, allow_redirects=True)
+            r = PROBE_CLIENT.head(url, timeout=timeout, allow_redirects=True)
         else:
-            r = requests.get(url, timeout=timeout, allow_redirects=True, stream=True)
+            r = PROBE_CLIENT.get(url, timeout=timeout, allow_redirects=True, stream=True)
             r.close()
         latency = r.elapsed.total_seconds() * 1000
         if r.status_code < 300:
@@ -190,7 +190,8 @@ def main():
     parser.add_argument("--force", action="store_true", help="Ignore backoff, check everything")
     args = parser.parse_args()
 
-    reg = load_registry()
+    store = RegistryStore()
+    reg = store.load()
     counts = {"live": 0, "degraded": 0, "dead": 0, "gated": 0, "skipped": 0}
 
     # ── Federal / state / NOAA sources ──
@@ -214,6 +215,7 @@ def main():
                 continue
 
             status, latency, error = check_source(src, fast=args.fast)
+            store.save(reg)
             counts[status] = counts.get(status, 0) + 1
             print_result(src["id"], status, latency, error, old)
             time.sleep(0.3)
@@ -231,22 +233,28 @@ def main():
                     print_skip(f"wqp-{abbr} ({st['name']})", reason)
                     continue
 
-                url = f"https://www.waterqualitydata.us/data/Result/search?statecode=US:{st['fips']}&characteristicName=pH&startDateLo=01-01-2025&mimeType=csv&sorted=no&zip=no"
+                url = f"https://www.waterqualitydata.us/data/Result/search?statecode=US:{st['fips']}&characteristicName=pH&startDateLo=01-01-2025&mimeType=csv&sorted=no&zip=yes"
                 old = st.get("status")
                 status, latency, error = probe(url, fast=args.fast)
                 update_backoff_fields(st, status)
                 st["status"] = status
+                store.save(reg)
                 counts[status] = counts.get(status, 0) + 1
                 print_result(f"wqp-{abbr} ({st['name']})", status, latency, error, old)
                 time.sleep(0.5)
 
-    save_registry(reg)
+    save_registry(store, reg)
 
     total = sum(counts.values())
     skipped = counts["skipped"]
     checked = total - skipped
     print(f"\n  {'='*55}")
-    print(f"  ✅ {counts['live']} live  ⚠️ {counts['degraded']} degraded  ❌ {counts['dead']} dead  ⏭ {counts['gated']} gated  ⏩ {skipped} skipped  ({checked} checked / {total} total)\n")
+    print(f"  ✅ {counts['live']} live  ⚠️ {counts['degraded']} degraded  ❌ {counts['dead']} dead  ⏭ {counts['gated']} gated  ⏩ {skipped} skipped  ({checked} checked / {total} total)")
+    due = sorted(store.next_due("sources") + [(f"wqp-{k}", t) for k, t in store.next_due("wqp_states")],
+                 key=lambda d: d[1])
+    if skipped and due:
+        print(f"  Next backoff ends: {due[0][0]} at {due[0][1]}")
+    print()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+PIN HTTP Cache — on-disk response cache with conditional-GET revalidation.
+
+Slow-changing endpoints (WQP station inventories, site summaries) are
+re-downloaded in full on every run. This keeps the decoded body of each
+response on disk, keyed by normalized URL, and on the next request:
+
+  within TTL        served from disk, no request at all
+  past TTL          sent with If-None-Match / If-Modified-Since;
+                    304 → served from disk and marked fresh again
+                    200 → streamed to the caller and re-cached as it goes
+  over size budget  least-recently-used entries are evicted
+
+Only URLs matching a TTL policy are cached. Bodies are stored gzip-
+compressed with a small JSON sidecar holding validators and LRU stamps.
+
+Usage:
+  cache = ResponseCache(Path("lib/wqp/http_cache"), ttls={"data/Station/search": 3 * 86400})
+  entry = cache.lookup(url)
+  if entry and cache.is_fresh(entry): stream = cache.open(entry)
+  else: resp = session.get(url, headers=cache.conditional_headers(entry), stream=True)
+        ... stream = cache.tee(url, resp.headers, body_stream)
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class CacheEntry(NamedTuple):
+    key: str
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float      # epoch seconds of the last 200 or 304
+    size: int             # on-disk body bytes
+    encoding: str         # text encoding of the body
+
+
+def normalize_url(url: str) -> str:
+    """Lower-case scheme/host, drop the fragment, sort query parameters."""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ""))
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of response bodies. Safe to share across threads."""
+
+    def __init__(self, root: Path, ttls: dict[str, float],
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.ttls = ttls          # URL path substring → seconds a stored response stays fresh
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = self.revalidations = self.stores = 0
+
+    # ── Lookup ──
+
+    def ttl_for(self, url: str) -> Optional[float]:
+        """TTL policy for `url`, or None if it shouldn't be cached."""
+        path = urlsplit(url).path
+        for pattern, ttl in self.ttls.items():
+            if pattern in path:
+                return ttl
+        return None
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(normalize_url(url).encode()).hexdigest()[:32]
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        return self.root / f"{key}.json", self.root / f"{key}.body.gz"
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        key = self._key(url)
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not body_path.exists():
+            return None
+        return CacheEntry(key, meta["url"], meta.get("etag"), meta.get("lastModified"),
+                          meta["storedAt"], meta["size"], meta.get("encoding", "utf-8"))
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        ttl = self.ttl_for(entry.url) or 0
+        return time.time() - entry.stored_at < ttl
+
+    @staticmethod
+    def conditional_headers(entry: Optional[CacheEntry]) -> dict:
+        headers = {}
+        if entry and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    # ── Reading ──
+
+    def open(self, entry: CacheEntry) -> io.BufferedReader:
+        """Cached body as a binary stream; counts as a use for LRU."""
+        self._write_meta(entry, last_used=time.time())
+        with self._lock:
+            self.hits += 1
+        return gzip.open(self._paths(entry.key)[1], "rb")
+
+    def open_text(self, entry: CacheEntry) -> io.TextIOWrapper:
+        return io.TextIOWrapper(self.open(entry), encoding=entry.encoding, newline="")
+
+    def revalidated(self, entry: CacheEntry, headers) -> CacheEntry:
+        """Record a 304: the stored body is current again."""
+        entry = entry._replace(
+            stored_at=time.time(),
+            etag=headers.get("ETag") or entry.etag,
+            last_modified=headers.get("Last-Modified") or entry.last_modified,
+        )
+        self._write_meta(entry)
+        with self._lock:
+            self.revalidations += 1
+        return entry
+
+    # ── Storing ──
+
+    def tee(self, url: str, headers, stream, encoding: str = "utf-8"):
+        """
+        Wrap a decoded body stream so everything read from it is also cached.
+        The entry is committed only once the stream is read to EOF; a partial
+        read leaves any previous entry in place.
+        """
+        if "no-store" in headers.get("Cache-Control", ""):
+            return stream
+        return io.BufferedReader(_TeeReader(self, url, headers, stream, encoding))
+
+    def _commit(self, url: str, headers, tmp_path: Path, encoding: str):
+        key = self._key(url)
+        meta_path, body_path = self._paths(key)
+        os.replace(tmp_path, body_path)
+        now = time.time()
+        entry = CacheEntry(key, normalize_url(url), headers.get("ETag"),
+                           headers.get("Last-Modified"), now, body_path.stat().st_size, encoding)
+        self._write_meta(entry, last_used=now)
+        with self._lock:
+            self.stores += 1
+        self.evict()
+
+    def _write_meta(self, entry: CacheEntry, last_used: Optional[float] = None):
+        meta_path, _ = self._paths(entry.key)
+        meta = {
+            "url": entry.url,
+            "etag": entry.etag,
+            "lastModified": entry.last_modified,
+            "storedAt": entry.stored_at,
+            "lastUsed": last_used if last_used is not None else entry.stored_at,
+            "size": entry.size,
+            "encoding": entry.encoding,
+        }
+        tmp = meta_path.with_suffix(f".{threading.get_ident()}.tmp")
+        with self._lock:
+            with open(tmp, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp, meta_path)
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            for meta_path in self.root.glob("*.json"):
+                try:
+                    with open(meta_path) as f:
+                        meta = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    continue
+                entries.append((meta.get("lastUsed", 0), meta.get("size", 0), meta_path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, meta_path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                key = meta_path.name[:-len(".json")]
+                for path in self._paths(key):
+                    path.unlink(missing_ok=True)
+                total -= size
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "revalidations": self.revalidations, "stores": self.stores}
+
+
+class _TeeReader(io.RawIOBase):
+    """Copies a stream into a gzip temp file, committing it at EOF."""
+
+    def __init__(self, cache: ResponseCache, url: str, headers, stream, encoding: str):
+        self._cache = cache
+        self._url = url
+        self._headers = headers
+        self._stream = stream
+        self._encoding = encoding
+        cache.root.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = cache.root / f"{cache._key(url)}.{threading.get_ident()}.tmp"
+        self._out = gzip.open(self._tmp_path, "wb", compresslevel=5)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b) -> int:
+        n = self._stream.readinto(b)
+        if n:
+            self._out.write(b[:n])
+        elif self._out is not None:
+            self._out.close()
+            self._out = None
+            self._cache._commit(self._url, self._headers, self._tmp_path, self._encoding)
+        return n
+
+    def close(self):
+        if self._out is not None:   # closed before EOF — discard the partial copy
+            self._out.close()
+            self._out = None
+            self._tmp_path.unlink(missing_ok=True)
+        super().close()
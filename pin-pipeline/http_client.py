@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+PIN HTTP Client — pooled keep-alive sessions with retries for every fetcher.
+
+Module-level `requests.get` opens a new TCP+TLS connection per call, and each
+fetcher used to carry its own retry loop. Everything now goes through one
+client layer:
+
+  thread-local Session ──► shared HTTPAdapter ──► one urllib3 pool per host
+  (headers, cookies)       (Retry policy)          (POOL_SIZE keep-alive
+                                                     connections, reused
+                                                     across threads/calls)
+
+  retries     connect/read errors and 429/5xx, exponential backoff; a
+              Retry-After header is honoured (capped at MAX_RETRY_AFTER).
+              After the last retry the final response is returned, so
+              raise_for_status() behaves as before.
+  encoding    Accept-Encoding: gzip, deflate — what compressed_stream can undo
+  timing      every call reports a RequestTiming (host, status, seconds to
+              headers, retries) to the client's hooks; HostStats rolls them up
+
+Sessions are per thread (a Session isn't thread-safe); the adapters — and so
+the connection pools — are shared, so parallel handlers on one host reuse
+each other's connections.
+
+Usage:
+  import http_client
+  r = http_client.get(url, timeout=60)             # shared default client
+  stats = http_client.HostStats()
+  http_client.default_client().add_hook(stats.add)
+
+  probes = HTTPClient(retries=0)                   # own pool, no retries
+"""
+
+import os
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from compressed_stream import ACCEPT_COMPRESSED
+
+USER_AGENT = "PIN-Water-Intelligence/1.0 (pinwater.org; doug@pinwater.org)"
+
+# Pool sizing — PIN_HTTP_POOL_HOSTS / PIN_HTTP_POOL_SIZE override the defaults
+POOL_HOSTS = int(os.environ.get("PIN_HTTP_POOL_HOSTS", 32))   # host pools kept per client
+POOL_SIZE = int(os.environ.get("PIN_HTTP_POOL_SIZE", 8))      # keep-alive connections per host
+# host → connections, for hosts that see more parallel requests than POOL_SIZE
+HOST_POOL_SIZES: dict[str, int] = {}
+
+DEFAULT_TIMEOUT = 60
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 2.0          # sleeps 0, 4, 8 s between attempts
+MAX_RETRY_AFTER = 300         # seconds; longer Retry-After values are cut to this
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# ArcGIS queries are POSTed but read-only, so POST is retried too
+RETRY_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "POST"})
+
+
+class RequestTiming(NamedTuple):
+    method: str
+    url: str
+    host: str
+    status: Optional[int]     # None if no response came back
+    seconds: float            # call → response headers (all attempts and backoff)
+    retries: int
+    error: Optional[str]      # exception type when the call raised
+
+
+class _Retry(Retry):
+    """urllib3 Retry with Retry-After capped so one server can't stall a run."""
+
+    def get_retry_after(self, response):
+        seconds = super().get_retry_after(response)
+        return None if seconds is None else min(seconds, MAX_RETRY_AFTER)
+
+
+def _retries(resp) -> int:
+    history = getattr(getattr(resp.raw, "retries", None), "history", None)
+    return len(history) if history else 0
+
+
+class HTTPClient:
+    """Pooled, retrying HTTP client. Safe to share across threads."""
+
+    def __init__(self, retries: int = MAX_RETRIES, backoff: float = BACKOFF_FACTOR,
+                 pool_hosts: int = POOL_HOSTS, pool_size: int = POOL_SIZE,
+                 host_pool_sizes: Optional[dict[str, int]] = None,
+                 headers: Optional[dict] = None, timeout: float = DEFAULT_TIMEOUT):
+        retry = _Retry(total=retries, connect=retries, read=retries, status=retries,
+                       backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+                       allowed_methods=RETRY_METHODS, respect_retry_after_header=True,
+                       raise_on_status=False) if retries else 0
+
+        def adapter(size):
+            return HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=size, max_retries=retry)
+
+        # Longest prefix wins in Session.get_adapter, so host adapters override the default
+        self._adapters = {"https://": adapter(pool_size), "http://": adapter(pool_size)}
+        for host, size in {**HOST_POOL_SIZES, **(host_pool_sizes or {})}.items():
+            a = adapter(size)
+            self._adapters[f"https://{host}/"] = a
+            self._adapters[f"http://{host}/"] = a
+        self.headers = {"User-Agent": USER_AGENT, **ACCEPT_COMPRESSED, **(headers or {})}
+        self.timeout = timeout
+        self._hooks: list[Callable[[RequestTiming], None]] = []
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        """This thread's Session, mounted on the shared connection pools."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            for prefix, adapter in self._adapters.items():
+                session.mount(prefix, adapter)
+            self._local.session = session
+        return session
+
+    def add_hook(self, fn: Callable[[RequestTiming], None]):
+        """Call `fn(RequestTiming)` after every request (on the requesting thread)."""
+        self._hooks.append(fn)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        resp = error = None
+        try:
+            resp = self.session.request(method, url, **kwargs)
+            return resp
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            if self._hooks:
+                timing = RequestTiming(method, url, urlsplit(url).netloc,
+                                       resp.status_code if resp is not None else None,
+                                       time.perf_counter() - started,
+                                       _retries(resp) if resp is not None else 0, error)
+                for hook in self._hooks:
+                    hook(timing)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request("HEAD", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        for adapter in set(self._adapters.values()):
+            adapter.close()
+
+
+class HostStats:
+    """Thread-safe per-host roll-up of RequestTimings (a timing hook)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hosts: dict[str, dict] = {}
+
+    def add(self, t: RequestTiming):
+        with self._lock:
+            h = self.hosts.setdefault(t.host, {"requests": 0, "retries": 0, "errors": 0, "seconds": 0.0})
+            h["requests"] += 1
+            h["retries"] += t.retries
+            h["errors"] += 1 if t.error or (t.status or 0) >= 400 else 0
+            h["seconds"] += t.seconds
+
+    def summary(self) -> dict[str, dict]:
+        with self._lock:
+            return {host: {**h, "seconds": round(h["seconds"], 1)} for host, h in sorted(self.hosts.items())}
+
+
+# =============================================================================
+# Shared default client
+# =============================================================================
+
+_default: Optional[HTTPClient] = None
+_default_lock = threading.Lock()
+
+
+def default_client() -> HTTPClient:
+    """The process-wide client every fetcher shares."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HTTPClient()
+        return _default
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return default_client().get(url, **kwargs)
+
+
+def head(url: str, **kwargs) -> requests.Response:
+    return default_client().head(url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return default_client().post(url, **kwargs)
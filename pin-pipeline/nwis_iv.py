@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+PIN NWIS IV Parser — columnar parsing of USGS instantaneous-value WaterML-JSON.
+
+A statewide IV pull over a few months is millions of readings. Building a
+10-key dict per reading repeats the site name, coordinates and unit on every
+row. Here each time series contributes one metadata row, and readings are
+three typed columns:
+
+  series     int32 index into the metadata table
+  value      float64 (NaN where NWIS sends a non-numeric value)
+  time       int32 code into a pool of dateTime strings (the 15-minute grid
+             repeats across every series, so the pool stays small)
+  qualifier  int32 code into a pool of qualifier strings
+
+The metadata is joined onto the readings only in to_frame(), as
+categoricals, so even the output DataFrame stores the repeated strings once.
+
+The response is never parsed as a whole document: the reader finds the
+timeSeries array and decodes one series object at a time from a sliding
+text buffer (json.JSONDecoder.raw_decode), so only one series is ever held
+as Python objects.
+
+Usage:
+  table = parse_iv(open_stream(resp), USGS_CODES)
+  df = table.to_frame()
+"""
+
+import io
+import json
+from array import array
+from typing import IO, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from observation_store import NO_CODE, StringPool
+
+# Output column order (matches the CSVs written before this parser existed)
+IV_COLUMNS = ("source", "site_id", "site_name", "lat", "lon", "param",
+              "value", "unit", "datetime", "qualifier")
+SERIES_COLUMNS = ("site_id", "site_name", "lat", "lon", "param", "unit")
+READ_CHARS = 1024 * 1024   # text read per buffer refill
+
+
+class IVTable:
+    """Per-series metadata plus typed per-reading columns."""
+
+    def __init__(self):
+        self.series: list[tuple] = []   # SERIES_COLUMNS per time series
+        self.series_idx = array("i")
+        self.values = array("d")
+        self.times = StringPool()
+        self.time_codes = array("i")
+        self.qualifiers = StringPool()
+        self.qualifier_codes = array("i")
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def series_count(self) -> int:
+        return len(self.series)
+
+    def add_series(self, ts: dict, param_keys: dict):
+        """Append one WaterML timeSeries object (only its first values block, as before)."""
+        site = ts.get("sourceInfo", {})
+        variable = ts.get("variable", {})
+        param_cd = variable.get("variableCode", [{}])[0].get("value", "")
+        geo = site.get("geoLocation", {}).get("geogLocation", {})
+        entries = ts.get("values", [{}])[0].get("value", [])
+        if not entries:
+            return
+        idx = len(self.series)
+        self.series.append((
+            site.get("siteCode", [{}])[0].get("value", ""),
+            site.get("siteName", ""),
+            _float_or_nan(geo.get("latitude")),
+            _float_or_nan(geo.get("longitude")),
+            param_keys.get(param_cd, param_cd),
+            variable.get("unit", {}).get("unitCode", ""),
+        ))
+
+        times = [e.get("dateTime") for e in entries]
+        self.time_codes.frombytes(_encode(self.times, times).tobytes())
+        quals = [(e.get("qualifiers") or [None])[0] for e in entries]
+        self.qualifier_codes.frombytes(_encode(self.qualifiers, quals).tobytes())
+        raw_values = [e.get("value") for e in entries]
+        try:
+            values = np.array(raw_values, dtype=np.float64)
+        except (TypeError, ValueError):
+            values = pd.to_numeric(pd.Series(raw_values, dtype=object), errors="coerce").to_numpy(np.float64)
+        self.values.frombytes(values.tobytes())
+        self.series_idx.frombytes(np.full(len(entries), idx, dtype=np.int32).tobytes())
+
+    # ── Output ──
+
+    @staticmethod
+    def _category(codes: array, pool: StringPool) -> pd.Categorical:
+        """Pool codes as a categorical; NO_CODE (-1) becomes NaN."""
+        return pd.Categorical.from_codes(np.frombuffer(codes, dtype=np.int32),
+                                         categories=pd.Index(pool.values, dtype=object))
+
+    def to_frame(self) -> pd.DataFrame:
+        """Readings joined with their series metadata (strings as categoricals)."""
+        idx = np.frombuffer(self.series_idx, dtype=np.int32)
+        meta = pd.DataFrame(self.series, columns=list(SERIES_COLUMNS))
+        cols = {"source": pd.Categorical.from_codes(np.zeros(len(idx), dtype=np.int8),
+                                                     categories=["USGS"])}
+        for col in SERIES_COLUMNS:
+            if col in ("lat", "lon"):
+                cols[col] = meta[col].to_numpy(dtype=np.float64)[idx]
+            else:
+                per_series = pd.Categorical(meta[col])
+                cols[col] = pd.Categorical.from_codes(per_series.codes[idx], per_series.categories)
+        cols["value"] = np.frombuffer(self.values, dtype=np.float64)
+        cols["datetime"] = self._category(self.time_codes, self.times)
+        cols["qualifier"] = self._category(self.qualifier_codes, self.qualifiers)
+        return pd.DataFrame({c: cols[c] for c in IV_COLUMNS})
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.series_idx, self.values, self.time_codes, self.qualifier_codes)
+        return sum(a.itemsize * len(a) for a in arrays)
+
+
+def _encode(pool: StringPool, values: list) -> np.ndarray:
+    """Pool codes for a list of strings, interning each distinct value once."""
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    lookup = np.array([pool.code(u) for u in uniques] + [NO_CODE], dtype=np.int32)
+    return lookup[codes]   # factorize marks None as -1 → the trailing NO_CODE
+
+
+def _float_or_nan(v) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _iter_series(stream: IO[bytes], read_chars: int = READ_CHARS) -> Iterator[dict]:
+    """timeSeries objects one at a time, without parsing the rest of the document."""
+    text = io.TextIOWrapper(stream, encoding="utf-8")
+    decoder = json.JSONDecoder()
+    buf = ""
+
+    # Skip ahead to the opening bracket of "timeSeries"
+    while True:
+        key = buf.find('"timeSeries"')
+        start = buf.find("[", key) if key >= 0 else -1
+        if start >= 0:
+            buf, pos = buf[start + 1:], 0
+            break
+        more = text.read(read_chars)
+        if not more:
+            return
+        buf += more
+
+    eof = False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        if pos < len(buf):
+            try:
+                ts, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield ts
+                continue
+        elif eof:
+            raise ValueError("WaterML response ended inside timeSeries")
+        # Series incomplete: drop what's consumed and read at least as much again
+        buf, pos = buf[pos:], 0
+        more = text.read(max(read_chars, len(buf)))
+        eof = not more
+        buf += more
+
+
+def parse_iv(stream: IO[bytes], param_keys: Optional[dict] = None) -> IVTable:
+    """Parse a WaterML-JSON IV response (binary stream) into an IVTable."""
+    table = IVTable()
+    for ts in _iter_series(stream):
+        table.add_series(ts, param_keys or {})
+    return table
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+PIN Observation Store — compact columnar container for normalized WQP
+observations.
+
+A list of 8-key dicts costs several hundred bytes per observation. Here each
+observation is ~40 bytes:
+
+  stationId / parameter / unit /   int32 codes into per-column string pools
+  status / detection               (dictionary encoding — Region 3 has a few
+                                    thousand stations and ~20 parameters)
+  date                             int32 days since 1970-01-01
+  value / detectionLimit           float64 (NaN = missing)
+
+Columns are stdlib `array`s so appends are cheap; `columns()` exposes them as
+zero-copy numpy views for the exceedance engine and summary builder.
+Iterating a store yields the same dicts process_observations() used to
+build, so the JSON/Parquet writers don't care which they get.
+
+Usage:
+  store = ObservationStore()
+  store.append(obs)                  # obs = normalized observation dict
+  cols = store.columns()             # numpy views, valid until next append
+  for obs in store: ...
+"""
+
+from array import array
+from datetime import date
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+NO_DATE = -(2 ** 31)   # sentinel for missing / unparseable dates
+NO_CODE = -1           # sentinel for None strings
+
+# Column order of a normalized observation (matches process_observations())
+OBSERVATION_COLUMNS = ("stationId", "date", "parameter", "value", "unit",
+                       "status", "detection", "detectionLimit")
+
+
+class StringPool:
+    """Interns strings to dense int codes. None maps to NO_CODE."""
+
+    __slots__ = ("values", "_index")
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: list[str] = []
+        self._index: dict[str, int] = {}
+        for v in values:
+            self.code(v)
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return NO_CODE
+        c = self._index.get(value)
+        if c is None:
+            c = self._index[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+    def lookup(self, code: int) -> Optional[str]:
+        return None if code == NO_CODE else self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class ObservationStore:
+    """Dictionary-encoded, typed-array storage for normalized observations."""
+
+    STRING_COLUMNS = ("stationId", "parameter", "unit", "status", "detection")
+
+    def __init__(self):
+        self.pools = {col: StringPool() for col in self.STRING_COLUMNS}
+        self.codes = {col: array("i") for col in self.STRING_COLUMNS}
+        self.dates = array("i")
+        self.values = array("d")
+        self.detection_limits = array("d")
+        self._date_cache: dict[str, int] = {}
+
+    # ── Building ──
+
+    def _date_code(self, s: Optional[str]) -> int:
+        if not s:
+            return NO_DATE
+        d = self._date_cache.get(s)
+        if d is None:
+            try:
+                d = date.fromisoformat(s[:10]).toordinal() - EPOCH_ORDINAL
+            except ValueError:
+                d = NO_DATE
+            self._date_cache[s] = d
+        return d
+
+    def append(self, obs: dict):
+        """Append one normalized observation dict."""
+        for col in self.STRING_COLUMNS:
+            self.codes[col].append(self.pools[col].code(obs.get(col)))
+        self.dates.append(self._date_code(obs.get("date")))
+        value = obs.get("value")
+        limit = obs.get("detectionLimit")
+        self.values.append(np.nan if value is None else value)
+        self.detection_limits.append(np.nan if limit is None else limit)
+
+    @classmethod
+    def from_observations(cls, observations: Iterable[dict]) -> "ObservationStore":
+        store = cls()
+        for obs in observations:
+            store.append(obs)
+        return store
+
+    def extend(self, other: "ObservationStore"):
+        """Append all rows of `other`, re-coding its string pools into ours."""
+        if not len(other):
+            return
+        for col in self.STRING_COLUMNS:
+            remap = np.array([self.pools[col].code(v) for v in other.pools[col].values] + [NO_CODE],
+                             dtype=np.int32)
+            src = np.frombuffer(other.codes[col], dtype=np.int32)
+            # NO_CODE (-1) indexes the trailing NO_CODE slot
+            self.codes[col].frombytes(remap[src].tobytes())
+        self.dates.extend(other.dates)
+        self.values.extend(other.values)
+        self.detection_limits.extend(other.detection_limits)
+
+    def select(self, mask) -> "ObservationStore":
+        """New store holding the rows where `mask` is True."""
+        out = ObservationStore()
+        idx = np.flatnonzero(mask)
+        cols = self.columns()
+        for col in self.STRING_COLUMNS:
+            out.pools[col] = StringPool(self.pools[col].values)
+            out.codes[col].frombytes(cols[col][idx].tobytes())
+        out.dates.frombytes(cols["date"][idx].tobytes())
+        out.values.frombytes(cols["value"][idx].tobytes())
+        out.detection_limits.frombytes(cols["detectionLimit"][idx].tobytes())
+        return out
+
+    @classmethod
+    def from_arrow(cls, table) -> "ObservationStore":
+        """Build a store from a pyarrow Table with the observation columns."""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        store = cls()
+        for col in cls.STRING_COLUMNS:
+            arr = table.column(col).combine_chunks()
+            if not pa.types.is_dictionary(arr.type):
+                arr = pc.dictionary_encode(arr)
+            store.pools[col] = StringPool(arr.dictionary.to_pylist())
+            codes = pc.fill_null(arr.indices.cast(pa.int32()), NO_CODE)
+            store.codes[col].frombytes(codes.to_numpy(zero_copy_only=False).tobytes())
+        dates = pc.fill_null(table.column("date").combine_chunks().cast(pa.int32()), NO_DATE)
+        store.dates.frombytes(dates.to_numpy(zero_copy_only=False).astype(np.int32).tobytes())
+        for col, target in (("value", store.values), ("detectionLimit", store.detection_limits)):
+            vals = table.column(col).combine_chunks().cast(pa.float64())
+            target.frombytes(vals.to_numpy(zero_copy_only=False).astype(np.float64).tobytes())
+        return store
+
+    # ── Reading ──
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate column memory (excludes the small string pools)."""
+        arrays = [*self.codes.values(), self.dates, self.values, self.detection_limits]
+        return sum(a.itemsize * len(a) for a in arrays)
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """
+        Zero-copy numpy views of every column (string columns as codes).
+        Views are only valid until the next append/extend.
+        """
+        cols = {col: np.frombuffer(self.codes[col], dtype=np.int32)
+                for col in self.STRING_COLUMNS}
+        cols["date"] = np.frombuffer(self.dates, dtype=np.int32)
+        cols["value"] = np.frombuffer(self.values, dtype=np.float64)
+        cols["detectionLimit"] = np.frombuffer(self.detection_limits, dtype=np.float64)
+        return cols
+
+    def to_arrow(self, order=None):
+        """
+        pyarrow Table with dictionary-encoded string columns, date32 dates and
+        nulls for missing values. `order` optionally permutes the rows.
+        """
+        import pyarrow as pa
+
+        cols = self.columns()
+        idx = np.arange(len(self)) if order is None else np.asarray(order)
+        arrays = {}
+        for col in self.STRING_COLUMNS:
+            codes = cols[col][idx]
+            arrays[col] = pa.DictionaryArray.from_arrays(
+                pa.array(codes, mask=codes == NO_CODE, type=pa.int32()),
+                pa.array(self.pools[col].values, type=pa.string()),
+            )
+        dates = cols["date"][idx]
+        arrays["date"] = pa.array(dates, mask=dates == NO_DATE, type=pa.int32()).cast(pa.date32())
+        for col in ("value", "detectionLimit"):
+            vals = cols[col][idx]
+            arrays[col] = pa.array(vals, mask=np.isnan(vals), type=pa.float64())
+        return pa.table({c: arrays[c] for c in OBSERVATION_COLUMNS})
+
+    def sort_order(self, *cols: str) -> np.ndarray:
+        """Row order sorting by the given columns (string columns sort by value, not code)."""
+        columns = self.columns()
+        keys = []
+        for col in cols:
+            key = columns[col]
+            if col in self.STRING_COLUMNS:
+                # Rank codes by their string value; missing sorts first
+                values = self.pools[col].values
+                rank = np.empty(len(values) + 1, dtype=np.int64)
+                rank[np.argsort(np.array(values, dtype=object), kind="stable")] = np.arange(1, len(values) + 1)
+                rank[-1] = 0
+                key = rank[key]   # NO_CODE (-1) hits the trailing slot
+            keys.append(key)
+        return np.lexsort(tuple(reversed(keys))) if keys else np.arange(len(self))
+
+    def value_counts(self, col: str) -> dict[str, int]:
+        """Rows per distinct value of a string column, in first-seen order."""
+        codes = np.frombuffer(self.codes[col], dtype=np.int32)
+        counts = np.bincount(codes[codes != NO_CODE], minlength=len(self.pools[col]))
+        return {v: int(n) for v, n in zip(self.pools[col].values, counts) if n}
+
+    def latest_dates(self, col: str) -> dict[str, str]:
+        """Latest date per distinct value of a string column (skips missing dates)."""
+        codes = np.frombuffer(self.codes[col], dtype=np.int32)
+        dates = np.frombuffer(self.dates, dtype=np.int32)
+        latest = np.full(len(self.pools[col]), NO_DATE, dtype=np.int32)
+        ok = codes != NO_CODE
+        np.maximum.at(latest, codes[ok], dates[ok])
+        return {v: self.format_date(d) for v, d in zip(self.pools[col].values, latest)
+                if d != NO_DATE}
+
+    def date_range(self) -> tuple[Optional[str], Optional[str]]:
+        """(earliest, latest) date over all rows, ignoring missing dates."""
+        dates = np.frombuffer(self.dates, dtype=np.int32)
+        dates = dates[dates != NO_DATE]
+        if not dates.size:
+            return None, None
+        return self.format_date(dates.min()), self.format_date(dates.max())
+
+    def date_code(self, s: str) -> int:
+        """Encode a YYYY-MM-DD string the same way the date column is."""
+        return self._date_code(s)
+
+    @staticmethod
+    def format_date(code: int) -> Optional[str]:
+        if code == NO_DATE:
+            return None
+        return date.fromordinal(int(code) + EPOCH_ORDINAL).isoformat()
+
+    def row(self, i: int) -> dict:
+        """Materialize row `i` as a normalized observation dict."""
+        value = self.values[i]
+        limit = self.detection_limits[i]
+        lookup = {col: self.pools[col].lookup(self.codes[col][i]) for col in self.STRING_COLUMNS}
+        return {
+            "stationId": lookup["stationId"] or "",
+            "date": self.format_date(self.dates[i]) or "",
+            "parameter": lookup["parameter"] or "",
+            "value": None if value != value else value,
+            "unit": lookup["unit"] or "",
+            "status": lookup["status"] or "",
+            "detection": lookup["detection"],
+            "detectionLimit": None if limit != limit else limit,
+        }
+
+    def __iter__(self) -> Iterator[dict]:
+        for i in range(len(self)):
+            yield self.row(i)
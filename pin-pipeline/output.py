@@ -1,12 +1,19 @@
 #!/usr/bin/env python3
 """
-PIN Output Generator — converts fetched CSV data into typed .ts files
-for the Next.js app. Drops them into the target lib/ directory.
+PIN Output Generator — converts fetched output files (CSV, Parquet or
+Feather) into typed .ts files for the Next.js app. Drops them into the
+target lib/ directory. Only the columns and rows an aggregate needs are
+read from columnar outputs.
 
 Usage:
   python output.py --target ../lib
   python output.py --target ../lib --source wqp-MD
-  python output.py --list                    # Show available CSV files
+  python output.py --list                    # Show available output files
+  python output.py --target ../lib --force    # Rebuild .ts files whose source is unchanged
+
+A .ts file is only rebuilt when its output's fingerprint (output/manifest.json,
+written by fetch.py) differs from the one it was built from
+(<target>/.fingerprints.json), so unchanged data leaves lib/ untouched.
 """
 
 import argparse
@@ -17,6 +24,10 @@ import pandas as pd
 from datetime import datetime
 from pathlib import Path
 
+from exceedance import screen_frame
+from fingerprint import MANIFEST_FILE, TS_MANIFEST_FILE, Fingerprint, Manifest
+from output_files import output_columns, output_paths, output_rows, read_output
+
 DIR = Path(__file__).parent
 OUTPUT = DIR / "output"
 REGISTRY = DIR / "registry.json"
@@ -47,23 +58,40 @@ def load_registry():
         return json.load(f)
 
 
+def parse_dates(col):
+    """pd.to_datetime(errors="coerce"); categoricals parse each distinct value once."""
+    if col is not None and isinstance(col.dtype, pd.CategoricalDtype):
+        parsed = pd.to_datetime(col.cat.categories, errors="coerce")
+        return pd.Series(parsed.take(col.cat.codes, allow_fill=True), index=col.index)
+    return pd.to_datetime(col, errors="coerce")
+
+
 def list_csvs():
-    """List available CSV files in output/."""
-    csvs = sorted(OUTPUT.glob("*.csv"))
-    if not csvs:
-        print("  No CSV files in output/. Run fetch.py first.")
+    """List available output files (CSV / Parquet / Feather) in output/."""
+    paths = output_paths(OUTPUT)
+    if not paths:
+        print("  No output files in output/. Run fetch.py first.")
         return
-    print(f"\n  ── Available CSV Files ({len(csvs)}) ──\n")
-    for f in csvs:
+    print(f"\n  ── Available Output Files ({len(paths)}) ──\n")
+    for f in paths:
         size_mb = f.stat().st_size / (1024 * 1024)
-        rows = sum(1 for _ in open(f)) - 1  # subtract header
+        rows = output_rows(f)  # Parquet/Feather: from metadata, no data read
         print(f"  {f.name:40s}  {size_mb:>6.1f} MB  {rows:>10,} rows")
     print()
 
 
+# Columns the aggregates read (absent ones are skipped); coordinates are matched by name
+WQP_COLUMNS = ["CharacteristicName", "ResultMeasureValue", "value", "param",
+               "MonitoringLocationIdentifier", "site_id", "MonitoringLocationName", "site_name",
+               "ActivityStartDate", "datetime"]
+USGS_COLUMNS = ["site_id", "site_name", "lat", "lon", "param", "value", "datetime"]
+
+
 def aggregate_wqp(csv_path, state_abbr):
-    """Aggregate a WQP CSV into a state summary dict for .ts output."""
-    df = pd.read_csv(csv_path, low_memory=False)
+    """Aggregate a WQP output file into a state summary dict for .ts output."""
+    coords = [c for c in output_columns(csv_path) if "Latitude" in c or "Longitude" in c or c in ("lat", "lon")]
+    df = read_output(csv_path, columns=WQP_COLUMNS + coords,
+                     filters=[("CharacteristicName", "in", list(WQP_CHAR_MAP))])
 
     # Map characteristic names to our param keys
     if "CharacteristicName" in df.columns:
@@ -78,6 +106,7 @@ def aggregate_wqp(csv_path, state_abbr):
         return None
 
     df = df.dropna(subset=["value"])
+    df["param"] = df["param"].astype(object)  # per-station param lists can't live in a categorical
 
     # Site info
     site_col = "MonitoringLocationIdentifier" if "MonitoringLocationIdentifier" in df.columns else "site_id"
@@ -87,14 +116,19 @@ def aggregate_wqp(csv_path, state_abbr):
     lon_col = next((c for c in df.columns if "Longitude" in c or c == "lon"), None)
 
     # Parameter coverage: count of samples per param
-    param_coverage = df.groupby("param")["value"].count().to_dict()
+    param_coverage = df.groupby("param", observed=True)["value"].count().to_dict()
 
     # Parameter medians
-    param_medians = df.groupby("param")["value"].median().round(3).to_dict()
+    param_medians = df.groupby("param", observed=True)["value"].median().round(3).to_dict()
+
+    # Screening exceedances — same rules as fetch_wqp.py and the archive
+    exceedance_count = None
+    if "CharacteristicName" in df.columns:
+        exceedance_count = len(screen_frame(df, "CharacteristicName", "value"))
 
     # Date range
     if date_col in df.columns:
-        dates = pd.to_datetime(df[date_col], errors="coerce").dropna()
+        dates = parse_dates(df[date_col]).dropna()
         date_range = [str(dates.min().date()), str(dates.max().date())] if not dates.empty else [None, None]
     else:
         date_range = [None, None]
@@ -102,7 +136,7 @@ def aggregate_wqp(csv_path, state_abbr):
     # Top stations by sample count
     top_stations = []
     if site_col in df.columns:
-        station_counts = df.groupby(site_col).agg(
+        station_counts = df.groupby(site_col, observed=True).agg(
             sample_count=("value", "count"),
             params=(("param", lambda x: list(x.unique()))),
         ).nlargest(25, "sample_count")
@@ -127,7 +161,7 @@ def aggregate_wqp(csv_path, state_abbr):
 
             # Last sampled date for this station
             if date_col in site_rows.columns:
-                sdates = pd.to_datetime(site_rows[date_col], errors="coerce").dropna()
+                sdates = parse_dates(site_rows[date_col]).dropna()
                 if not sdates.empty:
                     station["lastSampled"] = str(sdates.max().date())
 
@@ -142,31 +176,33 @@ def aggregate_wqp(csv_path, state_abbr):
         "dateRange": date_range,
         "paramCoverage": param_coverage,
         "paramMedians": param_medians,
+        "exceedanceCount": exceedance_count,
         "topStations": top_stations,
         "generated": datetime.utcnow().isoformat() + "Z",
     }
 
 
 def aggregate_usgs(csv_path, state_abbr):
-    """Aggregate USGS NWIS CSV into a state summary dict."""
-    df = pd.read_csv(csv_path, low_memory=False)
+    """Aggregate a USGS NWIS output file into a state summary dict."""
+    df = read_output(csv_path, columns=USGS_COLUMNS)
     df["value"] = pd.to_numeric(df.get("value"), errors="coerce")
     df = df.dropna(subset=["value"])
 
     if df.empty:
         return None
+    df["param"] = df["param"].astype(object)  # per-station param lists can't live in a categorical
 
-    param_coverage = df.groupby("param")["value"].count().to_dict()
-    param_medians = df.groupby("param")["value"].median().round(3).to_dict()
+    param_coverage = df.groupby("param", observed=True)["value"].count().to_dict()
+    param_medians = df.groupby("param", observed=True)["value"].median().round(3).to_dict()
 
-    dates = pd.to_datetime(df.get("datetime"), errors="coerce").dropna()
+    dates = parse_dates(df.get("datetime")).dropna()
     date_range = [str(dates.min().date()), str(dates.max().date())] if not dates.empty else [None, None]
 
     unique_sites = df["site_id"].nunique() if "site_id" in df.columns else 0
 
     top_stations = []
     if "site_id" in df.columns:
-        station_counts = df.groupby("site_id").agg(
+        station_counts = df.groupby("site_id", observed=True).agg(
             sample_count=("value", "count"),
             params=(("param", lambda x: list(x.unique()))),
         ).nlargest(25, "sample_count")
@@ -243,6 +279,7 @@ def generate_ts(summary, source_type, target_dir):
         f"  dateRange: [string | null, string | null];",
         f"  paramCoverage: Record<string, number>;",
         f"  paramMedians: Record<string, number>;",
+        f"  exceedanceCount?: number | null;",
         f"  topStations: PINStationSummary[];",
         f"  generated: string;",
         f"}}",
@@ -255,11 +292,45 @@ def generate_ts(summary, source_type, target_dir):
     print(f"  ✅ {filename:40s}  ({summary['stationCount']} stations, {summary['sampleCount']:,} samples)")
 
 
+def ts_file_for(name):
+    """The .ts file an output name turns into, or None for unknown source types."""
+    parts = name.split("-")
+    if name.startswith("wqp-"):
+        return f"wqp-{parts[1]}.ts"
+    if name.startswith("usgs-nwis-"):
+        return f"nwis-{parts[2]}.ts"
+    if name.startswith("sdwis-"):
+        return f"sdwis-{parts[1]}.ts"
+    return None
+
+
+def write_index(target):
+    """Write index.ts re-exporting every module — only if the module list changed."""
+    ts_files = sorted(f for f in target.glob("*.ts") if f.name != "index.ts")
+    exports = [f"export * from './{f.stem}';" for f in ts_files]
+    index = target / "index.ts"
+    if index.exists():
+        current = [l for l in index.read_text(encoding="utf-8").splitlines() if l.startswith("export ")]
+        if current == exports:
+            return
+    index_lines = [
+        "// Auto-generated by PIN pipeline — do not edit manually",
+        f"// Generated: {datetime.utcnow().isoformat()}Z",
+        f"// {len(ts_files)} source files",
+        "",
+        *exports,
+        "",
+    ]
+    index.write_text("\n".join(index_lines), encoding="utf-8")
+    print(f"\n  📦 index.ts — re-exports {len(ts_files)} modules")
+
+
 def main():
     parser = argparse.ArgumentParser(description="PIN Output Generator")
     parser.add_argument("--target", default="../lib/pin", help="Target directory for .ts files (default: ../lib/pin)")
-    parser.add_argument("--source", help="Only process a specific CSV (e.g., wqp-MD)")
-    parser.add_argument("--list", action="store_true", help="List available CSV files")
+    parser.add_argument("--source", help="Only process one output (e.g., wqp-MD)")
+    parser.add_argument("--list", action="store_true", help="List available output files")
+    parser.add_argument("--force", action="store_true", help="Rebuild .ts files even if their source is unchanged")
     args = parser.parse_args()
 
     if args.list:
@@ -269,23 +340,33 @@ def main():
     target = Path(args.target)
     target.mkdir(parents=True, exist_ok=True)
 
-    csvs = sorted(OUTPUT.glob("*.csv"))
+    csvs = output_paths(OUTPUT)
     if not csvs:
-        print("  No CSV files in output/. Run fetch.py first.")
+        print("  No output files in output/. Run fetch.py first.")
         return
 
     if args.source:
         csvs = [c for c in csvs if c.stem == args.source]
         if not csvs:
-            print(f"  CSV not found: {args.source}.csv")
+            print(f"  Output not found: {args.source}")
             return
 
     print(f"\n  ── Generating .ts files → {target}/ ──\n")
     generated = 0
+    unchanged = 0
+    sources = Manifest(OUTPUT / MANIFEST_FILE)
+    built_from = Manifest(target / TS_MANIFEST_FILE)
 
     for csv_path in csvs:
         name = csv_path.stem  # e.g., "wqp-MD", "usgs-nwis-MD", "sdwis-MD"
         parts = name.split("-")
+        ts_file = ts_file_for(name)
+        digest = sources.digest(name)
+        if (not args.force and ts_file and digest and built_from.digest(ts_file) == digest
+                and (target / ts_file).exists()):
+            unchanged += 1
+            continue
+        before = generated
 
         try:
             if name.startswith("wqp-"):
@@ -303,11 +384,11 @@ def main():
             elif name.startswith("sdwis-"):
                 state = parts[1]
                 # SDWIS is structured differently, just copy as JSON export
-                df = pd.read_csv(csv_path, low_memory=False)
+                system_count = output_rows(csv_path)
                 summary = {
                     "state": state,
                     "source": "EPA_SDWIS",
-                    "systemCount": len(df),
+                    "systemCount": system_count,
                     "generated": datetime.utcnow().isoformat() + "Z",
                 }
                 filepath = target / f"sdwis-{state}.ts"
@@ -317,38 +398,28 @@ def main():
                     "",
                     f"export const PIN_SDWIS_{state} = {{",
                     f"  state: {json.dumps(state)},",
-                    f"  systemCount: {len(df)},",
+                    f"  systemCount: {system_count},",
                     f"  generated: {json.dumps(summary['generated'])},",
                     "};",
                     "",
                 ]
                 filepath.write_text("\n".join(lines), encoding="utf-8")
-                print(f"  ✅ sdwis-{state}.ts{' ':32s}  ({len(df)} water systems)")
+                print(f"  ✅ sdwis-{state}.ts{' ':32s}  ({system_count} water systems)")
                 generated += 1
             else:
-                print(f"  ⏭  {name}.csv — unknown source type, skipping")
+                print(f"  ⏭  {csv_path.name} — unknown source type, skipping")
         except Exception as e:
-            print(f"  ❌ {name}.csv — {str(e)[:100]}")
+            print(f"  ❌ {csv_path.name} — {str(e)[:100]}")
+        if generated > before and digest:
+            built_from.record(ts_file, Fingerprint(digest, sources.entries[name].get("rows", 0)))
 
     # Generate index file that re-exports everything
     if generated > 0:
-        ts_files = sorted(target.glob("*.ts"))
-        ts_files = [f for f in ts_files if f.name != "index.ts"]
-        index_lines = [
-            "// Auto-generated by PIN pipeline — do not edit manually",
-            f"// Generated: {datetime.utcnow().isoformat()}Z",
-            f"// {generated} source files",
-            "",
-        ]
-        for f in ts_files:
-            module = f.stem
-            index_lines.append(f"export * from './{module}';")
-        index_lines.append("")
-        (target / "index.ts").write_text("\n".join(index_lines), encoding="utf-8")
-        print(f"\n  📦 index.ts — re-exports {len(ts_files)} modules")
+        write_index(target)
 
     print(f"\n  {'='*50}")
-    print(f"  Generated {generated} .ts file{'s' if generated != 1 else ''} → {target}/\n")
+    print(f"  Generated {generated} .ts file{'s' if generated != 1 else ''} → {target}/"
+          f"{f'  ({unchanged} unchanged, skipped)' if unchanged else ''}\n")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+PIN Output Files — typed columnar output for fetched sources.
+
+fetch.py used to write every source to output/{name}.csv, and output.py
+re-parsed those with low_memory=False and guessed every type again. Sources
+can now be written as Parquet or Feather (zstd) instead, with a per-source
+schema applied on the way out:
+
+  category   repeated strings (site IDs and names, characteristic, unit, ...)
+             stored dictionary-encoded → categoricals in pandas
+  float64    columns that are numeric by construction (NWIS value, lat, lon)
+  (other)    strings; a string column not named in the schema is dictionary
+             encoded if its first batch is mostly repeats
+
+Writes stream batch by batch (a SpooledCSV never becomes one DataFrame).
+Dictionaries only ever grow across batches, so the Feather (Arrow IPC)
+writer can emit them as deltas.
+
+Readers go through read_output(), which takes a column list and row filters
+in pyarrow's (column, op, value) form and pushes both down into Parquet /
+Feather scans; CSV outputs are still readable the same way.
+
+Usage:
+  path, rows = write_output(df, OUTPUT, "usgs-nwis-MD", "parquet")
+  df = read_output(path, columns=["site_id", "value"], filters=[("param", "==", "DO")])
+  for path in output_paths(OUTPUT): print(path.name, output_rows(path))
+"""
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.dataset as pads
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pacsv = pads = pq = None  # CSV output only
+
+from spooled_csv import CHUNK_ROWS, SpooledCSV, spool_path
+
+FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+READ_PREFERENCE = ("parquet", "feather", "csv")   # when one name exists in several formats
+DEFAULT_FORMAT = os.environ.get("PIN_OUTPUT_FORMAT", "csv")
+COMPRESSION = "zstd"
+AUTO_CATEGORY_RATIO = 0.5   # distinct / rows at or below this → dictionary-encode
+
+# Output name prefix → column types. Columns not listed fall back to the auto rule.
+SOURCE_SCHEMAS = {
+    "wqp-": {
+        "category": ["OrganizationIdentifier", "OrganizationFormalName", "ActivityTypeCode",
+                     "ActivityMediaName", "ActivityMediaSubdivisionName", "ActivityStartDate",
+                     "ActivityStartTime/TimeZoneCode", "MonitoringLocationIdentifier",
+                     "CharacteristicName", "ResultSampleFractionText", "ResultMeasure/MeasureUnitCode",
+                     "ResultStatusIdentifier", "ResultValueTypeName", "ResultDetectionConditionText",
+                     "ProviderName"],
+    },
+    "usgs-nwis-": {
+        "category": ["source", "site_id", "site_name", "param", "unit", "datetime", "qualifier"],
+        "float64": ["value", "lat", "lon"],
+    },
+    "epa-sdwis-": {
+        "category": ["PWS_TYPE_CODE", "PRIMARY_SOURCE_CODE", "PWS_ACTIVITY_CODE", "OWNER_TYPE_CODE",
+                     "STATE_CODE", "EPA_REGION", "IS_SCHOOL_OR_DAYCARE_IND"],
+    },
+}
+
+
+class OutputFormatError(Exception):
+    """Unknown output format, or a columnar format without pyarrow installed."""
+
+
+def schema_for(name: str) -> dict:
+    """Column types for an output name (e.g. "usgs-nwis-MD")."""
+    for prefix, schema in SOURCE_SCHEMAS.items():
+        if name.startswith(prefix):
+            return schema
+    return {}
+
+
+def _check_format(fmt: str):
+    if fmt not in FORMATS:
+        raise OutputFormatError(f"unknown output format {fmt!r} (choose from {', '.join(FORMATS)})")
+    if fmt != "csv" and pa is None:
+        raise OutputFormatError(f"{fmt} output needs pyarrow (pip install pyarrow)")
+
+
+# =============================================================================
+# Writing
+# =============================================================================
+
+class _GrowingDictionary:
+    """Dictionary-encodes batches against one dictionary that only appends."""
+
+    def __init__(self):
+        self.values = pa.array([], pa.string())
+
+    def encode(self, col: "pa.Array") -> "pa.DictionaryArray":
+        idx = pc.index_in(col, value_set=self.values)
+        unseen = pc.and_(pc.is_null(idx), pc.is_valid(col))
+        if pc.any(unseen).as_py():
+            self.values = pa.concat_arrays([self.values, pc.unique(pc.filter(col, unseen))])
+            idx = pc.index_in(col, value_set=self.values)
+        return pa.DictionaryArray.from_arrays(idx.cast(pa.int32()), self.values)
+
+
+class _BatchTyper:
+    """Fixes the output schema from the first batch and casts every batch to it."""
+
+    def __init__(self, first: "pa.RecordBatch", schema: dict):
+        category = set(schema.get("category", ()))
+        numeric = set(schema.get("float64", ()))
+        self.dictionaries: dict[str, _GrowingDictionary] = {}
+        fields = []
+        for name, col in zip(first.schema.names, first.columns):
+            col = _plain(col)
+            if name in numeric:
+                fields.append(pa.field(name, pa.float64()))
+            elif pa.types.is_string(col.type) and (name in category or _repetitive(col)):
+                self.dictionaries[name] = _GrowingDictionary()
+                fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+            else:
+                fields.append(pa.field(name, col.type))
+        self.schema = pa.schema(fields)
+
+    def cast(self, batch: "pa.RecordBatch") -> "pa.RecordBatch":
+        columns = []
+        for field in self.schema:
+            col = _plain(batch.column(field.name))
+            if field.name in self.dictionaries:
+                col = self.dictionaries[field.name].encode(col)
+            elif pa.types.is_floating(field.type) and not pa.types.is_floating(col.type):
+                col = pa.array(pd.to_numeric(col.to_pandas(), errors="coerce"), pa.float64())
+            else:
+                col = col.cast(field.type)
+            columns.append(col)
+        return pa.RecordBatch.from_arrays(columns, schema=self.schema)
+
+
+def _plain(col: "pa.Array") -> "pa.Array":
+    """Dictionary → dense values, large_string → string (pandas categoricals and string dtype)."""
+    if pa.types.is_dictionary(col.type):
+        col = col.dictionary_decode()
+    if pa.types.is_large_string(col.type):
+        col = col.cast(pa.string())
+    return col
+
+
+def _repetitive(col: "pa.Array") -> bool:
+    return len(col) > 0 and pc.count_distinct(col).as_py() <= AUTO_CATEGORY_RATIO * len(col)
+
+
+def _frame_batches(df: pd.DataFrame) -> Iterator["pa.RecordBatch"]:
+    # Object columns from JSON handlers can mix str / int / None; make them strings like a CSV would
+    df = df.copy(deep=False)
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].astype("string")
+    yield from pa.Table.from_pandas(df, preserve_index=False).to_batches(max_chunksize=CHUNK_ROWS)
+
+
+def _open_writer(path: Path, fmt: str, schema: "pa.Schema"):
+    if fmt == "parquet":
+        return pq.ParquetWriter(path, schema, compression=COMPRESSION)
+    options = pa.ipc.IpcWriteOptions(compression=COMPRESSION, emit_dictionary_deltas=True)
+    return pa.ipc.new_file(path, schema, options=options)
+
+
+def _write_columnar(batches: Iterator["pa.RecordBatch"], path: Path, fmt: str, schema: dict,
+                    columns: list[str]) -> int:
+    typer = writer = None
+    rows = 0
+    try:
+        for batch in batches:
+            if typer is None:
+                typer = _BatchTyper(batch, schema)
+                writer = _open_writer(path, fmt, typer.schema)
+            writer.write_batch(typer.cast(batch))
+            rows += batch.num_rows
+        if writer is None:
+            # Header only — keep the columns so readers see the same shape
+            empty = pa.RecordBatch.from_arrays([pa.array([], pa.string()) for _ in columns], names=columns)
+            writer = _open_writer(path, fmt, _BatchTyper(empty, schema).schema)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def write_output(data: Union[pd.DataFrame, SpooledCSV], directory: Path, name: str,
+                 fmt: str = DEFAULT_FORMAT) -> tuple[Path, int]:
+    """
+    Write a DataFrame or SpooledCSV to directory/{name}.{fmt} (atomically)
+    and remove copies of the same name in other formats. Returns (path, rows).
+    A SpooledCSV is consumed.
+    """
+    _check_format(fmt)
+    path = directory / f"{name}{FORMATS[fmt]}"
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    try:
+        if fmt == "csv":
+            if isinstance(data, SpooledCSV):
+                with data:
+                    rows = data.write_csv(tmp)
+            else:
+                data.to_csv(tmp, index=False)
+                rows = len(data)
+        else:
+            if isinstance(data, SpooledCSV):
+                with data:
+                    rows = _write_columnar(data.batches(), tmp, fmt, schema_for(name), data.columns)
+            else:
+                rows = _write_columnar(_frame_batches(data), tmp, fmt, schema_for(name),
+                                       list(map(str, data.columns)))
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    for other in FORMATS.values():
+        if other != path.suffix:
+            (directory / f"{name}{other}").unlink(missing_ok=True)
+    return path, rows
+
+
+# =============================================================================
+# Reading
+# =============================================================================
+
+def output_format(path: Path) -> Optional[str]:
+    return next((fmt for fmt, ext in FORMATS.items() if path.suffix == ext), None)
+
+
+def output_paths(directory: Path) -> list[Path]:
+    """One file per output name (columnar preferred over CSV), sorted by name."""
+    found: dict[str, Path] = {}
+    for fmt in reversed(READ_PREFERENCE):
+        for path in directory.glob(f"*{FORMATS[fmt]}"):
+            found[path.stem] = path
+    return [found[name] for name in sorted(found)]
+
+
+def find_output(directory: Path, name: str) -> Optional[Path]:
+    """The preferred existing file for an output name, or None."""
+    for fmt in READ_PREFERENCE:
+        path = directory / f"{name}{FORMATS[fmt]}"
+        if path.exists():
+            return path
+    return None
+
+
+def output_columns(path: Path) -> list[str]:
+    fmt = output_format(path)
+    if fmt == "csv":
+        return list(pd.read_csv(path, nrows=0).columns)
+    return pads.dataset(path, format=fmt).schema.names
+
+
+def output_rows(path: Path) -> int:
+    """Row count — from the Parquet footer or Feather batch headers; CSVs are scanned."""
+    fmt = output_format(path)
+    if fmt == "parquet":
+        return pq.ParquetFile(path).metadata.num_rows
+    if fmt == "feather":
+        with pa.memory_map(str(path)) as source:
+            reader = pa.ipc.open_file(source)
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+
+def _filter_frame(df: pd.DataFrame, filters: list[tuple]) -> pd.DataFrame:
+    ops = {
+        "==": lambda s, v: s == v, "=": lambda s, v: s == v, "!=": lambda s, v: s != v,
+        "<": lambda s, v: s < v, "<=": lambda s, v: s <= v,
+        ">": lambda s, v: s > v, ">=": lambda s, v: s >= v,
+        "in": lambda s, v: s.isin(list(v)), "not in": lambda s, v: ~s.isin(list(v)),
+    }
+    for col, op, value in filters:
+        df = df[ops[op](df[col], value)]
+    return df
+
+
+def read_output(path: Path, columns: Optional[list[str]] = None,
+                filters: Optional[list[tuple]] = None) -> pd.DataFrame:
+    """
+    Load an output file. `columns` limits what is read; `filters` is a list of
+    (column, op, value) conditions, all of which must hold (ops: == != < <=
+    > >= in, not in). Columns and filters naming a column the file doesn't
+    have are ignored, so callers can ask for optional columns. Dictionary-
+    encoded columns come back as categoricals.
+    """
+    available = output_columns(path)
+    if columns is not None:
+        columns = [c for c in columns if c in available]
+    filters = [f for f in (filters or []) if f[0] in available]
+    fmt = output_format(path)
+
+    if fmt == "csv":
+        wanted = set(columns or available) | {f[0] for f in filters}
+        df = pd.read_csv(path, low_memory=False, usecols=lambda c: c in wanted)
+        df = _filter_frame(df, filters) if filters else df
+        return df[columns] if columns is not None else df
+
+    expression = pq.filters_to_expression(filters) if filters else None
+    table = pads.dataset(path, format=fmt).to_table(columns=columns, filter=expression)
+    df = table.to_pandas()
+    # Dictionary order is first-seen; sort so groupby / sort_values order matches plain strings
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+    return df
+
+
+@contextmanager
+def as_csv(path: Path, directory: Path) -> Iterator[Path]:
+    """
+    A CSV path for any output file, for CSV-only consumers (e.g. Socrata's
+    merge). Columnar files are exported to a spool file that is deleted on exit.
+    """
+    if output_format(path) == "csv":
+        yield path
+        return
+    out = spool_path(directory)
+    try:
+        writer = None
+        for batch in pads.dataset(path, format=output_format(path)).to_batches():
+            batch = pa.RecordBatch.from_arrays([_plain(c) for c in batch.columns], names=batch.schema.names)
+            if writer is None:
+                writer = pacsv.CSVWriter(out, batch.schema)
+            writer.write_batch(batch)
+        if writer is not None:
+            writer.close()
+        else:
+            out.write_text(",".join(output_columns(path)) + "\n")
+        yield out
+    finally:
+        out.unlink(missing_ok=True)
@@ -12,6 +12,8 @@ import duckdb
 import argparse
 from pathlib import Path
 
+from exceedance import sql_percent_over, sql_predicate
+
 ARCHIVE_DIR = "archive/wqp"
 
 def query_station_history(station_id: str, parameter: str = None,
@@ -89,32 +91,9 @@ def query_exceedances(state: str, year: int = None, parameter: str = None):
     sql = f"""
         SELECT
             stationId, date, parameter, value, unit,
-            CASE
-                WHEN parameter = 'Dissolved oxygen (DO)' AND value < 5.0
-                    THEN ROUND((5.0 - value) / 5.0 * 100, 1)
-                WHEN parameter = 'Phosphorus' AND value > 0.1
-                    THEN ROUND((value - 0.1) / 0.1 * 100, 1)
-                WHEN parameter IN ('Total Nitrogen, mixed forms', 'Nitrogen')
-                    AND value > 3.0
-                    THEN ROUND((value - 3.0) / 3.0 * 100, 1)
-                WHEN parameter = 'Escherichia coli' AND value > 410.0
-                    THEN ROUND((value - 410.0) / 410.0 * 100, 1)
-                WHEN parameter = 'Total suspended solids' AND value > 25.0
-                    THEN ROUND((value - 25.0) / 25.0 * 100, 1)
-                WHEN parameter = 'Turbidity' AND value > 50.0
-                    THEN ROUND((value - 50.0) / 50.0 * 100, 1)
-                ELSE NULL
-            END AS pct_over_threshold
+            ROUND({sql_percent_over()} * 100, 1) AS pct_over_threshold
         FROM read_parquet('{pattern}')
-        WHERE (
-            (parameter = 'Dissolved oxygen (DO)' AND value < 5.0) OR
-            (parameter = 'Phosphorus' AND value > 0.1) OR
-            (parameter IN ('Total Nitrogen, mixed forms', 'Nitrogen')
-                AND value > 3.0) OR
-            (parameter = 'Escherichia coli' AND value > 410.0) OR
-            (parameter = 'Total suspended solids' AND value > 25.0) OR
-            (parameter = 'Turbidity' AND value > 50.0)
-        )
+        WHERE {sql_predicate()}
         ORDER BY pct_over_threshold DESC
         LIMIT 500
     """
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+PIN Registry Store — transactional, row-level registry state in SQLite.
+
+health.py and fetch.py used to load registry.json whole, mutate it and
+rewrite the entire pretty-printed file, so two runs at once lost each
+other's updates and every status tick rewrote ~50KB. The live registry now
+sits in registry.db (SQLite, WAL mode) and registry.json is an export of it:
+
+  registry.json ──(import when the file changed outside the store)──► registry.db
+                                                                        │
+     sources     key = id    ┐  one row per entry, fields kept as a JSON
+     wqp_states  key = abbr  ┘  object; status / priority / last_fetch /
+                                next_check_after are indexed generated columns
+                                                                        │
+  registry.json ◄──(export_json, atomic, same structure as before)──────┘
+
+Writers touch only the fields they changed (json_set on one row, in a short
+transaction), so a health check and a fetch can update the same registry
+concurrently; readers never block under WAL. The JSON export is what gets
+committed and what the Next.js side reads.
+
+If registry.json is edited by hand (or replaced by a git pull) it no longer
+matches the hash recorded at the last export, and the next open re-imports
+it — the file wins over the database.
+
+Usage:
+  store = RegistryStore()
+  reg = store.load()                   # same dict shape as registry.json
+  reg["wqp_states"]["MD"]["status"] = "live"
+  store.save(reg)                      # writes just the changed fields
+  store.update_source("usgs-nwis", error_count=0)
+  store.never_fetched("sources", skip_status=("dead", "gated"))
+  store.export_json()
+"""
+
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+DIR = Path(__file__).parent
+REGISTRY_JSON = DIR / "registry.json"
+REGISTRY_DB = Path(os.environ.get("PIN_REGISTRY_DB", DIR / "registry.db"))
+BUSY_TIMEOUT_MS = 30_000
+
+TABLES = ("sources", "wqp_states")
+INDEXED_FIELDS = ("type", "status", "priority", "last_fetch", "next_check_after")
+DEFAULT_PRIORITY = 3
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    *(f"""CREATE TABLE IF NOT EXISTS {table} (
+            key TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            data TEXT NOT NULL CHECK (json_valid(data)),
+            {", ".join(f"{f} GENERATED ALWAYS AS (json_extract(data, '$.{f}')) VIRTUAL"
+                       for f in INDEXED_FIELDS)}
+        )""" for table in TABLES),
+    *(f"CREATE INDEX IF NOT EXISTS {table}_due ON {table} (status, next_check_after)" for table in TABLES),
+    *(f"CREATE INDEX IF NOT EXISTS {table}_fetch ON {table} (last_fetch, priority)" for table in TABLES),
+]
+
+
+class RegistryStoreError(Exception):
+    """Unknown table or entry, or a registry.json that can't be imported."""
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def _check_table(table: str):
+    if table not in TABLES:
+        raise RegistryStoreError(f"unknown registry table {table!r} (choose from {', '.join(TABLES)})")
+
+
+def _json_path(field: str) -> str:
+    return '$."' + field.replace('"', '\\"') + '"'
+
+
+def _set_fields(conn: sqlite3.Connection, table: str, key: str, fields: dict) -> bool:
+    """json_set the given fields on one row; False if there is no such row."""
+    args = [arg for name, value in fields.items() for arg in (_json_path(name), json.dumps(value))]
+    setters = ", ".join("?, json(?)" for _ in fields)
+    cur = conn.execute(f"UPDATE {table} SET data = json_set(data, {setters}) WHERE key = ?", (*args, key))
+    return cur.rowcount > 0
+
+
+class RegistryStore:
+    """The registry database; one connection, safe to share between threads."""
+
+    def __init__(self, db_path: Path = REGISTRY_DB, json_path: Path = REGISTRY_JSON):
+        self.db_path = Path(db_path)
+        self.json_path = Path(json_path)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self.transaction():
+            for stmt in _SCHEMA:
+                self._conn.execute(stmt)
+            if self.json_path.exists() and self._json_hash() != self._meta("json_sha256"):
+                self._import(self.json_path)
+        self._loaded: dict[tuple[str, str], dict] = {}
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE … COMMIT: takes the write lock up front, so no upgrade deadlocks."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    # ── Import / export ──
+
+    def _json_hash(self) -> str:
+        return hashlib.sha256(self.json_path.read_bytes()).hexdigest()
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._conn.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                           "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (key, value))
+
+    def _import(self, path: Path):
+        try:
+            reg = json.loads(path.read_text())
+            entries = {"sources": [(s["id"], s) for s in reg.get("sources", [])],
+                       "wqp_states": list(reg.get("wqp_states", {}).items())}
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise RegistryStoreError(f"can't import {path.name}: {e}") from e
+        for table in TABLES:
+            self._conn.execute(f"DELETE FROM {table}")
+            self._conn.executemany(f"INSERT INTO {table} (key, position, data) VALUES (?, ?, ?)",
+                                   [(key, i, json.dumps(row)) for i, (key, row) in enumerate(entries[table])])
+        self._set_meta("registry_meta", json.dumps(reg.get("meta", {})))
+        self._set_meta("json_sha256", self._json_hash())
+        print(f"  Registry imported ← {path.name} ({len(entries['sources'])} sources, "
+              f"{len(entries['wqp_states'])} WQP states)")
+
+    def export_json(self, path: Optional[Path] = None) -> Path:
+        """Write the registry.json structure (atomically); meta.updated is set to now."""
+        path = Path(path or self.json_path)
+        with self.transaction():
+            meta = json.loads(self._meta("registry_meta") or "{}")
+            meta["updated"] = _now()
+            self._set_meta("registry_meta", json.dumps(meta))
+            reg = {"meta": meta,
+                   "sources": [row for _, row in self._rows("sources")],
+                   "wqp_states": dict(self._rows("wqp_states"))}
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            try:
+                with open(tmp, "w") as f:
+                    json.dump(reg, f, indent=2)
+                os.replace(tmp, path)
+            finally:
+                tmp.unlink(missing_ok=True)
+            if path == self.json_path:
+                self._set_meta("json_sha256", self._json_hash())
+        return path
+
+    # ── Reads ──
+
+    def _rows(self, table: str, where: str = "1=1", params: tuple = (),
+              order: str = "position") -> list[tuple[str, dict]]:
+        _check_table(table)
+        cur = self._conn.execute(f"SELECT key, data FROM {table} WHERE {where} ORDER BY {order}", params)
+        return [(key, json.loads(data)) for key, data in cur]
+
+    def load(self) -> dict:
+        """The whole registry as a registry.json-shaped dict; save() diffs against it."""
+        with self._lock:
+            reg = {"meta": json.loads(self._meta("registry_meta") or "{}"),
+                   "sources": [row for _, row in self._rows("sources")],
+                   "wqp_states": dict(self._rows("wqp_states"))}
+            self._loaded = {("sources", s["id"]): copy.deepcopy(s) for s in reg["sources"]}
+            self._loaded.update({("wqp_states", k): copy.deepcopy(v) for k, v in reg["wqp_states"].items()})
+        return reg
+
+    def get(self, table: str, key: str) -> Optional[dict]:
+        rows = self._rows(table, "key = ?", (key,))
+        return rows[0][1] if rows else None
+
+    def never_fetched(self, table: str, skip_status: Iterable[str] = ()) -> list[str]:
+        """Keys with no last_fetch, in registry order."""
+        skip = tuple(skip_status)
+        where = f"COALESCE(last_fetch, '') = '' AND COALESCE(status, '') NOT IN ({','.join('?' * len(skip))})"
+        return [key for key, _ in self._rows(table, where, skip)]
+
+    def fetch_order(self, table: str, skip_status: Iterable[str] = ()) -> list[str]:
+        """Keys never fetched first, then oldest last_fetch; lower priority number breaks ties."""
+        skip = tuple(skip_status)
+        where = f"COALESCE(status, '') NOT IN ({','.join('?' * len(skip))})"
+        order = f"last_fetch IS NOT NULL, last_fetch, COALESCE(priority, {DEFAULT_PRIORITY}), position"
+        return [key for key, _ in self._rows(table, where, skip, order)]
+
+    def next_due(self, table: str, limit: int = 1) -> list[tuple[str, str]]:
+        """(key, next_check_after) of the entries whose backoff ends soonest."""
+        _check_table(table)
+        cur = self._conn.execute(f"SELECT key, next_check_after FROM {table} "
+                                 "WHERE next_check_after IS NOT NULL AND status IS NOT 'gated' "
+                                 "ORDER BY next_check_after LIMIT ?", (limit,))
+        return cur.fetchall()
+
+    # ── Writes ──
+
+    def update(self, table: str, key: str, **fields) -> None:
+        """Set some fields of one entry, leaving the rest (and other writers' changes) alone."""
+        _check_table(table)
+        if not fields:
+            return
+        with self.transaction() as conn:
+            if not _set_fields(conn, table, key, fields):
+                raise RegistryStoreError(f"no {table} entry {key!r}")
+
+    def update_source(self, source_id: str, **fields):
+        self.update("sources", source_id, **fields)
+
+    def update_wqp_state(self, abbr: str, **fields):
+        self.update("wqp_states", abbr, **fields)
+
+    def save(self, reg: dict) -> int:
+        """
+        Write the fields of `reg` that differ from what load() returned, one
+        json_set per changed entry, all in one transaction. New entries are
+        appended. Returns the number of entries written.
+        """
+        changes = []
+        for table, rows in (("sources", [(s["id"], s) for s in reg.get("sources", [])]),
+                            ("wqp_states", list(reg.get("wqp_states", {}).items()))):
+            for key, row in rows:
+                before = self._loaded.get((table, key))
+                if before is None:
+                    changes.append((table, key, None, row))
+                    continue
+                changed = {f: v for f, v in row.items() if f not in before or before[f] != v}
+                if changed:
+                    changes.append((table, key, changed, row))
+        if not changes:
+            return 0
+
+        with self.transaction() as conn:
+            for table, key, changed, row in changes:
+                if changed is None:
+                    conn.execute(f"INSERT INTO {table} (key, position, data) "
+                                 f"VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM {table}), ?) "
+                                 "ON CONFLICT (key) DO UPDATE SET data = excluded.data",
+                                 (key, json.dumps(row)))
+                else:
+                    _set_fields(conn, table, key, changed)
+                self._loaded[(table, key)] = copy.deepcopy(row)
+        return len(changes)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+PIN Batch Scheduler — fill a wall-clock budget with the most useful fetches.
+
+--next-batch N used to take the first N never-fetched / oldest entries, so a
+run could pick WQP PA (40 minutes) four times over and hit the Actions
+timeout, or pick DC and finish in a minute. With --budget-minutes the batch
+is chosen from a cost model instead:
+
+  cost    each registry entry carries fetch_seconds (an exponentially
+          weighted average of past successful fetch durations, all of a
+          per-state source's jobs summed) and fetch_rows; entries with no
+          history cost the median of their host, or DEFAULT_JOB_SECONDS
+  value   staleness (days since last_fetch, never-fetched counts as
+          MAX_STALENESS_DAYS) × priority weight
+  pick    jobs on different hosts run in parallel, so each host is a 0/1
+          knapsack of busy seconds ≤ budget × that host's concurrency;
+          then picks are dropped, lowest value per second first, until the
+          estimated makespan fits the budget on every host and across the
+          global worker pool
+
+  candidates ──► Candidate(cost, value, host) ──► per-host knapsack ──► fit check ──► batch
+
+Usage:
+  recorder = CostRecorder()
+  recorder.expect(entry, jobs=56)            # before the run
+  recorder.add(entry, seconds, rows)         # per finished job; updates entry when all are in
+  picked = plan_budget(candidates, budget_seconds=35 * 60, workers=8)
+"""
+
+import math
+from datetime import datetime
+from statistics import median
+from typing import Iterable, NamedTuple, Optional
+
+from fetch_engine import DEFAULT_HOST_LIMIT, HOST_LIMITS
+
+COST_FIELD = "fetch_seconds"
+ROWS_FIELD = "fetch_rows"
+EWMA_ALPHA = 0.5               # weight of the newest duration
+DEFAULT_JOB_SECONDS = 600      # no history for the entry or its host
+MAX_STALENESS_DAYS = 30        # staleness cap (and what never-fetched counts as)
+PRIORITY_WEIGHTS = {1: 3.0, 2: 2.0, 3: 1.0, 4: 0.75, 5: 0.5}
+DEFAULT_PRIORITY = 3
+TIME_UNIT_SECONDS = 10         # knapsack resolution
+
+
+class Candidate(NamedTuple):
+    kind: str          # "federal" or "wqp", as in pick_next_batch
+    key: str           # source id or state abbreviation
+    entry: dict        # the registry entry
+    host: str          # concurrency bucket of its jobs
+    jobs: int          # fetch jobs it expands to (56 for per-state sources)
+    seconds: float     # estimated busy seconds, all jobs
+    value: float
+
+    @property
+    def longest_job(self) -> float:
+        return self.seconds / max(1, self.jobs)
+
+
+def host_slots(host: str) -> int:
+    return max(1, HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT)[0])
+
+
+def staleness_days(entry: dict, now: Optional[datetime] = None) -> float:
+    last = entry.get("last_fetch")
+    if not last:
+        return MAX_STALENESS_DAYS
+    now = now or datetime.utcnow()
+    try:
+        then = datetime.fromisoformat(last.replace("Z", "+00:00")).replace(tzinfo=None)
+    except (ValueError, TypeError):
+        return MAX_STALENESS_DAYS
+    return min(max((now - then).total_seconds() / 86400, 0.0), MAX_STALENESS_DAYS)
+
+
+def entry_value(entry: dict, now: Optional[datetime] = None) -> float:
+    weight = PRIORITY_WEIGHTS.get(entry.get("priority", DEFAULT_PRIORITY), 1.0)
+    return staleness_days(entry, now) * weight
+
+
+def make_candidates(items: Iterable[tuple], now: Optional[datetime] = None) -> list[Candidate]:
+    """
+    Candidates from (kind, key, entry, host, jobs) tuples. Host medians are
+    taken over the items' own history.
+    """
+    items = list(items)
+    known: dict[str, list[float]] = {}
+    for _, _, entry, host, jobs in items:
+        if entry.get(COST_FIELD) and jobs:
+            known.setdefault(host, []).append(float(entry[COST_FIELD]) / jobs)
+    out = []
+    for kind, key, entry, host, jobs in items:
+        if entry.get(COST_FIELD):
+            seconds = float(entry[COST_FIELD])
+        else:
+            seconds = (median(known[host]) if known.get(host) else DEFAULT_JOB_SECONDS) * jobs
+        out.append(Candidate(kind, key, entry, host, jobs, seconds, entry_value(entry, now)))
+    return out
+
+
+# =============================================================================
+# Planning
+# =============================================================================
+
+def _knapsack(items: list[Candidate], capacity: float) -> list[Candidate]:
+    """0/1 knapsack on busy seconds (rounded up to TIME_UNIT_SECONDS), maximizing value."""
+    cap = int(capacity // TIME_UNIT_SECONDS)
+    weights = [math.ceil(c.seconds / TIME_UNIT_SECONDS) for c in items]
+    best = [0.0] * (cap + 1)
+    took = [[False] * (cap + 1) for _ in items]
+    for i, (c, w) in enumerate(zip(items, weights)):
+        for room in range(cap, w - 1, -1):
+            if best[room - w] + c.value > best[room]:
+                best[room] = best[room - w] + c.value
+                took[i][room] = True
+    picked, room = [], cap
+    for i in range(len(items) - 1, -1, -1):
+        if took[i][room]:
+            picked.append(items[i])
+            room -= weights[i]
+    return picked[::-1]
+
+
+def makespan(picked: list[Candidate], host: str) -> float:
+    """Upper bound on a host's wall time: busy/slots + the longest job's tail (list scheduling)."""
+    on_host = [c for c in picked if c.host == host and c.jobs]
+    if not on_host:
+        return 0.0
+    slots = host_slots(host)
+    busy = sum(c.seconds for c in on_host)
+    return busy / slots + max(c.longest_job for c in on_host) * (1 - 1 / slots)
+
+
+def estimated_wall(picked: list[Candidate], workers: int) -> float:
+    hosts = {c.host for c in picked}
+    per_host = max((makespan(picked, h) for h in hosts), default=0.0)
+    return max(per_host, sum(c.seconds for c in picked) / max(1, workers))
+
+
+def plan_budget(candidates: list[Candidate], budget_seconds: float, workers: int,
+                limit: Optional[int] = None) -> list[Candidate]:
+    """
+    The candidates to run within `budget_seconds` of wall clock, in the
+    order given. At most `limit` of them if set (highest value kept).
+    """
+    hosts: dict[str, list[Candidate]] = {}
+    for c in candidates:
+        if c.longest_job <= budget_seconds:
+            hosts.setdefault(c.host, []).append(c)
+
+    picked = []
+    for host, items in hosts.items():
+        picked += _knapsack(items, budget_seconds * host_slots(host))
+
+    # The knapsack only bounds busy time; drop the least value per second (from the
+    # host that runs over, else from anywhere) until the makespan bound fits
+    density = lambda c: c.value / max(c.seconds, 1.0)
+    while picked and estimated_wall(picked, workers) > budget_seconds:
+        host = max({c.host for c in picked}, key=lambda h: makespan(picked, h))
+        over = [c for c in picked if c.host == host] if makespan(picked, host) > budget_seconds else picked
+        picked.remove(min(over, key=density))
+    if limit is not None and len(picked) > limit:
+        keep = set(id(c) for c in sorted(picked, key=lambda c: -c.value)[:limit])
+        picked = [c for c in picked if id(c) in keep]
+
+    order = {id(c): i for i, c in enumerate(candidates)}
+    return sorted(picked, key=lambda c: order[id(c)])
+
+
+# =============================================================================
+# Learning
+# =============================================================================
+
+class CostRecorder:
+    """
+    Collects a run's successful job durations per registry entry and folds
+    them into the entry's fetch_seconds / fetch_rows once all of its jobs
+    have reported.
+    """
+
+    def __init__(self):
+        self._pending: dict[int, list] = {}   # id(entry) → [entry, jobs left, seconds, rows]
+
+    def expect(self, entry: dict, jobs: int = 1):
+        state = self._pending.setdefault(id(entry), [entry, 0, 0.0, 0])
+        state[1] += jobs
+
+    def add(self, entry: dict, seconds: Optional[float], rows: Optional[int] = None):
+        """One job finished; seconds=None when it failed (not counted as a cost sample)."""
+        state = self._pending.get(id(entry))
+        if state is None:
+            return
+        state[1] -= 1
+        if seconds is not None:
+            state[2] += seconds
+            state[3] += rows or 0
+        if state[1] <= 0:
+            del self._pending[id(entry)]
+            if state[2] > 0:
+                record_cost(entry, state[2], state[3])
+
+
+def record_cost(entry: dict, seconds: float, rows: int):
+    previous = entry.get(COST_FIELD)
+    blended = seconds if not previous else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * float(previous)
+    entry[COST_FIELD] = round(blended, 1)
+    entry[ROWS_FIELD] = rows
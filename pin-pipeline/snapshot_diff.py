@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+PIN Snapshot Diff — insert/update/delete deltas between fetch snapshots.
+
+save_csv replaces output/{name}.* with a full snapshot every run, so a
+consumer can't tell what changed without reloading all of it. Each new
+snapshot is now diffed against the previous one by natural key before it
+is written:
+
+  snapshot ──► key (NATURAL_KEYS, e.g. ActivityIdentifier+CharacteristicName)
+           └─► row hash (normalized as in fingerprint.py)
+                 │
+                 ▼  compared with the running state (key → hash per output)
+  output/deltas/{name}/{YYYYmmddTHHMMSSffffffZ}.{fmt}
+                 _op = insert | update  full new row
+                 _op = delete           _key only
+
+Keys that repeat within a snapshot (or sources without a natural key) fall
+back to key#row-hash, so such rows show up as delete + insert instead of
+update. The first snapshot of a name is a baseline: it seeds the state and
+writes no delta.
+
+The state lives in output/cdc_state.db (SQLite, not committed). It is tagged
+with the fingerprint of the snapshot it describes; when that doesn't match
+the manifest — fresh CI checkout, failed write — it is rebuilt from the
+previous snapshot file, which is committed.
+
+Consumers apply the files from delta_paths(name, since=...) in order.
+Deltas are kept for DELTA_KEEP_DAYS (PIN_DELTA_KEEP_DAYS): prune_deltas()
+removes older ones after each fetch run, so output/ (committed by the
+workflow) stays bounded. A consumer whose last applied stamp is older than
+the oldest delta left reloads the snapshot instead.
+
+Usage:
+  store = ChangeStore()
+  summary = store.diff("wqp-MD", spooled, fp, previous=find_output(OUTPUT, "wqp-MD"),
+                       previous_digest=MANIFEST.digest("wqp-MD"))
+  removed = prune_deltas()                 # drop deltas older than DELTA_KEEP_DAYS
+"""
+
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.dataset as pads
+except ImportError:
+    pads = None  # CSV snapshots only
+
+from fingerprint import Fingerprint, normalize_frame
+from output_files import DEFAULT_FORMAT, output_format, write_output
+from spooled_csv import CHUNK_ROWS, SpooledCSV, spool_path
+
+DIR = Path(__file__).parent
+OUTPUT = DIR / "output"
+STATE_DB = "cdc_state.db"     # under output/
+DELTA_DIR = "deltas"          # under output/
+DELTA_KEEP_DAYS = int(os.environ.get("PIN_DELTA_KEEP_DAYS", 30))
+STAMP_FORMAT = "%Y%m%dT%H%M%S%fZ"   # delta file stem: sortable, unique per run
+OP_COL = "_op"
+KEY_COL = "_key"
+KEY_SEP = "\x1f"
+
+# Output name (source ID, optionally "-{state}") → natural key columns
+NATURAL_KEYS = {
+    "wqp":             ["ActivityIdentifier", "CharacteristicName"],
+    "usgs-nwis":       ["site_id", "param", "datetime"],
+    "epa-sdwis":       ["PWSID"],
+    "echo_facilities": ["SourceID"],          # NPDES ID
+    "echo_violations": ["SourceID"],
+    "frs_wwtps":       ["REGISTRY_ID"],
+    "cdc_nwss":        [":id"],
+    "state_ny":        [":id"],
+    "state_nj":        [":id"],
+    "state_pa":        [":id"],
+    "state_va":        [":id"],
+    "md-mde-arcgis":   ["_layer", "_objectid"],
+}
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS state (
+        name TEXT NOT NULL, key TEXT NOT NULL, hash INTEGER NOT NULL,
+        PRIMARY KEY (name, key)) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS snapshots (
+        name TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, rows INTEGER NOT NULL, updated TEXT NOT NULL)""",
+]
+
+
+class DeltaSummary(NamedTuple):
+    inserts: int
+    updates: int
+    deletes: int
+    path: Optional[Path]      # None for a baseline or an empty diff
+    baseline: bool
+
+    def __str__(self):
+        if self.baseline:
+            return "baseline (no previous state)"
+        return f"+{self.inserts:,} ~{self.updates:,} -{self.deletes:,}"
+
+
+def natural_key(name: str) -> list[str]:
+    """Key columns for an output name like "wqp-MD" or "cdc_nwss" (empty → row-hash identity)."""
+    for source, columns in NATURAL_KEYS.items():
+        if name == source or name.startswith(source + "-"):
+            return columns
+    return []
+
+
+def delta_paths(name: str, since: Optional[str] = None, directory: Path = OUTPUT) -> list[Path]:
+    """Delta files for an output name, oldest first; `since` is the last stamp already applied."""
+    out_dir = directory / DELTA_DIR / name
+    paths = [p for p in out_dir.glob("*.*") if not p.name.endswith(".tmp")] if out_dir.exists() else []
+    return sorted(p for p in paths if since is None or p.stem > since)
+
+
+def prune_deltas(keep_days: int = DELTA_KEEP_DAYS, directory: Path = OUTPUT,
+                 now: Optional[datetime] = None) -> int:
+    """Delete delta files stamped more than `keep_days` ago (and emptied name folders). Returns files removed."""
+    root = directory / DELTA_DIR
+    if not root.exists():
+        return 0
+    cutoff = ((now or datetime.utcnow()) - timedelta(days=keep_days)).strftime(STAMP_FORMAT)
+    removed = 0
+    for out_dir in sorted(p for p in root.iterdir() if p.is_dir()):
+        for path in delta_paths(out_dir.name, directory=directory):
+            if path.stem >= cutoff:
+                break   # oldest first
+            path.unlink()
+            removed += 1
+        if not any(out_dir.iterdir()):
+            out_dir.rmdir()
+    return removed
+
+
+def _frames(data: Union[pd.DataFrame, SpooledCSV]) -> Iterator[pd.DataFrame]:
+    if isinstance(data, SpooledCSV):
+        yield from data.frames()
+    else:
+        for start in range(0, len(data), CHUNK_ROWS):
+            yield data.iloc[start:start + CHUNK_ROWS]
+
+
+def snapshot_frames(path: Path) -> Iterator[pd.DataFrame]:
+    """A written snapshot (CSV, Parquet or Feather) in chunks, values as strings."""
+    fmt = output_format(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=CHUNK_ROWS)
+        return
+    for batch in pads.dataset(path, format=fmt).to_batches(batch_size=CHUNK_ROWS):
+        yield batch.to_pandas()
+
+
+def _keyed(chunk: pd.DataFrame, key_cols: list[str]) -> tuple[pd.Series, np.ndarray]:
+    """(key strings, signed 64-bit row hashes) for one chunk."""
+    norm = normalize_frame(chunk)
+    hashes = pd.util.hash_pandas_object(norm, index=False).to_numpy().view(np.int64)
+    if key_cols and all(c in norm.columns for c in key_cols):
+        keys = norm[key_cols[0]]
+        for col in key_cols[1:]:
+            keys = keys + KEY_SEP + norm[col]
+    else:
+        keys = pd.Series(hashes.astype(str), index=norm.index)
+    return keys.reset_index(drop=True), hashes
+
+
+class ChangeStore:
+    """Running key → row-hash state per output name, plus the delta writer."""
+
+    def __init__(self, directory: Path = OUTPUT):
+        self.directory = directory
+        directory.mkdir(parents=True, exist_ok=True)
+        # Callers are serialized (fetch_engine callbacks), but not always on one thread
+        self.db = sqlite3.connect(directory / STATE_DB, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA temp_store=FILE")
+        for statement in _SCHEMA:
+            self.db.execute(statement)
+
+    def close(self):
+        self.db.close()
+
+    # ── Loading keys ──
+
+    def _load(self, table: str, frames: Iterable[pd.DataFrame], key_cols: list[str]) -> int:
+        """Fill temp `table` (seq, key, hash) from chunks; repeated keys become key#hash."""
+        self.db.execute(f"DROP TABLE IF EXISTS temp.{table}")
+        self.db.execute(f"CREATE TEMP TABLE {table} (seq INTEGER PRIMARY KEY, key TEXT NOT NULL, hash INTEGER NOT NULL)")
+        seq = 0
+        self.db.execute("BEGIN")
+        for chunk in frames:
+            keys, hashes = _keyed(chunk, key_cols)
+            rows = zip(range(seq, seq + len(chunk)), keys.tolist(), hashes.tolist())
+            self.db.executemany(f"INSERT INTO {table} VALUES (?, ?, ?)", rows)
+            seq += len(chunk)
+        self.db.execute(f"""UPDATE {table} SET key = key || '#' || hash WHERE key IN
+                            (SELECT key FROM {table} GROUP BY key HAVING COUNT(*) > 1)""")
+        self.db.execute(f"CREATE INDEX temp.{table}_key ON {table} (key)")
+        self.db.execute("COMMIT")
+        return seq
+
+    def _replace_state(self, name: str, table: str, fp: Fingerprint):
+        self.db.execute("BEGIN")
+        self.db.execute("DELETE FROM state WHERE name = ?", (name,))
+        self.db.execute(f"INSERT OR IGNORE INTO state SELECT ?, key, hash FROM {table}", (name,))
+        self.db.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)",
+                        (name, fp.digest, fp.rows, datetime.utcnow().isoformat() + "Z"))
+        self.db.execute("COMMIT")
+
+    def _has_state(self, name: str, digest: Optional[str]) -> bool:
+        row = self.db.execute("SELECT fingerprint FROM snapshots WHERE name = ?", (name,)).fetchone()
+        return row is not None and digest is not None and row[0] == digest
+
+    def _rebuild(self, name: str, previous: Path, digest: str, key_cols: list[str]):
+        print(f"    Δ {name}: rebuilding change state from {previous.name}")
+        rows = self._load("prev", snapshot_frames(previous), key_cols)
+        self._replace_state(name, "prev", Fingerprint(digest, rows))
+
+    # ── Diff ──
+
+    def diff(self, name: str, data: Union[pd.DataFrame, SpooledCSV], fp: Fingerprint,
+             previous: Optional[Path] = None, previous_digest: Optional[str] = None,
+             fmt: str = DEFAULT_FORMAT) -> DeltaSummary:
+        """
+        Diff a new snapshot (read, not consumed) against the state for `name`,
+        write the delta file and move the state to the new snapshot.
+        `previous` / `previous_digest` are the snapshot file and fingerprint
+        currently in output/, used when the state has to be rebuilt.
+        """
+        key_cols = natural_key(name)
+        if not self._has_state(name, previous_digest):
+            if previous is None or previous_digest is None:
+                self._load("cur", _frames(data), key_cols)
+                self._replace_state(name, "cur", fp)
+                return DeltaSummary(0, 0, 0, None, baseline=True)
+            self._rebuild(name, previous, previous_digest, key_cols)
+
+        self._load("cur", _frames(data), key_cols)
+        changed = self.db.execute(
+            """SELECT MIN(c.seq), s.key IS NULL, c.key FROM cur c
+               LEFT JOIN state s ON s.name = ? AND s.key = c.key
+               WHERE s.key IS NULL OR s.hash != c.hash
+               GROUP BY c.key ORDER BY 1""", (name,))
+        spool = spool_path(self.directory)
+        try:
+            inserts, updates, columns = self._write_changed(spool, data, changed)
+            deleted = [k for (k,) in self.db.execute(
+                "SELECT key FROM state WHERE name = ? AND key NOT IN (SELECT key FROM cur)", (name,))]
+            if deleted:
+                blank = {c: "" for c in columns}
+                pd.DataFrame([{OP_COL: "delete", KEY_COL: k, **blank} for k in deleted],
+                             columns=[OP_COL, KEY_COL, *columns]
+                             ).to_csv(spool, mode="a", header=not (inserts + updates), index=False)
+            path = None
+            if inserts or updates or deleted:
+                out_dir = self.directory / DELTA_DIR / name
+                out_dir.mkdir(parents=True, exist_ok=True)
+                stamp = datetime.utcnow().strftime(STAMP_FORMAT)
+                path, _ = write_output(SpooledCSV(spool), out_dir, stamp, fmt)
+        finally:
+            spool.unlink(missing_ok=True)
+        self._replace_state(name, "cur", fp)
+        return DeltaSummary(inserts, updates, len(deleted), path, baseline=False)
+
+    def _write_changed(self, spool: Path, data, changed) -> tuple[int, int, list[str]]:
+        """Append inserted/updated rows (in snapshot order) to the spool CSV."""
+        inserts = updates = 0
+        columns: list[str] = []
+        pending = changed.fetchone()
+        start = 0
+        for chunk in _frames(data):
+            columns = columns or list(map(str, chunk.columns))
+            end = start + len(chunk)
+            positions, ops, keys = [], [], []
+            while pending is not None and pending[0] < end:
+                seq, is_new, key = pending
+                positions.append(seq - start)
+                ops.append("insert" if is_new else "update")
+                keys.append(key)
+                pending = changed.fetchone()
+            if positions:
+                rows = chunk.iloc[positions].set_axis(columns, axis=1)
+                rows.insert(0, KEY_COL, keys)
+                rows.insert(0, OP_COL, ops)
+                rows.to_csv(spool, mode="a", header=not (inserts + updates), index=False)
+                new = ops.count("insert")
+                inserts += new
+                updates += len(ops) - new
+            start = end
+        return inserts, updates, columns
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+PIN Socrata Client — complete and incremental pulls from SODA datasets.
+
+State open-data portals and CDC NWSS used to be fetched as one `$limit`
+page, so anything past row 10k/50k was never seen. This pages through the
+whole dataset and, once a copy exists, asks only for what changed:
+
+  first run     count(*) → $offset pages ordered by :id, fetched concurrently
+                (keyset on :id, one page at a time, if count isn't answering)
+  later runs    same, filtered to :updated_at >= max(:updated_at) in the
+                previous output, then merged into it by :id
+
+Pages are requested as CSV with the :id / :updated_at system fields, so every
+page has the same header (SODA JSON omits null fields) and bytes go to the
+spool file without a JSON round-trip. Rows deleted upstream are not visible
+to an :updated_at filter; delete the output CSV to force a full pull.
+
+Set CDC_SOCRATA_APP_TOKEN (any Socrata app token works on every portal) for
+higher rate limits.
+
+Usage:
+  ds = SocrataDataset("https://data.cdc.gov/resource/2ew6-ywp6.json")
+  spooled = ds.fetch(OUTPUT, previous=OUTPUT / "cdc_nwss.csv")
+"""
+
+import csv
+import io
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+
+import http_client
+from fetch_engine import ordered_map
+from spooled_csv import SpooledCSV, spool_path
+
+PAGE_ROWS = 50_000
+PAGE_WORKERS = 4
+MAX_CONCURRENT_PER_HOST = 4
+REQUEST_TIMEOUT = 180
+APP_TOKEN_ENV = "CDC_SOCRATA_APP_TOKEN"
+
+_slots_lock = threading.Lock()
+_host_slots: dict[str, threading.BoundedSemaphore] = {}
+
+
+class SocrataError(Exception):
+    """A page could not be fetched; the dataset copy would be incomplete."""
+
+
+def _slot(host: str) -> threading.BoundedSemaphore:
+    with _slots_lock:
+        return _host_slots.setdefault(host, threading.BoundedSemaphore(MAX_CONCURRENT_PER_HOST))
+
+
+def _soql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def updated_since(watermark: str) -> str:
+    """$where clause for rows updated at or after a previous copy's max :updated_at."""
+    return f":updated_at >= {_soql_literal(watermark.rstrip('Z'))}"
+
+
+class SocrataDataset:
+    """One SODA resource, e.g. https://data.ny.gov/resource/4k4g-s9hz.json."""
+
+    def __init__(self, url: str, page_rows: int = PAGE_ROWS, workers: int = PAGE_WORKERS):
+        parts = urlsplit(url)
+        path = parts.path.rsplit(".", 1)[0]   # drop .json
+        self.host = parts.netloc
+        self.json_url = urlunsplit((parts.scheme, parts.netloc, path + ".json", "", ""))
+        self.csv_url = urlunsplit((parts.scheme, parts.netloc, path + ".csv", "", ""))
+        self.page_rows = page_rows
+        self.workers = workers
+        self.headers = {}
+        token = os.environ.get(APP_TOKEN_ENV)
+        if token:
+            self.headers["X-App-Token"] = token
+
+    def _get(self, url: str, params: dict) -> requests.Response:
+        """GET with the body read while holding the host slot (the client retries 429/5xx)."""
+        try:
+            with _slot(self.host):
+                r = http_client.get(url, params=params, timeout=REQUEST_TIMEOUT,
+                                    headers=self.headers)
+                r.raise_for_status()
+            return r
+        except Exception as e:
+            raise SocrataError(f"{url} {params}: {str(e)[:100]}") from e
+
+    def count(self, where: Optional[str] = None) -> Optional[int]:
+        """Matching row count, or None if the count query fails."""
+        params = {"$select": "count(*) AS n"}
+        if where:
+            params["$where"] = where
+        try:
+            return int(self._get(self.json_url, params).json()[0]["n"])
+        except Exception:
+            return None
+
+    def _page(self, where: Optional[str], offset: int = 0) -> bytes:
+        params = {"$select": ":id, :updated_at, *", "$order": ":id",
+                  "$limit": self.page_rows, "$offset": offset}
+        if where:
+            params["$where"] = where
+        return self._get(self.csv_url, params).content
+
+    # ── Full / delta pull ──
+
+    def fetch_rows(self, spool: Path, where: Optional[str] = None, label: str = "") -> int:
+        """Write every row matching `where` to `spool` as CSV. Returns the row count."""
+        total = self.count(where)
+        rows = 0
+        with open(spool, "wb") as out:
+            def write(page: bytes) -> int:
+                header, _, body = page.partition(b"\n")
+                if out.tell() == 0:
+                    out.write(header + b"\n")
+                out.write(body if body.endswith(b"\n") or not body else body + b"\n")
+                return _count_records(body)
+
+            if total is not None:
+                offsets = range(0, total, self.page_rows)
+                if total:
+                    print(f"    {label}: {total:,} rows → {len(offsets)} pages")
+                for page in ordered_map(lambda o: self._page(where, o), offsets, self.workers):
+                    rows += write(page)
+            else:
+                # No count — keyset on :id, one page at a time
+                print(f"    {label}: row count unavailable, paging by :id")
+                last_id = None
+                while True:
+                    clause = f":id > {_soql_literal(last_id)}" if last_id else None
+                    combined = " AND ".join(f"({c})" for c in (where, clause) if c) or None
+                    page = self._page(combined)
+                    n = write(page)
+                    rows += n
+                    if n < self.page_rows:
+                        break
+                    last_id = _last_id(page)
+        return rows
+
+    def fetch(self, directory: Path, previous: Optional[Path] = None,
+              label: str = "") -> Optional[SpooledCSV]:
+        """
+        Complete copy of the dataset as a spooled CSV. With a `previous` copy
+        that has :id / :updated_at columns, only rows updated since its
+        newest :updated_at are requested and merged in.
+        """
+        label = label or self.host
+        watermark = max_updated_at(previous) if previous and previous.exists() else None
+        where = updated_since(watermark) if watermark else None
+
+        delta = spool_path(directory)
+        try:
+            fetched = self.fetch_rows(delta, where, label)
+        except BaseException:
+            delta.unlink(missing_ok=True)
+            raise
+        if not watermark:
+            if not fetched:
+                delta.unlink(missing_ok=True)
+                return None
+            spooled = SpooledCSV(delta)
+            spooled.rows = fetched
+            return spooled
+
+        print(f"    {label}: {fetched:,} rows updated since {watermark}")
+        merged = spool_path(directory)
+        try:
+            spooled = SpooledCSV(merged)
+            spooled.rows = merge_by_id(previous, delta, merged)
+        except BaseException:
+            merged.unlink(missing_ok=True)
+            raise
+        finally:
+            delta.unlink(missing_ok=True)
+        return spooled
+
+
+# =============================================================================
+# CSV helpers
+# =============================================================================
+
+def _count_records(body: bytes) -> int:
+    """Records in a CSV body (quoted fields may contain newlines)."""
+    if not body.strip():
+        return 0
+    return sum(1 for _ in csv.reader(io.StringIO(body.decode("utf-8", errors="replace"))))
+
+
+def _last_id(page: bytes) -> Optional[str]:
+    rows = list(csv.DictReader(io.StringIO(page.decode("utf-8", errors="replace"))))
+    return rows[-1].get(":id") if rows else None
+
+
+def max_updated_at(path: Path) -> Optional[str]:
+    """Newest :updated_at in a previous CSV copy, or None if it has no such column."""
+    latest = None
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if ":id" not in header or ":updated_at" not in header:
+            return None
+        col = header.index(":updated_at")
+        for row in reader:
+            if len(row) > col and row[col] and (latest is None or row[col] > latest):
+                latest = row[col]
+    return latest
+
+
+def merge_by_id(previous: Path, delta: Path, out_path: Path) -> int:
+    """
+    Previous copy with rows replaced/added from `delta` by :id, written to
+    `out_path`. Columns are unioned (new fields show up in the delta).
+    Only the delta's ids are held in memory. Returns the row count.
+    """
+    with open(delta, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        delta_cols = reader.fieldnames or []
+        delta_ids = {row[":id"] for row in reader}
+    with open(previous, newline="", encoding="utf-8") as f:
+        prev_cols = next(csv.reader(f), [])
+    columns = prev_cols + [c for c in delta_cols if c not in prev_cols]
+
+    rows = 0
+    with open(out_path, "w", newline="", encoding="utf-8") as out:
+        writer = csv.DictWriter(out, fieldnames=columns, restval="")
+        writer.writeheader()
+        with open(previous, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get(":id") not in delta_ids:
+                    writer.writerow(row)
+                    rows += 1
+        with open(delta, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                writer.writerow(row)
+                rows += 1
+    return rows
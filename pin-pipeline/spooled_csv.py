@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+PIN Spooled CSV — park a large CSV download on disk, then parse it in chunks.
+
+A national WQP state pull is hundreds of MB of CSV. Parsing it straight off
+the socket into one DataFrame holds the whole result as Python objects and
+keeps the connection open for as long as the parse takes. Instead:
+
+  response ──► spool file (decoded bytes, written as they arrive)
+                  │
+                  └─► record batches (pyarrow.csv, block-parallel)   ─► output
+                      or DataFrame chunks (pandas, if no pyarrow)
+
+Every column is parsed as a string unless the dtype map says otherwise, so
+chunk schemas can't drift (no "this column looked numeric in block 1") and
+values round-trip byte-for-byte — WQP mixes numbers and text such as "ND"
+in the same column, and IDs keep their leading zeros.
+
+Usage:
+  with spool_stream(open_stream(resp), OUTPUT) as spooled:
+      if not spooled.empty:
+          rows = spooled.write_csv(OUTPUT / "wqp-MD.csv")
+"""
+
+import csv
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Iterator, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = pacsv = None  # falls back to pandas chunks
+
+import pandas as pd
+
+COPY_BUFFER = 1024 * 1024
+BLOCK_SIZE = 16 * 1024 * 1024   # bytes per Arrow parse block (bounds memory per batch)
+CHUNK_ROWS = 200_000            # rows per DataFrame chunk on the pandas path
+SPOOL_DIR = ".spool"
+
+# dtype-map names → Arrow types for the Arrow reader
+_ARROW_TYPES = {
+    "string": "string", "str": "string",
+    "float64": "float64", "Float64": "float64",
+    "int64": "int64", "Int64": "int64",
+    "bool": "bool", "boolean": "bool",
+}
+
+
+class SpooledCSV:
+    """A CSV body on disk, readable as record batches or DataFrame chunks. Deletes itself on close()."""
+
+    def __init__(self, path: Path, dtypes: Optional[dict] = None, block_size: int = BLOCK_SIZE):
+        self.path = path
+        self.dtypes = dtypes or {}   # column → dtype name; unlisted columns are strings
+        self.block_size = block_size
+        self.rows: Optional[int] = None  # known once fully read
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.path.unlink(missing_ok=True)
+
+    @property
+    def size(self) -> int:
+        return self.path.stat().st_size if self.path.exists() else 0
+
+    @property
+    def columns(self) -> list[str]:
+        with open(self.path, newline="", encoding="utf-8", errors="replace") as f:
+            return next(csv.reader(f), [])
+
+    @property
+    def empty(self) -> bool:
+        """True if there is no data row after the header."""
+        with open(self.path, "rb") as f:
+            f.readline()
+            return not any(line.strip() for line in iter(f.readline, b""))
+
+    # ── Parsing ──
+
+    def _arrow_types(self) -> dict:
+        types = {col: pa.string() for col in self.columns}
+        for col, dtype in self.dtypes.items():
+            types[col] = pa.type_for_alias(_ARROW_TYPES.get(dtype, "string"))
+        return types
+
+    def batches(self) -> Iterator["pa.RecordBatch"]:
+        """Arrow record batches, parsed with all cores (requires pyarrow)."""
+        reader = pacsv.open_csv(
+            self.path,
+            read_options=pacsv.ReadOptions(block_size=self.block_size, use_threads=True),
+            convert_options=pacsv.ConvertOptions(column_types=self._arrow_types(),
+                                                 strings_can_be_null=False),
+        )
+        rows = 0
+        for batch in reader:
+            rows += batch.num_rows
+            yield batch
+        self.rows = rows
+
+    def frames(self) -> Iterator[pd.DataFrame]:
+        """DataFrame chunks of bounded size."""
+        if pacsv is not None:
+            for batch in self.batches():
+                yield batch.to_pandas()
+            return
+        dtypes = {col: self.dtypes.get(col, str) for col in self.columns}
+        rows = 0
+        for chunk in pd.read_csv(self.path, dtype=dtypes, keep_default_na=False,
+                                 chunksize=CHUNK_ROWS):
+            rows += len(chunk)
+            yield chunk
+        self.rows = rows
+
+    # ── Writing ──
+
+    def write_csv(self, path: Path) -> int:
+        """Parse chunk by chunk and write to `path` (atomically). Returns the row count."""
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        try:
+            if pacsv is not None:
+                writer = None
+                for batch in self.batches():
+                    if writer is None:
+                        writer = pacsv.CSVWriter(tmp, batch.schema)
+                    writer.write_batch(batch)
+                if writer is not None:
+                    writer.close()
+                else:
+                    tmp.write_text(",".join(self.columns) + "\n")
+            else:
+                header = True
+                for chunk in self.frames():
+                    chunk.to_csv(tmp, mode="w" if header else "a", header=header, index=False)
+                    header = False
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return self.rows or 0
+
+    def __len__(self):
+        if self.rows is None:
+            with open(self.path, newline="", encoding="utf-8", errors="replace") as f:
+                self.rows = max(sum(1 for _ in csv.reader(f)) - 1, 0)
+        return self.rows
+
+
+def spool_path(directory: Path) -> Path:
+    """A fresh, empty spool file under directory/.spool."""
+    spool_dir = directory / SPOOL_DIR
+    spool_dir.mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(suffix=".csv", dir=spool_dir)
+    os.close(fd)
+    return Path(name)
+
+
+def spool_stream(stream, directory: Path, dtypes: Optional[dict] = None) -> SpooledCSV:
+    """Copy a binary stream to a spool file under directory/.spool and wrap it."""
+    path = spool_path(directory)
+    try:
+        with open(path, "wb") as out:
+            shutil.copyfileobj(stream, out, COPY_BUFFER)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return SpooledCSV(path, dtypes)
+
+
+def concat_spools(spools: list[SpooledCSV], directory: Path) -> SpooledCSV:
+    """
+    Stream several spooled CSVs into one whose header is the union of their
+    columns (first-seen order); missing cells are left empty. Consumes and
+    deletes the inputs.
+    """
+    columns: list[str] = []
+    for s in spools:
+        columns += [c for c in s.columns if c not in columns]
+    path = spool_path(directory)
+    rows = 0
+    try:
+        with open(path, "w", newline="", encoding="utf-8") as out:
+            writer = csv.DictWriter(out, fieldnames=columns, restval="")
+            writer.writeheader()
+            for s in spools:
+                with s, open(s.path, newline="", encoding="utf-8") as f:
+                    for row in csv.DictReader(f):
+                        writer.writerow(row)
+                        rows += 1
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    merged = SpooledCSV(path)
+    merged.rows = rows
+    return merged
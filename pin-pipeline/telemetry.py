@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+PIN Fetch Telemetry — per-request timings rolled up for the fetch log and
+Prometheus.
+
+Every logical request (all of its retry attempts) becomes one
+RequestRecord: time to first byte, latency of the attempt that answered,
+total wall time including retries and rate-limit waits, wire/decoded bytes,
+rows parsed, retry count and why attempts failed (connect/read
+timeout, HTTP status). Records pick up labels such as state and year from
+the calling thread's context, so the HTTP client doesn't need to know what
+it is fetching for.
+
+  telemetry = Telemetry()
+  with telemetry.context(state="MD", year=2024):
+      rec = telemetry.start("data/Result/search")
+      ...
+      telemetry.finish(rec, "ok")
+  telemetry.summary()                    # → fetch_log.json
+  telemetry.write_prometheus(path)       # → node_exporter textfile collector
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+
+class RequestRecord:
+    """Measurements for one logical request."""
+
+    __slots__ = ("endpoint", "labels", "started", "attempt_started", "attempts", "ttfb", "latency",
+                 "wall", "wire_bytes", "decoded_bytes", "rows", "failures", "outcome")
+
+    def __init__(self, endpoint: str, labels: dict):
+        self.endpoint = endpoint
+        self.labels = labels
+        self.started = time.perf_counter()
+        self.attempt_started = None
+        self.attempts = 0
+        self.ttfb: Optional[float] = None      # seconds, answering attempt
+        self.latency: Optional[float] = None   # seconds, answering attempt incl. body
+        self.wall: Optional[float] = None      # seconds, first attempt → done
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.rows = 0
+        self.failures: list[str] = []          # reason per failed attempt
+        self.outcome: Optional[str] = None
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1)
+
+    def attempt(self):
+        """Mark the start of an attempt (after any rate-limit wait)."""
+        self.attempt_started = time.perf_counter()
+        self.attempts += 1
+
+    def failed(self, reason: str):
+        self.failures.append(reason)
+
+    def to_dict(self) -> dict:
+        return {
+            "endpoint": self.endpoint, **self.labels, "outcome": self.outcome,
+            "ttfbMs": _ms(self.ttfb), "latencyMs": _ms(self.latency), "wallMs": _ms(self.wall),
+            "wireBytes": self.wire_bytes, "decodedBytes": self.decoded_bytes,
+            "rows": self.rows, "retries": self.retries, "failures": self.failures,
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "max": None}
+    arr = np.asarray(values) * 1000
+    return {"p50": round(float(np.percentile(arr, 50)), 1),
+            "p95": round(float(np.percentile(arr, 95)), 1),
+            "max": round(float(arr.max()), 1)}
+
+
+def rollup(records: Iterable[RequestRecord]) -> dict:
+    """Aggregate a group of records."""
+    records = list(records)
+    outcomes: dict[str, int] = {}
+    failures: dict[str, int] = {}
+    for r in records:
+        outcomes[r.outcome] = outcomes.get(r.outcome, 0) + 1
+        for reason in r.failures:
+            failures[reason] = failures.get(reason, 0) + 1
+    answered = [r for r in records if r.latency is not None]
+    busy = sum(r.latency for r in answered)
+    rows = sum(r.rows for r in records)
+    return {
+        "requests": len(records),
+        "outcomes": outcomes,
+        "retries": sum(r.retries for r in records),
+        "failedAttempts": failures,
+        "ttfbMs": _percentiles([r.ttfb for r in answered if r.ttfb is not None]),
+        "latencyMs": _percentiles([r.latency for r in answered]),
+        "wallSeconds": round(sum(r.wall or 0 for r in records), 1),
+        "wireBytes": sum(r.wire_bytes for r in records),
+        "decodedBytes": sum(r.decoded_bytes for r in records),
+        "rows": rows,
+        "rowsPerSec": round(rows / busy, 1) if busy else None,
+    }
+
+
+class Telemetry:
+    """Thread-safe collector of RequestRecords."""
+
+    def __init__(self, prefix: str = "pin_wqp"):
+        self.prefix = prefix
+        self._records: list[RequestRecord] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def context(self, **labels):
+        """Attach labels (state=..., year=...) to requests started on this thread."""
+        outer = getattr(self._local, "labels", {})
+        self._local.labels = {**outer, **labels}
+        try:
+            yield
+        finally:
+            self._local.labels = outer
+
+    def start(self, endpoint: str) -> RequestRecord:
+        return RequestRecord(endpoint, dict(getattr(self._local, "labels", {})))
+
+    def finish(self, rec: RequestRecord, outcome: Optional[str] = None):
+        rec.outcome = outcome or rec.outcome or "abandoned"
+        rec.wall = time.perf_counter() - rec.started
+        with self._lock:
+            self._records.append(rec)
+
+    @property
+    def records(self) -> list[RequestRecord]:
+        with self._lock:
+            return list(self._records)
+
+    def _grouped(self, key) -> dict[str, dict]:
+        groups: dict[str, list[RequestRecord]] = {}
+        for r in self.records:
+            k = key(r)
+            if k is not None:
+                groups.setdefault(k, []).append(r)
+        return {k: rollup(v) for k, v in sorted(groups.items())}
+
+    def summary(self) -> dict:
+        """Roll-ups for fetch_log.json: overall, per state, per state/year, per endpoint."""
+        return {
+            "all": rollup(self.records),
+            "byState": self._grouped(lambda r: r.labels.get("state")),
+            "byYear": self._grouped(
+                lambda r: f"{r.labels['state']}/{r.labels['year']}"
+                if "state" in r.labels and "year" in r.labels else None),
+            "byEndpoint": self._grouped(lambda r: r.endpoint),
+        }
+
+    # ── Prometheus textfile ──
+
+    def write_prometheus(self, path: Path):
+        """
+        Write counters/sums in the node_exporter textfile-collector format.
+        Written to a temp file and renamed so the collector never sees a
+        half-written file.
+        """
+        series: dict[tuple, dict[str, float]] = {}
+        for r in self.records:
+            labels = (("state", str(r.labels.get("state", ""))),
+                      ("year", str(r.labels.get("year", ""))),
+                      ("endpoint", r.endpoint))
+            s = series.setdefault(labels, {})
+            for name, value in (
+                (f"requests_total|outcome={r.outcome}", 1),
+                ("retries_total", r.retries),
+                ("request_wall_seconds_total", r.wall or 0),
+                ("request_latency_seconds_sum", r.latency or 0),
+                ("request_latency_seconds_count", 1 if r.latency is not None else 0),
+                ("ttfb_seconds_sum", r.ttfb or 0),
+                ("ttfb_seconds_count", 1 if r.ttfb is not None else 0),
+                ("wire_bytes_total", r.wire_bytes),
+                ("decoded_bytes_total", r.decoded_bytes),
+                ("rows_total", r.rows),
+            ):
+                s[name] = s.get(name, 0) + value
+            for reason in r.failures:
+                key = f"failed_attempts_total|reason={reason}"
+                s[key] = s.get(key, 0) + 1
+
+        # metric → (type, help); summaries are rendered as their _sum/_count pair
+        metrics = {
+            "requests_total": ("counter", "Logical requests by final outcome"),
+            "retries_total": ("counter", "Retried attempts"),
+            "failed_attempts_total": ("counter", "Failed attempts by reason"),
+            "request_wall_seconds_total": ("counter", "Wall time incl. retries and waits"),
+            "request_latency_seconds": ("summary", "Latency of answering attempts"),
+            "ttfb_seconds": ("summary", "Time to first byte of answering attempts"),
+            "wire_bytes_total": ("counter", "Bytes received on the wire"),
+            "decoded_bytes_total": ("counter", "Bytes after decompression"),
+            "rows_total": ("counter", "Rows parsed"),
+        }
+        lines = []
+        for metric, (kind, text) in metrics.items():
+            name = f"{self.prefix}_{metric}"
+            names = (metric + "_sum", metric + "_count") if kind == "summary" else (metric,)
+            samples = []
+            for labels, values in sorted(series.items()):
+                for key, value in sorted(values.items()):
+                    base, _, extra = key.partition("|")
+                    if base not in names:
+                        continue
+                    all_labels = list(labels) + ([tuple(extra.split("=", 1))] if extra else [])
+                    rendered = ",".join(f'{k}="{_escape(v)}"' for k, v in all_labels)
+                    samples.append(f"{self.prefix}_{base}{{{rendered}}} {value:g}")
+            if samples:
+                lines += [f"# HELP {name} {text}", f"# TYPE {name} {kind}", *samples]
+        lines += [f"# HELP {self.prefix}_last_run_timestamp_seconds When these metrics were written",
+                  f"# TYPE {self.prefix}_last_run_timestamp_seconds gauge",
+                  f"{self.prefix}_last_run_timestamp_seconds {time.time():.0f}"]
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, path)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
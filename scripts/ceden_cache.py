@@ -21,7 +21,10 @@ from datetime import datetime
 from pathlib import Path
 
 import pandas as pd
-import requests
+
+# Shared pooled HTTP client from the pipeline (keep-alive, retries, gzip)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "pin-pipeline"))
+import http_client  # noqa: E402
 
 # ── Config ────────────────────────────────────────────────────────────────────
 
@@ -96,7 +99,7 @@ def safe_str(val, default: str = "") -> str:
 
 def ckan_sql(sql: str) -> list[dict]:
     """Execute a CKAN SQL query and return records."""
-    resp = requests.get(CKAN_BASE, params={"sql": sql}, timeout=60)
+    resp = http_client.get(CKAN_BASE, params={"sql": sql}, timeout=60)
     resp.raise_for_status()
     data = resp.json()
     if not data.get("success"):
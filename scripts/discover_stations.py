@@ -18,6 +18,7 @@ Usage:
 """
 
 import argparse
+import importlib.util
 import json
 import os
 import re
@@ -28,12 +29,10 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional
 
-try:
-    import requests
-except ImportError:
+# http_client (below) needs requests
+if importlib.util.find_spec("requests") is None:
     print("Installing requests...")
     os.system(f"{sys.executable} -m pip install requests --quiet")
-    import requests
 
 try:
     import pandas as pd
@@ -44,6 +43,10 @@ except ImportError:
 
 from io import StringIO
 
+# Shared pooled HTTP client from the pipeline (keep-alive, retries, gzip)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "pin-pipeline"))
+import http_client  # noqa: E402
+
 # ─── Configuration ──────────────────────────────────────────────────────────
 
 MAX_PER_STATE = 15
@@ -175,7 +178,7 @@ def make_region_id(state_name: str, waterbody_name: str) -> str:
 def fetch_rdb(url: str) -> pd.DataFrame:
     """Fetch USGS RDB (tab-separated) format and return as DataFrame."""
     try:
-        resp = requests.get(url, timeout=REQUEST_TIMEOUT)
+        resp = http_client.get(url, timeout=REQUEST_TIMEOUT)
         resp.raise_for_status()
         # Skip comment lines starting with #
         lines = [l for l in resp.text.strip().split('\n') if not l.startswith('#')]
@@ -194,7 +197,7 @@ def fetch_rdb(url: str) -> pd.DataFrame:
 def fetch_csv(url: str, timeout: int = REQUEST_TIMEOUT) -> pd.DataFrame:
     """Fetch CSV from URL and return as DataFrame."""
     try:
-        resp = requests.get(url, timeout=timeout)
+        resp = http_client.get(url, timeout=timeout)
         resp.raise_for_status()
         return pd.read_csv(StringIO(resp.text), dtype=str, on_bad_lines='skip')
     except Exception as e:
@@ -303,7 +306,7 @@ def find_wqp_sites(state_code: str, organization: Optional[str] = None) -> list[
 
     try:
         print(f"\n    WQP URL: {url[:150]}")
-        resp = requests.get(url, timeout=60)
+        resp = http_client.get(url, timeout=60)
         resp.raise_for_status()
         df = pd.read_csv(StringIO(resp.text), dtype=str, on_bad_lines='skip')
     except Exception as e:
@@ -328,7 +331,7 @@ def find_wqp_sites(state_code: str, organization: Optional[str] = None) -> list[
                     f"&mimeType=csv"
                     f"&zip=no"
                 )
-            resp = requests.get(url_retry, timeout=60)
+            resp = http_client.get(url_retry, timeout=60)
             resp.raise_for_status()
             df = pd.read_csv(StringIO(resp.text), dtype=str, on_bad_lines='skip')
         except Exception as e2: